@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - API load test
+
+Serves main.app (in this process, with uvicorn on a local port) against the local Solr and MySQL
+  stand-ins in loadTestStandIns, replays a mix of search, document, abstract, image and metadata
+  calls (LOAD_MIX) at a controlled concurrency, and reports the p50/p95/p99 latency per call type
+  and overall, the errors, and the throughput.
+
+    python benchmarks/benchmarkAPILoad.py [--concurrency 8] [--requests 2000] [--output results.json]
+                                          [--baseline baseline.json --tolerance 0.2]
+
+The settings come from localsecrets, with Solr, the database and the image folder pointed at the
+  stand-ins.  Solr responses are synthesized from a small synthetic corpus unless they're in the
+  --recording file; with --record-from (a real Solr URL), the requests not in the recording are
+  forwarded there, and their responses added to the recording.
+
+The latencies are of the successful calls (errors, which may fail fast, are counted separately).
+
+The calls (and their order) are the same for the same --seed, so runs can be compared: --output
+  saves the results, and --baseline compares the p95 and the error rate of each call type with a
+  saved run, exiting with status 1 if any is more than --tolerance slower, or has a higher error
+  rate (e.g., for CI).
+
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+
+import requests
+
+import benchmarkSupport
+import loadTestStandIns
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# call type: share of the calls
+LOAD_MIX = {"search": 40,
+            "document": 15,
+            "abstract": 20,
+            "image": 10,
+            "metadata": 15
+           }
+
+SERVER_START_TIMEOUT = 60 # seconds for the server to start
+
+#-----------------------------------------------------------------------------
+def load_calls(corpus, count, seed=1):
+    """
+    Return a list of count (call type, path) for the LOAD_MIX, from the corpus
+
+    >>> calls = load_calls(loadTestStandIns.SyntheticCorpus(sources=1, volumes=1, articles=2), 100)
+    >>> sorted(set(kind for kind, path in calls))
+    ['abstract', 'document', 'image', 'metadata', 'search']
+    """
+    rnd = random.Random(seed)
+    kinds = list(LOAD_MIX)
+    ret_val = []
+    for kind in rnd.choices(kinds, weights=[LOAD_MIX[kind] for kind in kinds], k=count):
+        doc = rnd.choice(corpus.docs)
+        if kind == "search":
+            path = f"/v2/Database/Search/?fulltext1={rnd.choice(corpus.vocabulary)}"
+            if rnd.random() < 0.5:
+                path += f"&sourcecode={doc['art_sourcecode']}"
+        elif kind == "document":
+            path = f"/v2/Documents/Document/{doc['art_id']}/"
+        elif kind == "abstract":
+            path = f"/v2/Documents/Abstracts/{doc['art_id']}/"
+        elif kind == "image":
+            path = f"/v2/Documents/Image/{doc['art_id']}.FIG001/"
+            if rnd.random() < 0.5:
+                path += "?width=300"
+        else:
+            path = rnd.choice(["/v2/Metadata/Journals/",
+                               f"/v2/Metadata/Volumes/?sourcecode={doc['art_sourcecode']}",
+                               f"/v2/Metadata/Contents/{doc['art_sourcecode']}/{doc['art_vol']}/"])
+        ret_val.append((kind, path))
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def start_api(corpus, fake_solr, workdir):
+    """
+    Point the settings at the stand-ins, import the app, and serve it in a background thread.
+
+    Returns (base url, uvicorn server)
+    """
+    loadTestStandIns.prepare_workdir(corpus, workdir)
+    loadTestStandIns.configure_api(fake_solr.url, workdir)
+
+    import uvicorn
+    import main
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None # not the main thread
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.serve())
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("The server exited while starting")
+        if time.monotonic() > deadline:
+            server.should_exit = True
+            raise RuntimeError(f"The server didn't start in {SERVER_START_TIMEOUT} seconds")
+        time.sleep(0.05)
+
+    return f"http://127.0.0.1:{port}", server
+
+def run_calls(base_url, calls, concurrency):
+    """
+    Make the calls with concurrency client threads (each with its own session, so cookies are kept).
+
+    Returns (list of (call type, status, seconds), elapsed seconds)
+    """
+    results = []
+    results_lock = threading.Lock()
+    next_call = iter(calls)
+    next_call_lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        while True:
+            with next_call_lock:
+                call = next(next_call, None)
+            if call is None:
+                break
+            kind, path = call
+            start = time.perf_counter()
+            try:
+                status = session.get(base_url + path).status_code
+            except requests.RequestException:
+                status = None
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                results.append((kind, status, elapsed))
+
+    threads = [threading.Thread(target=client) for n in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results, time.perf_counter() - start
+
+def summarize(results, elapsed):
+    """
+    Return the statistics (ms) per call type, and for all calls, with the throughput
+
+    The latencies are of the successful calls; an error (no response, or a status of 400 or more) is
+      only counted.
+
+    >>> summary = summarize([("search", 200, 0.1), ("search", 200, 0.3), ("search", 500, 0.001), ("image", None, 5)], 1)
+    >>> summary["kinds"]["search"]["mean_ms"], summary["kinds"]["search"]["errors"], summary["kinds"]["search"]["error_rate"]
+    (200.0, 1, 0.333)
+    >>> summary["kinds"]["image"]["p50_ms"] is None, summary["all"]["requests"]
+    (True, 4)
+    """
+    def is_error(status):
+        return status is None or status >= 400
+
+    def stats(calls):
+        times = [seconds for status, seconds in calls if not is_error(status)]
+        errors = len(calls) - len(times)
+        return {"requests": len(calls),
+                "errors": errors,
+                "error_rate": round(errors / len(calls), 3) if calls else None,
+                "mean_ms": round(sum(times) / len(times) * 1000, 1) if times else None,
+                "p50_ms": round(benchmarkSupport.percentile(times, 50) * 1000, 1) if times else None,
+                "p95_ms": round(benchmarkSupport.percentile(times, 95) * 1000, 1) if times else None,
+                "p99_ms": round(benchmarkSupport.percentile(times, 99) * 1000, 1) if times else None,
+               }
+
+    ret_val = {"kinds": {}}
+    for kind in LOAD_MIX:
+        ret_val["kinds"][kind] = stats([(status, seconds) for call_kind, status, seconds in results if call_kind == kind])
+    ret_val["all"] = stats([(status, seconds) for kind, status, seconds in results])
+    ret_val["elapsed_seconds"] = round(elapsed, 2)
+    ret_val["requests_per_second"] = round(len(results) / elapsed, 1)
+
+    return ret_val
+
+def error_regressions(summary, baseline):
+    """
+    Return a list of (call type or "all", baseline error rate, error rate) for those with a higher error rate
+      than in the baseline
+
+    >>> error_regressions({"kinds": {"search": {"requests": 10, "errors": 1}, "image": {"requests": 10, "errors": 0}},
+    ...                    "all": {"requests": 20, "errors": 1}},
+    ...                   {"kinds": {"search": {"requests": 10, "errors": 0}, "image": {"requests": 10, "errors": 1}},
+    ...                    "all": {"requests": 20, "errors": 1}})
+    [('search', 0.0, 0.1)]
+    """
+    def error_rate(stats):
+        # computed, for baselines saved before the error rate was
+        return round(stats["errors"] / stats["requests"], 3) if stats.get("requests") else None
+
+    ret_val = []
+    compared = [(kind, stats, baseline["kinds"].get(kind)) for kind, stats in summary["kinds"].items()]
+    compared.append(("all", summary["all"], baseline.get("all")))
+    for kind, stats, base_stats in compared:
+        value = error_rate(stats)
+        base = error_rate(base_stats) if base_stats is not None else None
+        if value is not None and base is not None and value > base:
+            ret_val.append((kind, base, value))
+
+    return ret_val
+
+def report(summary):
+    print (f"{'call':<10} {'requests':>8} {'errors':>7} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, stats in list(summary["kinds"].items()) + [("all", summary["all"])]:
+        if stats["requests"]:
+            print (f"{kind:<10} {stats['requests']:>8} {stats['errors']:>7} {str(stats['mean_ms']):>9} {str(stats['p50_ms']):>9} {str(stats['p95_ms']):>9} {str(stats['p99_ms']):>9}")
+    print (f"{summary['requests_per_second']} requests per second ({summary['elapsed_seconds']} seconds)")
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test against local Solr and MySQL stand-ins")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+    parser.add_argument("--requests", type=int, default=2000, help="Calls to measure")
+    parser.add_argument("--warmup", type=int, default=200, help="Calls before measuring (e.g., to fill the caches)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the mix of calls")
+    parser.add_argument("--recording", help="Recorded Solr responses (JSON file)")
+    parser.add_argument("--record-from", help="Solr URL to record the responses missing from --recording from")
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the p95 of each call type with these saved results")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown (fraction) over the baseline reported as a regression")
+    options = parser.parse_args()
+
+    corpus = loadTestStandIns.SyntheticCorpus()
+    recording = loadTestStandIns.SolrRecording(options.recording)
+    fake_solr = loadTestStandIns.FakeSolr(corpus, recording=recording, upstream=options.record_from).start()
+    workdir = tempfile.mkdtemp(prefix="opasload")
+    base_url, server = start_api(corpus, fake_solr, workdir)
+
+    calls = load_calls(corpus, options.warmup + options.requests, seed=options.seed)
+    run_calls(base_url, calls[:options.warmup], options.concurrency)
+    results, elapsed = run_calls(base_url, calls[options.warmup:], options.concurrency)
+    server.should_exit = True
+    if options.record_from is not None:
+        recording.save()
+
+    summary = summarize(results, elapsed)
+    summary["settings"] = {"concurrency": options.concurrency, "requests": options.requests, "seed": options.seed,
+                           "solr": dict(fake_solr.counts)}
+    print (f"{options.requests} calls, {options.concurrency} clients, Solr stand-in responses: {fake_solr.counts}")
+    report(summary)
+    if options.output is not None:
+        with open(options.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        slower = benchmarkSupport.regressions({kind: stats["p95_ms"] for kind, stats in summary["kinds"].items()},
+                                              {kind: stats["p95_ms"] for kind, stats in baseline["kinds"].items()},
+                                              tolerance=options.tolerance)
+        for kind, base, value in slower:
+            print (f"Regression: {kind} p95 {value} ms, was {base} ms")
+        more_errors = error_regressions(summary, baseline)
+        for kind, base, value in more_errors:
+            print (f"Regression: {kind} error rate {value}, was {base}")
+        if slower or more_errors:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
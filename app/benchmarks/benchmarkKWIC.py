@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - KWIC / hit marker microbenchmarks
+
+Compares the precompiled single pass hit marker functions in opasXMLHelper (hitmarkers_to_html,
+  xml_string_to_kwic, hitmarkers_to_numbered_anchors) with the earlier approach (a re.sub per
+  marker, uncompiled patterns, and a module global anchor counter), for KWIC snippets and
+  for full-text returns of several sizes.  Also checks the output is the same.
+
+    python benchmarks/benchmarkKWIC.py [--repeat 5]
+
+"""
+import re
+import argparse
+
+import benchmarkSupport
+import opasConfig
+import opasXMLHelper
+
+#-----------------------------------------------------------------------------
+# the earlier implementation, for comparison
+legacy_count_anchors = 0
+
+def legacy_numbered_anchors(matchobj):
+    global legacy_count_anchors
+    JUMPTOPREVHIT = f"""<a onclick='scrollToAnchor("hit{legacy_count_anchors}");event.preventDefault();'>🡄</a>"""
+    JUMPTONEXTHIT = f"""<a onclick='scrollToAnchor("hit{legacy_count_anchors+1}");event.preventDefault();'>🡆</a>"""
+
+    if matchobj.group(0) == opasConfig.HITMARKERSTART:
+        legacy_count_anchors += 1
+        if legacy_count_anchors > 1:
+            return f"<a name='hit{legacy_count_anchors}'>{JUMPTOPREVHIT}{opasConfig.HITMARKERSTART_OUTPUTHTML}"
+        elif legacy_count_anchors <= 1:
+            return f"<a name='hit{legacy_count_anchors}'> "
+    if matchobj.group(0) == opasConfig.HITMARKEREND:
+        return f"{opasConfig.HITMARKEREND_OUTPUTHTML}{JUMPTONEXTHIT}"
+    else:
+        return matchobj.group(0)
+
+def legacy_fulltext(text_xml, heading):
+    global legacy_count_anchors
+    legacy_count_anchors = 0
+    text_xml = re.sub(f"{opasConfig.HITMARKERSTART}|{opasConfig.HITMARKEREND}", legacy_numbered_anchors, text_xml)
+    text_xml = re.sub("\[\[RunningHead\]\]", f"{heading}", text_xml, count=1)
+    return text_xml
+
+def legacy_kwic(snippets):
+    kwic_list = []
+    for n in snippets:
+        match = opasXMLHelper.xml_string_to_text(n)
+        match = re.sub(opasConfig.HITMARKERSTART, opasConfig.HITMARKERSTART_OUTPUTHTML, match)
+        match = re.sub(opasConfig.HITMARKEREND, opasConfig.HITMARKEREND_OUTPUTHTML, match)
+        kwic_list.append(match)
+    return kwic_list
+
+#-----------------------------------------------------------------------------
+def fulltext(text_xml, heading):
+    return opasXMLHelper.hitmarkers_to_numbered_anchors(text_xml, running_head=heading)
+
+def kwic(snippets):
+    return [opasXMLHelper.xml_string_to_kwic(n) for n in snippets]
+
+def kwic_markers_only(snippets):
+    return [opasXMLHelper.hitmarkers_to_html(n) for n in snippets]
+
+def legacy_kwic_markers_only(snippets):
+    ret_val = []
+    for n in snippets:
+        match = re.sub(opasConfig.HITMARKERSTART, opasConfig.HITMARKERSTART_OUTPUTHTML, n)
+        ret_val.append(re.sub(opasConfig.HITMARKEREND, opasConfig.HITMARKEREND_OUTPUTHTML, match))
+    return ret_val
+
+def report(label, legacy, current):
+    print (f"{label:<40} {legacy * 1000:>10.3f} {current * 1000:>10.3f} {legacy / current:>8.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="KWIC / hit marker microbenchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median reported)")
+    options = parser.parse_args()
+
+    heading = "<span class='pub_year'>(2020)</span>"
+    # highlight snippets, as returned by Solr for the result list (5 per document, 15 documents)
+    snippet = f"<p>The patient reported a <i>{opasConfig.HITMARKERSTART}dream{opasConfig.HITMARKEREND}</i> in which the analyst " \
+              f"appeared as the {opasConfig.HITMARKERSTART}mother{opasConfig.HITMARKEREND}.</p>"
+    snippets = [snippet] * 75
+
+    print (f"{'':<40} {'legacy ms':>10} {'ms':>10} {'speedup':>9}")
+    legacy_time, _, legacy_ret = benchmarkSupport.time_it(legacy_kwic, snippets, repeat=options.repeat)
+    current_time, _, current_ret = benchmarkSupport.time_it(kwic, snippets, repeat=options.repeat)
+    assert(legacy_ret == current_ret)
+    report("KWIC 75 snippets (strip + markers)", legacy_time, current_time)
+
+    legacy_time, _, legacy_ret = benchmarkSupport.time_it(legacy_kwic_markers_only, snippets, repeat=options.repeat)
+    current_time, _, current_ret = benchmarkSupport.time_it(kwic_markers_only, snippets, repeat=options.repeat)
+    assert(legacy_ret == current_ret)
+    report("KWIC 75 snippets (markers only)", legacy_time, current_time)
+
+    for size, pages in benchmarkSupport.DOC_SIZES.items():
+        text = "[[RunningHead]]" + benchmarkSupport.synthetic_pepkbd3_doc(pages=pages, hit_markers=True)
+        legacy_time, _, legacy_ret = benchmarkSupport.time_it(legacy_fulltext, text, heading, repeat=options.repeat)
+        current_time, _, current_ret = benchmarkSupport.time_it(fulltext, text, heading, repeat=options.repeat)
+        assert(legacy_ret == current_ret)
+        report(f"Full-text anchors, {size} ({len(text) // 1024} KB)", legacy_time, current_time)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - Startup (import time) benchmark
+
+Imports main (or --module) in a fresh interpreter --repeat times, and reports the median and
+  fastest import time against the budget (opasConfig.STARTUP_IMPORT_BUDGET, or --budget), and the
+  slowest imports (per python -X importtime).
+
+    python benchmarks/benchmarkStartup.py [--module main] [--repeat 5] [--budget 3.0] [--top 15]
+
+Importing should have no side effects: in the benchmark, connecting a socket during the import
+  is refused (as if Solr and the database were down) and reported, so the import has to succeed
+  without them.  Exits with status 1 (e.g., for CI) if the import fails, takes longer than the
+  budget, or tried to connect.
+
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+import benchmarkSupport
+import opasConfig
+
+APP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# run in the child interpreter: refuse (and record) connections, and time the import
+IMPORT_CODE = """
+import sys, json, time, socket
+sys.path[:0] = ["./libs", "./config", "./libs/solrpy", "./libs/configLib"]
+connections = []
+def refuse_connect(sock, address):
+    connections.append(str(address))
+    raise ConnectionRefusedError(f"no connections at import ({{address}})")
+socket.socket.connect = refuse_connect
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print ("STARTUP " + json.dumps({{"seconds": seconds, "connections": connections}}))
+"""
+
+#-----------------------------------------------------------------------------
+def import_once(module):
+    """
+    Import the module in a new interpreter, returning (result dict, importtime lines) or raising
+      RuntimeError with the output if the import failed
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_CODE.format(module=module)],
+                          cwd=APP_FOLDER, capture_output=True, text=True)
+    result = [line for line in proc.stdout.splitlines() if line.startswith("STARTUP ")]
+    if proc.returncode != 0 or result == []:
+        raise RuntimeError(f"Import of {module} failed:\n{proc.stderr[-3000:]}")
+
+    return json.loads(result[-1][len("STARTUP "):]), [line for line in proc.stderr.splitlines() if line.startswith("import time:")]
+
+def slowest_imports(importtime_lines, top=15):
+    """
+    Return [(cumulative seconds, package)] of the slowest imports at the top two levels (e.g., main,
+      and the modules main imports)
+
+    >>> slowest_imports(["import time: self [us] | cumulative | imported package",
+    ...                  "import time:        20 |         20 |     lxml._elementpath",
+    ...                  "import time:      2000 |       2020 |   lxml.etree",
+    ...                  "import time:       500 |       2520 | main"])
+    [(0.00252, 'main'), (0.00202, 'lxml.etree')]
+    """
+    ret_val = []
+    for line in importtime_lines:
+        try:
+            self_us, cumulative_us, package = line[len("import time:"):].split("|")
+            cumulative_us = int(cumulative_us)
+        except ValueError: # the header
+            continue
+        level = (len(package) - len(package.lstrip()) - 1) // 2 # nested imports are indented
+        if level <= 1:
+            ret_val.append((cumulative_us / 1000000, package.strip()))
+
+    return sorted(ret_val, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup (import time) benchmark")
+    parser.add_argument("--module", default="main", help="Module to import (from the app folder)")
+    parser.add_argument("--repeat", type=int, default=5, help="Imports (each in a new interpreter) to measure")
+    parser.add_argument("--budget", type=float, default=opasConfig.STARTUP_IMPORT_BUDGET, help="Most seconds the (median) import may take")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to list")
+    options = parser.parse_args()
+
+    times = []
+    connections = set()
+    try:
+        for n in range(options.repeat):
+            result, importtime_lines = import_once(options.module)
+            times.append(result["seconds"])
+            connections.update(result["connections"])
+    except RuntimeError as e:
+        print (e)
+        sys.exit(1)
+
+    median = statistics.median(times)
+    print (f"import {options.module}: median {median:.3f} s, fastest {min(times):.3f} s ({options.repeat} runs), budget {options.budget:.3f} s")
+    print (f"Slowest imports (cumulative seconds, last run):")
+    for seconds, package in slowest_imports(importtime_lines, top=options.top):
+        print (f"{seconds:>8.3f}  {package}")
+
+    failed = False
+    if median > options.budget:
+        print (f"Over budget: {median:.3f} s > {options.budget:.3f} s")
+        failed = True
+    if connections:
+        print (f"Connections attempted at import: {', '.join(sorted(connections))}")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
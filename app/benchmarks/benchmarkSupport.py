@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - Benchmark support
+
+Shared helpers for the scripts in this folder: synthetic PEP KBD3 documents of a given size
+  (so the benchmarks don't depend on the archive), simple timing, peak memory, percentiles, and the
+  comparison of results with a baseline (e.g., in CI).
+
+The benchmarks are run directly, e.g., from the app folder:
+
+    python benchmarks/benchmarkXSLTConcurrency.py
+
+"""
+import sys
+import math
+import os.path
+import time
+import statistics
+import tracemalloc
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "benchmarks": # running from within the benchmarks folder
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../libs'))
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../config'))
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../libs/solrpy'))
+
+HITMARKED_WORDS = ("dream", "transference", "mother")
+
+# sizes (pages) for synthetic documents
+DOC_SIZES = {"small": 2, "medium": 20, "large": 120}
+
+#-----------------------------------------------------------------------------
+def synthetic_pepkbd3_doc(pages=20, paras_per_page=8, hit_markers=False, art_id="BMK.001.0001A"):
+    """
+    Return a PEP KBD3 style XML document string, with page breaks (pb/n) after each page.
+
+    If hit_markers is set, the words in HITMARKED_WORDS are wrapped in the search hit markers,
+      as they would be in a document returned from Solr with highlighting.
+
+    >>> xmlstr = synthetic_pepkbd3_doc(pages=2)
+    >>> xmlstr.count("<pb>")
+    2
+    """
+    if hit_markers:
+        import opasConfig
+        words = {word: f"{opasConfig.HITMARKERSTART}{word}{opasConfig.HITMARKEREND}" for word in HITMARKED_WORDS}
+    else:
+        words = {word: word for word in HITMARKED_WORDS}
+
+    para = f"The patient reported a {words['dream']} in which the analyst appeared as a <i>figure</i> " \
+           f"of the {words['mother']}; the <b>{words['transference']}</b> was taken up in the next session " \
+           f"and linked to earlier material about separation and loss, and the wish to be held in mind."
+    body = []
+    para_id = 0
+    for page in range(1, pages + 1):
+        for n in range(paras_per_page):
+            para_id += 1
+            body.append(f'<p id="P{para_id:04}" lang="en">{para}</p>')
+        body.append(f"<pb><n>{page}</n></pb>")
+
+    ret_val = f"""<?xml version="1.0" encoding="UTF-8"?>
+<pepkbd3>
+<artinfo arttype="ART" j="BMK" ISSN="0000-0000" id="{art_id}" lang="en">
+<artyear>2020</artyear><artvol>1</artvol><artiss>1</artiss><artpgrg>1-{pages}</artpgrg>
+<arttitle>A Synthetic Article for Benchmarks</arttitle>
+<artauth><aut role="author" alias="false" listed="true" asis="false" lang="en" authindexid="Tester, A.">
+<nfirst type="FIRST">Ann</nfirst><nlast>Tester</nlast></aut>
+<aut role="author" alias="false" listed="true" asis="false" lang="en" authindexid="Bench, M.">
+<nfirst type="FIRST">Mark</nfirst><nlast>Bench</nlast></aut></artauth>
+</artinfo>
+<abs><p>An abstract about the {words['dream']} and the {words['transference']}.</p></abs>
+<body>
+{"".join(body)}
+</body>
+</pepkbd3>
+"""
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def time_it(func, *args, repeat=5, **kwargs):
+    """
+    Call func repeat times, returning (median seconds, min seconds, last return value)
+    """
+    times = []
+    ret_val = None
+    for n in range(repeat):
+        start = time.perf_counter()
+        ret_val = func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    return statistics.median(times), min(times), ret_val
+
+def peak_memory(func, *args, **kwargs):
+    """
+    Call func once, returning (peak bytes allocated during the call, return value)
+
+    Only allocations through Python's allocator are traced (not, e.g., libxml2's own), so for lxml
+      this is the memory of the Python objects and strings the call creates.
+
+    >>> peak, ret_val = peak_memory(lambda: "x" * 100000)
+    >>> peak >= 100000
+    True
+    """
+    # tracing is restarted for each call, which resets the peak (tracemalloc.reset_peak needs Python 3.9)
+    was_tracing = tracemalloc.is_tracing()
+    tracemalloc.stop()
+    tracemalloc.start()
+    try:
+        ret_val = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        if was_tracing:
+            tracemalloc.start()
+
+    return peak, ret_val
+
+def percentile(values, q):
+    """
+    Return the q (0-100) percentile of the values (nearest rank), or None if there are none
+
+    >>> percentile(range(1, 101), 95)
+    95
+    """
+    ret_val = None
+    values = sorted(values)
+    if values:
+        rank = max(1, math.ceil(q / 100 * len(values)))
+        ret_val = values[rank - 1]
+
+    return ret_val
+
+def regressions(results, baseline, tolerance=0.2):
+    """
+    Compare results with a baseline (dicts of name: time), returning a list of
+      (name, baseline time, time) for those more than tolerance (a fraction) slower
+
+    >>> regressions({"search": 1.3, "image": 0.5}, {"search": 1.0, "image": 0.6, "gone": 1.0})
+    [('search', 1.0, 1.3)]
+    """
+    ret_val = []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base and value is not None and value > base * (1 + tolerance):
+            ret_val.append((name, base, value))
+
+    return ret_val
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    print ("Fini. benchmarkSupport Tests complete.")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - Term prefix index benchmark
+
+Builds an opasTermIndex.TermPrefixIndex from synthetic terms (a stand-in for a /terms dump), and
+  reports build time, memory footprint, and the time per prefix and wildcard (regex) lookup,
+  as used by the word wheel and author index.
+
+    python benchmarks/benchmarkTermIndex.py [--terms 1000000] [--lookups 10000]
+
+"""
+import random
+import argparse
+
+import benchmarkSupport
+import opasTermIndex
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+def synthetic_terms(count, seed=1):
+    rnd = random.Random(seed)
+    terms = set()
+    while len(terms) < count:
+        terms.add("".join(rnd.choice(LETTERS) for n in range(rnd.randint(3, 12))))
+
+    return [(term, rnd.randint(1, 5000)) for term in terms]
+
+def lookups(index, prefixes, wildcard=False):
+    for prefix in prefixes:
+        if wildcard:
+            index.regex_matches(prefix[:2] + "." + prefix[3:] + ".*", limit=15)
+        else:
+            index.prefix_matches(prefix, limit=15)
+
+def main():
+    parser = argparse.ArgumentParser(description="Term prefix index benchmark")
+    parser.add_argument("--terms", type=int, default=1000000, help="Terms in the index")
+    parser.add_argument("--lookups", type=int, default=10000, help="Lookups per measurement")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median reported)")
+    options = parser.parse_args()
+
+    terms = synthetic_terms(options.terms)
+    build_time, _, index = benchmarkSupport.time_it(opasTermIndex.TermPrefixIndex, terms, repeat=1)
+    text_bytes = sum(len(term) for term, count in terms)
+    print (f"{len(index)} terms ({text_bytes} bytes of text), built in {build_time:.2f} seconds, index uses {index.memory_bytes()} bytes")
+
+    rnd = random.Random(2)
+    prefixes = [term[:rnd.randint(3, 5)] for term, count in rnd.sample(terms, options.lookups)]
+    for label, wildcard in (("prefix", False), ("wildcard", True)):
+        elapsed, _, _ = benchmarkSupport.time_it(lookups, index, prefixes, wildcard=wildcard, repeat=options.repeat)
+        print (f"{label:<10} {elapsed / options.lookups * 1000000:>10.1f} microseconds per lookup")
+
+if __name__ == "__main__":
+    main()
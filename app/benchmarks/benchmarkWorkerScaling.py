@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - Worker scaling load test
+
+Serves the API with gunicorn (gunicorn_conf.py, uvicorn workers) with each of --workers worker
+  processes in turn, against the local Solr and MySQL stand-ins (loadTestStandIns, via loadTestApp),
+  replays the benchmarkAPILoad call mix at --concurrency clients per worker, and reports the
+  throughput, latency and scaling efficiency (speedup over the fewest workers, per added worker).
+
+    python benchmarks/benchmarkWorkerScaling.py [--workers 1 2 4] [--requests 2000] [--concurrency 8]
+                                                [--min-efficiency 0.75] [--output results.json]
+
+So the load generator and the Solr stand-in don't limit the throughput instead of the workers, the
+  clients run in --client-processes processes, and the Solr stand-in in --solr-processes processes
+  (sharing a port).  Scaling can only be near linear while the workers, clients and stand-ins have
+  cores to themselves: the cores are reported, and runs with more workers than the cores left for
+  them aren't checked against --min-efficiency.  Exits with status 1 if the efficiency of a checked
+  run is below --min-efficiency, or a run has errors (e.g., for CI).
+
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+import concurrent.futures
+
+import requests
+
+import benchmarkAPILoad
+import loadTestStandIns
+
+APP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SERVER_START_TIMEOUT = 120 # seconds for all the workers to start
+
+#-----------------------------------------------------------------------------
+def serve_fake_solr(port, urls):
+    """
+    Serve a Solr stand-in on the port (0 for any; shared with the other stand-in processes), until killed
+    """
+    corpus = loadTestStandIns.SyntheticCorpus()
+    fake_solr = loadTestStandIns.FakeSolr(corpus, port=port, reuse_port=True).start()
+    urls.put(fake_solr.url)
+    fake_solr.thread.join()
+
+def start_fake_solr(processes):
+    """
+    Start the Solr stand-in processes, returning (url, processes)
+    """
+    mp_context = multiprocessing.get_context("spawn")
+    urls = mp_context.Queue()
+    ret_val = []
+    port = 0
+    for n in range(processes):
+        process = mp_context.Process(target=serve_fake_solr, args=(port, urls), daemon=True)
+        process.start()
+        ret_val.append(process)
+        url = urls.get(timeout=60)
+        port = int(url.split(":")[2].split("/")[0])
+
+    return url, ret_val
+
+def start_server(workers, solr_url, workdir):
+    """
+    Start gunicorn with the workers, and wait until it answers.  Returns (base url, process)
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(workers),
+               BIND=f"127.0.0.1:{port}",
+               LOG_LEVEL="warning",
+               OPAS_LOADTEST_SOLR_URL=solr_url,
+               OPAS_LOADTEST_WORKDIR=workdir)
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn_conf.py",
+                                "--pythonpath", "benchmarks", "loadTestApp:app"],
+                               cwd=APP_FOLDER, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server with {workers} workers exited (status {process.returncode})")
+        try:
+            if requests.get(base_url + "/v2/Session/Status/", timeout=5).status_code == 200:
+                break
+        except requests.RequestException:
+            pass
+        if time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"The server with {workers} workers didn't start in {SERVER_START_TIMEOUT} seconds")
+        time.sleep(0.25)
+
+    return base_url, process
+
+def client_process(base_url, calls, concurrency):
+    """
+    Make the calls with concurrency client threads (in a client process).  Returns (results, start, end)
+    """
+    start = time.time()
+    results, elapsed = benchmarkAPILoad.run_calls(base_url, calls, concurrency)
+    return results, start, time.time()
+
+def run_clients(clients, base_url, calls, concurrency):
+    """
+    Make the calls with concurrency client threads, spread over the client processes.
+
+    Returns (list of (call type, status, seconds), elapsed seconds)
+    """
+    clients = max(1, min(clients, concurrency))
+    threads = [concurrency // clients + (1 if n < concurrency % clients else 0) for n in range(clients)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=clients, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(client_process, base_url, calls[n::clients], threads[n]) for n in range(clients)]
+        outcomes = [future.result() for future in futures]
+
+    results = [result for outcome in outcomes for result in outcome[0]]
+    elapsed = max(outcome[2] for outcome in outcomes) - min(outcome[1] for outcome in outcomes)
+
+    return results, elapsed
+
+def scaling(runs):
+    """
+    Add the speedup (over the run with the fewest workers) and efficiency (speedup per added worker) to the runs
+
+    >>> runs = scaling([{"workers": 1, "requests_per_second": 100.0}, {"workers": 4, "requests_per_second": 360.0}])
+    >>> [(run["speedup"], run["efficiency"]) for run in runs]
+    [(1.0, 1.0), (3.6, 0.9)]
+    """
+    base = min(runs, key=lambda run: run["workers"])
+    for run in runs:
+        run["speedup"] = round(run["requests_per_second"] / base["requests_per_second"], 2)
+        run["efficiency"] = round(run["speedup"] / (run["workers"] / base["workers"]), 2)
+
+    return runs
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="API throughput scaling with the number of worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker processes for each run")
+    parser.add_argument("--requests", type=int, default=2000, help="Calls to measure, per worker")
+    parser.add_argument("--warmup", type=int, default=200, help="Calls before measuring, per worker (e.g., to fill each worker's caches)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads, per worker")
+    parser.add_argument("--client-processes", type=int, default=max(1, cores // 4), help="Processes the client threads are spread over")
+    parser.add_argument("--solr-processes", type=int, default=max(1, cores // 4), help="Solr stand-in processes")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the mix of calls")
+    parser.add_argument("--min-efficiency", type=float, default=0.75, help="Least scaling efficiency (speedup per added worker) accepted")
+    parser.add_argument("--output", help="Save the results to this JSON file")
+    options = parser.parse_args()
+
+    corpus = loadTestStandIns.SyntheticCorpus()
+    workdir = tempfile.mkdtemp(prefix="opasscaling")
+    loadTestStandIns.prepare_workdir(corpus, workdir)
+    solr_url, solr_processes = start_fake_solr(options.solr_processes)
+    cores_for_workers = max(1, cores - options.client_processes - options.solr_processes)
+    print (f"{cores} cores: {options.client_processes} client and {options.solr_processes} Solr stand-in processes, "
+           f"so up to {cores_for_workers} workers can scale")
+
+    runs = []
+    for workers in sorted(options.workers):
+        base_url, server = start_server(workers, solr_url, workdir)
+        try:
+            calls = benchmarkAPILoad.load_calls(corpus, (options.warmup + options.requests) * workers, seed=options.seed)
+            concurrency = options.concurrency * workers
+            run_clients(options.client_processes, base_url, calls[:options.warmup * workers], concurrency)
+            results, elapsed = run_clients(options.client_processes, base_url, calls[options.warmup * workers:], concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        summary = benchmarkAPILoad.summarize(results, elapsed)
+        runs.append({"workers": workers,
+                     "concurrency": concurrency,
+                     "requests": len(results),
+                     "errors": summary["all"]["errors"],
+                     "requests_per_second": summary["requests_per_second"],
+                     "p50_ms": summary["all"]["p50_ms"],
+                     "p95_ms": summary["all"]["p95_ms"],
+                     "checked": workers <= cores_for_workers})
+
+    for process in solr_processes:
+        process.kill()
+
+    scaling(runs)
+    print (f"{'workers':>7} {'clients':>7} {'requests':>8} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8} {'efficiency':>10}")
+    for run in runs:
+        note = "" if run["checked"] else "  (more workers than cores left for them; not checked)"
+        print (f"{run['workers']:>7} {run['concurrency']:>7} {run['requests']:>8} {run['errors']:>7} {run['requests_per_second']:>9} "
+               f"{run['p50_ms']:>9} {run['p95_ms']:>9} {run['speedup']:>8} {run['efficiency']:>10}{note}")
+    if options.output is not None:
+        with open(options.output, "w") as f:
+            json.dump({"cores": cores, "runs": runs}, f, indent=2)
+
+    failed = False
+    for run in runs:
+        if run["errors"]:
+            print (f"Errors: {run['errors']} with {run['workers']} workers")
+            failed = True
+        if run["checked"] and run["efficiency"] < options.min_efficiency:
+            print (f"Scaling: efficiency {run['efficiency']} with {run['workers']} workers, below {options.min_efficiency}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - opasXMLHelper microbenchmarks
+
+Times (median of --repeat runs) and measures the peak (Python) memory of the opasXMLHelper
+  functions on the hot paths of the document, abstract and search calls: xml_get_pages,
+  xml_str_to_html, xml_xpath_return_xmlstringlist_withinheritance, FirstPageCollector (via
+  get_first_page_excerpt_from_doc_root), get_running_head, authors_citation_from_xmlstr and
+  remove_encoding_string.
+
+    python benchmarks/benchmarkXMLHelper.py [--repeat 5] [--samples folder] [--output results.json]
+                                            [--baseline baseline.json --tolerance 0.2]
+
+The documents are synthetic PEP KBD3 documents of each of SIZES (from a short article to an SE/GW
+  book volume), plus any redistributable sample KBD3 documents (*.xml) in the --samples folder.
+
+The results of each function and document are compared with the stored baseline (BASELINE_FILE,
+  if it's there, or --baseline), and any more than --tolerance slower, or using more memory, are
+  reported as regressions, exiting with status 1 (e.g., for CI).  Since the times depend on the
+  machine, the baseline is stored (and, after an intended change, updated) on the machine the
+  comparisons are run on:
+
+    python benchmarks/benchmarkXMLHelper.py --output benchmarks/baselines/benchmarkXMLHelper.json
+
+"""
+import os
+import sys
+import glob
+import json
+import argparse
+
+import benchmarkSupport
+import opasXMLHelper
+
+from lxml import etree
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "benchmarkXMLHelper.json")
+
+# synthetic document sizes (pages): the articles, and a book volume the size of an SE or GW volume
+SIZES = dict(benchmarkSupport.DOC_SIZES, volume=600)
+
+# the calls of the size independent functions are timed in batches of this many
+SMALL_CALL_BATCH = 1000
+
+#-----------------------------------------------------------------------------
+def get_pages(xmlstr):
+    # a page from the middle of the document, as for a document page request
+    return opasXMLHelper.xml_get_pages(xmlstr, offset=max(1, xmlstr.count("<pb>") // 2), limit=1, inside="body", env="body")
+
+def xpath_paras(root):
+    return opasXMLHelper.xml_xpath_return_xmlstringlist_withinheritance(root, "//p")
+
+def first_page_excerpt(xmlstr):
+    return opasXMLHelper.get_first_page_excerpt_from_doc_root(xmlstr)
+
+def authors_citation(author_xmlstr):
+    for n in range(SMALL_CALL_BATCH):
+        ret_val = opasXMLHelper.authors_citation_from_xmlstr(author_xmlstr, listed=True)
+    return ret_val
+
+def running_head(artinfo):
+    for n in range(SMALL_CALL_BATCH):
+        ret_val = opasXMLHelper.get_running_head(**artinfo)
+    return ret_val
+
+def remove_encoding(xmlstr):
+    return opasXMLHelper.remove_encoding_string(xmlstr)
+
+def html(xmlstr):
+    return opasXMLHelper.xml_str_to_html(xmlstr)
+
+def cases(xmlstr):
+    """
+    Return a list of (function name, function, argument) for a document
+    """
+    # lxml won't parse a unicode string with an encoding declaration
+    xmlstr_noencoding = opasXMLHelper.remove_encoding_string(xmlstr)
+    root = etree.fromstring(xmlstr_noencoding.encode("utf8"))
+    author_xmlstr = etree.tostring(root.find(".//artauth"), with_tail=False, encoding="unicode") if root.find(".//artauth") is not None else ""
+    artinfo = {"source_title": "Benchmark Journal",
+               "pub_year": root.findtext(".//artyear"),
+               "vol": root.findtext(".//artvol"),
+               "issue": root.findtext(".//artiss"),
+               "pgrg": root.findtext(".//artpgrg")}
+
+    return [("xml_get_pages", get_pages, xmlstr),
+            ("xml_str_to_html", html, xmlstr_noencoding),
+            ("xml_xpath_return_xmlstringlist_withinheritance", xpath_paras, root),
+            ("FirstPageCollector", first_page_excerpt, xmlstr_noencoding),
+            (f"get_running_head (x{SMALL_CALL_BATCH})", running_head, artinfo),
+            (f"authors_citation_from_xmlstr (x{SMALL_CALL_BATCH})", authors_citation, author_xmlstr),
+            ("remove_encoding_string", remove_encoding, xmlstr)]
+
+def documents(samples=None):
+    """
+    Return a list of (document name, xml string): the synthetic sizes, and any samples
+    """
+    ret_val = [(size, benchmarkSupport.synthetic_pepkbd3_doc(pages=pages)) for size, pages in SIZES.items()]
+    if samples is not None:
+        for filename in sorted(glob.glob(os.path.join(samples, "*.xml"))):
+            with open(filename, encoding="utf8") as f:
+                ret_val.append((os.path.basename(filename), f.read()))
+
+    return ret_val
+
+def run(docs, repeat=5):
+    """
+    Return a dict of "function/document": {"ms": median time, "peak_kb": peak memory}
+    """
+    ret_val = {}
+    for doc_name, xmlstr in docs:
+        for func_name, func, arg in cases(xmlstr):
+            try:
+                median, fastest, func_ret = benchmarkSupport.time_it(func, arg, repeat=repeat)
+                peak, func_ret = benchmarkSupport.peak_memory(func, arg)
+            except Exception as e:
+                print (f"{func_name} failed for {doc_name}, not measured: {str(e)[:200]}")
+            else:
+                ret_val[f"{func_name}/{doc_name}"] = {"ms": round(median * 1000, 3),
+                                                      "peak_kb": round(peak / 1024, 1)}
+
+    return ret_val
+
+def report(docs, results):
+    print (f"{'function':<58} {'document':<16} {'KB':>6} {'ms':>10} {'peak KB':>10}")
+    sizes = {doc_name: len(xmlstr) // 1024 for doc_name, xmlstr in docs}
+    for name, result in results.items():
+        func_name, doc_name = name.rsplit("/", 1)
+        print (f"{func_name:<58} {doc_name:<16} {sizes.get(doc_name, ''):>6} {result['ms']:>10.3f} {result['peak_kb']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="opasXMLHelper microbenchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median reported)")
+    parser.add_argument("--samples", help="Folder of sample KBD3 documents (*.xml) to add to the synthetic ones")
+    parser.add_argument("--output", help="Save the results to this JSON file (e.g., to update the stored baseline)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Compare the results with these saved results")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Slowdown or memory growth (fraction) over the baseline reported as a regression")
+    options = parser.parse_args()
+
+    docs = documents(options.samples)
+    results = run(docs, repeat=options.repeat)
+    report(docs, results)
+    if options.output is not None:
+        os.makedirs(os.path.dirname(os.path.abspath(options.output)), exist_ok=True)
+        with open(options.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": options.repeat, "results": results}, f, indent=2)
+
+    if options.baseline is not None and os.path.exists(options.baseline) and options.output != options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)["results"]
+        slower = []
+        for measure, unit in (("ms", "ms"), ("peak_kb", "KB peak")):
+            slower += [(name, base, value, unit) for name, base, value in
+                       benchmarkSupport.regressions({name: result[measure] for name, result in results.items()},
+                                                    {name: result[measure] for name, result in baseline.items()},
+                                                    tolerance=options.tolerance)]
+        for name, base, value, unit in slower:
+            print (f"Regression: {name} {value} {unit}, was {base} {unit}")
+        if slower:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
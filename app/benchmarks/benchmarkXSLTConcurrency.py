@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - Concurrent XSLT transform benchmark
+
+Runs a fixed number of XML_TO_HTML, EXCERPT_HTML and EXCERPT_TEXT transforms with 1, 2, 4, ...
+  worker threads, and reports throughput and speedup over one thread.  Since each thread
+  compiles and uses its own XSLT transformer (opasXMLHelper.XSLT_Transformer), and lxml
+  releases the GIL while transforming, throughput should scale with threads up to the core count.
+
+    python benchmarks/benchmarkXSLTConcurrency.py [--transforms 200] [--pages 20] [--max-threads 8]
+
+"""
+import sys
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import benchmarkSupport
+import opasConfig
+import opasXMLHelper
+
+TRANSFORMER_NAMES = (opasConfig.TRANSFORMER_XMLTOHTML,
+                     opasConfig.TRANSFORMER_XMLTOHTML_EXCERPT,
+                     opasConfig.TRANSFORMER_XMLTOTEXT_EXCERPT)
+
+def transform(xmlstr, transformer_name):
+    if transformer_name == opasConfig.TRANSFORMER_XMLTOHTML:
+        ret_val = opasXMLHelper.xml_str_to_html(xmlstr, transformer_name=transformer_name)
+    else:
+        # excerpt transformers work on the tree
+        root = opasXMLHelper.xmlstr_to_etree(xmlstr)
+        transformer = opasXMLHelper.g_transformer.get_transformer(transformer_name)
+        ret_val = str(transformer(root))
+
+    return ret_val
+
+def run(xmlstr, transforms, threads):
+    jobs = [TRANSFORMER_NAMES[n % len(TRANSFORMER_NAMES)] for n in range(transforms)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda name: transform(xmlstr, name), jobs))
+    elapsed = time.perf_counter() - start
+    assert(len(results) == transforms)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent XSLT transform benchmark")
+    parser.add_argument("--transforms", type=int, default=200, help="Transforms per run")
+    parser.add_argument("--pages", type=int, default=benchmarkSupport.DOC_SIZES["medium"], help="Pages in the synthetic document")
+    parser.add_argument("--max-threads", type=int, default=os.cpu_count() or 4, help="Most worker threads to try")
+    options = parser.parse_args()
+
+    xmlstr = opasXMLHelper.remove_encoding_string(benchmarkSupport.synthetic_pepkbd3_doc(pages=options.pages))
+    # warm up, including compiling the transformers in the main thread
+    for name in TRANSFORMER_NAMES:
+        transform(xmlstr, name)
+
+    print (f"{options.transforms} transforms of a {options.pages} page document ({len(xmlstr)} chars), {os.cpu_count()} cores")
+    print (f"{'threads':>8} {'seconds':>10} {'per sec':>10} {'speedup':>8}")
+    base = None
+    threads = 1
+    while threads <= options.max_threads:
+        elapsed = run(xmlstr, options.transforms, threads)
+        if base is None:
+            base = elapsed
+        print (f"{threads:>8} {elapsed:>10.3f} {options.transforms / elapsed:>10.1f} {base / elapsed:>8.2f}")
+        threads *= 2
+
+if __name__ == "__main__":
+    main()
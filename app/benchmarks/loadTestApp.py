@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - main.app pointed at the load test stand-ins (loadTestStandIns), for server worker processes
+
+Each worker imports this module (rather than main), which points the settings at the Solr stand-in
+  and the work folder given in the environment, then imports the app.  From the app folder:
+
+    OPAS_LOADTEST_SOLR_URL=http://127.0.0.1:port/solr/ OPAS_LOADTEST_WORKDIR=folder \
+        gunicorn -c gunicorn_conf.py --pythonpath benchmarks loadTestApp:app
+
+The work folder (images and the seeded database) is prepared once, before the workers start, with
+  loadTestStandIns.prepare_workdir (benchmarkWorkerScaling.py does all of this).
+
+"""
+import os
+
+import loadTestStandIns # (with benchmarkSupport, which sets the paths of the libs)
+
+loadTestStandIns.configure_api(os.environ["OPAS_LOADTEST_SOLR_URL"], os.environ["OPAS_LOADTEST_WORKDIR"])
+
+from main import app
@@ -0,0 +1,751 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - Local stand-ins for Solr and MySQL, for the API load test (benchmarkAPILoad.py)
+
+FakeSolr is a local HTTP server which answers the requests the API makes of Solr (/select, /terms,
+  /mlt, admin/luke and admin/info/system, as XML for solrpy, or JSON for pysolr and requests):
+  - with the recorded response, if the request is in the recording file (see SolrRecording)
+  - else, if an upstream Solr is given (record mode), with its response, which is added to the recording
+  - else, with a response synthesized from a small SyntheticCorpus (documents built with
+    benchmarkSupport.synthetic_pepkbd3_doc), so the load test can run without any recording.
+
+SQLiteMySQL is a pymysql lookalike (connect, cursors, InternalError, escape_string) backed by a throwaway
+  SQLite database, with the tables and views of the opascentral schema (sql/schemas), translated
+  from MySQL.  install_sqlite_shim sets it in place of pymysql in opasCentralDBLib, and seeds the
+  product tables with the sources of the synthetic corpus.
+
+For server worker processes (benchmarkWorkerScaling.py), prepare_workdir writes the images and the
+  seeded database to a work folder once, and each worker points the API at it with configure_api
+  (see loadTestApp.py).
+
+    >>> corpus = SyntheticCorpus(sources=2, volumes=1, articles=2)
+    >>> [doc["art_id"] for doc in corpus.docs]
+    ['BMA.001.0001A', 'BMA.001.0003A', 'BMB.001.0001A', 'BMB.001.0003A']
+    >>> print (solr_xml({"numFound": 2, "hits": ["a"]}))
+    <lst><int name="numFound">2</int><arr name="hits"><str>a</str></arr></lst>
+    >>> mysql_to_sqlite("UPDATE api_sessions SET session_end = NOW() WHERE latest_activity < DATE_SUB(NOW(), INTERVAL 30 MINUTE)")
+    "UPDATE api_sessions SET session_end = NOW() WHERE latest_activity < datetime('now', 'localtime', '-30 minute')"
+
+"""
+import os
+import re
+import json
+import types
+import socket
+import sqlite3
+import datetime
+import tempfile
+import threading
+import urllib.parse
+from xml.sax.saxutils import escape, quoteattr
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import benchmarkSupport
+import logging
+logger = logging.getLogger(__name__)
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../sql/schemas/opascentralXPS20200229.sql")
+SOLR_VERSION = "8.6.2"
+DATABASE_FILE = "opascentral.sqlite" # in the work folder
+
+#-----------------------------------------------------------------------------
+# Synthetic corpus, shared by the Solr stand-in and the database seed
+#-----------------------------------------------------------------------------
+class SyntheticCorpus(object):
+    """
+    A small corpus of synthetic journal articles: sources BMA, BMB..., each with volumes of articles
+    """
+    def __init__(self, sources=4, volumes=3, articles=10, pages=benchmarkSupport.DOC_SIZES["small"]):
+        self.sources = [f"BM{chr(ord('A') + n)}" for n in range(sources)]
+        self.docs = []
+        self.images = []
+        for source in self.sources:
+            for vol in range(1, volumes + 1):
+                for n in range(articles):
+                    self.docs.append(self.synthetic_doc(source, vol, 1 + n * pages, pages))
+        self.docs_by_id = {doc["art_id"]: doc for doc in self.docs}
+        self.vocabulary = sorted(set(re.findall(r"[a-z]{3,}", self.docs[0]["text_xml"].lower())))
+        self.authors = sorted(set(author for doc in self.docs for author in doc["art_author_id"]))
+
+    def synthetic_doc(self, source, vol, page, pages):
+        year = 1990 + vol
+        art_id = f"{source}.{vol:03}.{page:04}A"
+        text_xml = benchmarkSupport.synthetic_pepkbd3_doc(pages=pages, art_id=art_id)
+        text_xml = text_xml.replace("<pb>", f"<figure><graphic source=\"{art_id}.FIG001\"/></figure><pb>", 1)
+        self.images.append(f"{art_id}.FIG001")
+        authors = ["Tester, Ann", "Bench, Mark"] if page % 2 else ["Bench, Mark"]
+        citeas = f'<p class="citeas"><span class="authors">{" &amp; ".join(authors)}</span> ({year}). ' \
+                 f'<span class="title">A Synthetic Article for Benchmarks</span>. ' \
+                 f'<span class="sourcetitle">{source} Journal</span> <span class="vol">{vol}</span>:<span class="pgrg">{page}-{page + pages - 1}</span></p>'
+        ret_val = {"art_id": art_id,
+                   "art_sourcecode": source,
+                   "art_sourcetitleabbr": f"{source} J.",
+                   "art_sourcetitlefull": f"{source} Journal",
+                   "art_sourcetype": "journal",
+                   "art_type": "ART",
+                   "art_vol": str(vol),
+                   "art_vol_int": vol,
+                   "art_year": str(year),
+                   "art_year_int": year,
+                   "art_iss": "1",
+                   "art_pgrg": f"{page}-{page + pages - 1}",
+                   "art_title": "A Synthetic Article for Benchmarks",
+                   "art_title_xml": "<arttitle>A Synthetic Article for Benchmarks</arttitle>",
+                   "title": "A Synthetic Article for Benchmarks",
+                   "art_authors": authors,
+                   "art_author_id": authors,
+                   "art_authors_mast": " and ".join(authors),
+                   "art_citeas_xml": citeas,
+                   "art_info_xml": re.search("<artinfo.*</artinfo>", text_xml, re.S).group(0),
+                   "art_lang": "EN",
+                   "art_issn": "0000-0000",
+                   "art_doi": f"10.0000/{art_id.lower()}",
+                   "art_level": 1,
+                   "art_qual": None,
+                   "art_origrx": None,
+                   "art_newsecnm": None,
+                   "art_offsite": False,
+                   "art_excerpt": re.search("<abs>.*</abs>", text_xml, re.S).group(0),
+                   "art_excerpt_xml": re.search("<abs>.*</abs>", text_xml, re.S).group(0),
+                   "abstract_xml": re.search("<abs>.*</abs>", text_xml, re.S).group(0),
+                   "text_xml": text_xml,
+                   "file_classification": "free" if vol == 1 else "archive",
+                   "file_last_modified": datetime.datetime(2020, 10, 1, 12, 0, 0),
+                   "timestamp": datetime.datetime(2020, 10, 1, 12, 0, 0),
+                   "art_cited_all": page % 7,
+                   "art_cited_5": page % 3,
+                   "art_cited_10": page % 5,
+                   "art_cited_20": page % 7,
+                   "art_views_lastweek": page % 4,
+                   "art_views_last1mos": page % 6,
+                   "art_views_last6mos": page % 8,
+                   "art_views_last12mos": page % 10,
+                   "art_views_lastcalyear": page % 10,
+                   "score": 1.0,
+                  }
+
+        return ret_val
+
+#-----------------------------------------------------------------------------
+# Solr responses
+#-----------------------------------------------------------------------------
+def solr_xml(value, name=None):
+    """
+    Return the Solr XML response element for a value (dict: lst, list: arr, datetime: date...)
+    """
+    name_attr = "" if name is None else f" name={quoteattr(str(name))}"
+    if isinstance(value, dict):
+        children = "".join(solr_xml(child, child_name) for child_name, child in value.items())
+        ret_val = f"<lst{name_attr}>{children}</lst>"
+    elif isinstance(value, (list, tuple)):
+        ret_val = f"<arr{name_attr}>{''.join(solr_xml(child) for child in value)}</arr>"
+    elif value is None:
+        ret_val = f"<null{name_attr}/>"
+    elif isinstance(value, bool):
+        ret_val = f"<bool{name_attr}>{str(value).lower()}</bool>"
+    elif isinstance(value, int):
+        ret_val = f"<int{name_attr}>{value}</int>"
+    elif isinstance(value, float):
+        ret_val = f"<float{name_attr}>{value}</float>"
+    elif isinstance(value, datetime.datetime):
+        ret_val = f"<date{name_attr}>{value.strftime('%Y-%m-%dT%H:%M:%SZ')}</date>"
+    else:
+        ret_val = f"<str{name_attr}>{escape(str(value))}</str>"
+
+    return ret_val
+
+def solr_json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    raise TypeError(f"{type(value)} is not JSON serializable")
+
+def render_solr_response(response, wt):
+    """
+    Return (content type, body) for a response (JSON shaped dict, with the documents in response["response"])
+    """
+    if wt == "json":
+        return "application/json; charset=UTF-8", json.dumps(response, default=solr_json_default)
+
+    body = []
+    for name, value in response.items():
+        if name == "response":
+            docs = "".join(f"<doc>{''.join(solr_xml(field_value, field) for field, field_value in doc.items())}</doc>"
+                           for doc in value["docs"])
+            body.append(f'<result name="response" numFound="{value["numFound"]}" start="{value["start"]}">{docs}</result>')
+        elif name == "facet_counts":
+            # the field facets are named lists in XML, rather than flat lists
+            facets = dict(value)
+            facets["facet_fields"] = {field: dict(zip(counts[::2], counts[1::2])) for field, counts in value.get("facet_fields", {}).items()}
+            body.append(solr_xml(facets, name))
+        else:
+            body.append(solr_xml(value, name))
+
+    return "application/xml; charset=UTF-8", f'<?xml version="1.0" encoding="UTF-8"?>\n<response>{"".join(body)}</response>'
+
+def first_param(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values else default
+
+def query_text(params):
+    return " ".join(params.get("q", []) + params.get("fq", []))
+
+#-----------------------------------------------------------------------------
+class SolrSynthesizer(object):
+    """
+    Synthesizes the Solr responses for the requests the API makes, from a SyntheticCorpus
+    """
+    def __init__(self, corpus):
+        self.corpus = corpus
+
+    def __call__(self, core, handler, params):
+        """
+        Return the response (a JSON shaped dict) for the request, or None if it's not supported
+        """
+        qtime = 1 + len(query_text(params)) % 10
+        header = {"status": 0, "QTime": qtime, "params": {name: values[-1] for name, values in params.items()}}
+        if handler == "admin/info/system":
+            ret_val = {"responseHeader": header, "lucene": {"solr-spec-version": SOLR_VERSION, "lucene-spec-version": SOLR_VERSION}}
+        elif handler == "admin/luke":
+            ret_val = {"responseHeader": header, "index": {"numDocs": len(self.corpus.docs), "version": 1}}
+        elif handler == "terms":
+            ret_val = {"responseHeader": header, "terms": self.terms(core, params)}
+        elif handler in ("select", "mlt"):
+            ret_val = self.select(core, params)
+            ret_val["responseHeader"] = header
+        else:
+            ret_val = None
+
+        return ret_val
+
+    def matching_docs(self, core, params):
+        text = query_text(params)
+        if core == "pepwebauthors":
+            return [{"art_author_id": author, "art_id": doc["art_id"], "art_year_int": doc["art_year_int"],
+                     "art_citeas_xml": doc["art_citeas_xml"], "art_auth_pos_int": 1, "art_author_role": "author"}
+                    for doc in self.corpus.docs for author in doc["art_author_id"]]
+        if core == "pepwebglossary":
+            return []
+
+        ret_val = self.corpus.docs
+        ids = [art_id for art_id in re.findall(r"[A-Z]{3}\.\d{3}\.\d{4}[A-Z]", text) if art_id in self.corpus.docs_by_id]
+        if ids:
+            ret_val = [self.corpus.docs_by_id[art_id] for art_id in ids]
+        else:
+            sources = [source for source in self.corpus.sources if source in text]
+            if sources:
+                ret_val = [doc for doc in ret_val if doc["art_sourcecode"] in sources]
+            vols = re.findall(r"art_vol:\(?\"?(\d+)", text)
+            if vols:
+                ret_val = [doc for doc in ret_val if doc["art_vol"] in vols]
+
+        return ret_val
+
+    def select(self, core, params):
+        docs = self.matching_docs(core, params)
+        rows = int(first_param(params, "rows", 10))
+        cursor_mark = first_param(params, "cursorMark")
+        if cursor_mark is not None:
+            start = 0 if cursor_mark == "*" else int(cursor_mark)
+        else:
+            start = int(first_param(params, "start", 0))
+
+        fields = [field.strip() for field in re.split("[, ]", first_param(params, "fl", "*")) if field.strip()]
+        page = [doc if "*" in fields else {field: doc[field] for field in fields if field in doc}
+                for doc in docs[start:start + rows]]
+        ret_val = {"response": {"numFound": len(docs), "start": start, "docs": page}}
+        if cursor_mark is not None:
+            ret_val["nextCursorMark"] = str(min(start + rows, len(docs))) if start < len(docs) else cursor_mark
+
+        if first_param(params, "hl") in ("true", "on"):
+            ret_val["highlighting"] = self.highlighting(docs[start:start + rows], params)
+
+        if first_param(params, "facet") in ("true", "on"):
+            facet_fields = {}
+            for field in params.get("facet.field", []):
+                counts = {}
+                for doc in docs:
+                    values = doc.get(field)
+                    for value in values if isinstance(values, list) else [values]:
+                        if value is not None:
+                            counts[str(value)] = counts.get(str(value), 0) + 1
+                facet_fields[field] = [item for pair in sorted(counts.items()) for item in pair]
+            facet_counts = {"facet_queries": {}, "facet_fields": facet_fields}
+            pivots = params.get("facet.pivot", [])
+            if pivots:
+                facet_counts["facet_pivot"] = {pivot: self.pivot(docs, pivot.split(",")) for pivot in pivots}
+            ret_val["facet_counts"] = facet_counts
+
+        return ret_val
+
+    def pivot(self, docs, fields):
+        ret_val = []
+        if fields:
+            groups = {}
+            for doc in docs:
+                groups.setdefault(doc.get(fields[0]), []).append(doc)
+            for value, group in sorted(groups.items(), key=lambda item: str(item[0])):
+                entry = {"field": fields[0], "value": value, "count": len(group)}
+                if len(fields) > 1:
+                    entry["pivot"] = self.pivot(group, fields[1:])
+                ret_val.append(entry)
+
+        return ret_val
+
+    def highlighting(self, docs, params):
+        pre = first_param(params, "hl.simple.pre", "<em>")
+        post = first_param(params, "hl.simple.post", "</em>")
+        fields = [field.strip() for field in re.split("[, ]", first_param(params, "hl.fl", "text_xml")) if field.strip()]
+        full = first_param(params, "hl.fragsize") == "0"
+        words = set(re.findall(r"[a-z]{3,}", query_text(params).lower())) & set(self.corpus.vocabulary)
+        pattern = re.compile(r"\b(%s)\b" % "|".join(sorted(words)) if words else r"\b(dream)\b")
+        ret_val = {}
+        for doc in docs:
+            hits = {}
+            for field in fields:
+                text = doc.get(field)
+                if isinstance(text, str):
+                    marked = pattern.sub(lambda match: f"{pre}{match.group(1)}{post}", text)
+                    hits[field] = [marked] if full else [snippet for snippet in re.findall(r"<p[ >].*?</p>", marked)[:3]]
+            ret_val[doc["art_id"]] = hits
+
+        return ret_val
+
+    def terms(self, core, params):
+        ret_val = {}
+        if core == "pepwebauthors":
+            vocabulary = self.corpus.authors
+        else:
+            vocabulary = self.corpus.vocabulary
+        limit = int(first_param(params, "terms.limit", 10))
+        prefix = first_param(params, "terms.prefix")
+        regex = first_param(params, "terms.regex")
+        lower = first_param(params, "terms.lower")
+        for field in params.get("terms.fl", []):
+            terms = []
+            for n, term in enumerate(vocabulary):
+                if prefix is not None and not term.startswith(prefix):
+                    continue
+                if regex is not None and not re.fullmatch(regex, term):
+                    continue
+                if lower is not None and term <= lower:
+                    continue
+                terms.extend([term, 1 + n % 50])
+                if limit >= 0 and len(terms) >= limit * 2:
+                    break
+            ret_val[field] = terms
+
+        return ret_val
+
+#-----------------------------------------------------------------------------
+class SolrRecording(object):
+    """
+    Recorded Solr responses, keyed by the request (core, handler and parameters), kept in a JSON file
+    """
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.responses = {}
+        self.lock = threading.Lock()
+        if filename is not None and os.path.exists(filename):
+            with open(filename, encoding="utf-8") as f:
+                self.responses = json.load(f)
+
+    @staticmethod
+    def key(path, params):
+        """
+        >>> SolrRecording.key("/solr/pepwebdocs/select", {"rows": ["10"], "q": ["*:*"]})
+        '/solr/pepwebdocs/select?q=%2A%3A%2A&rows=10'
+        """
+        return path + "?" + urllib.parse.urlencode(sorted((name, value) for name, values in params.items() for value in values))
+
+    def get(self, path, params):
+        return self.responses.get(self.key(path, params))
+
+    def add(self, path, params, status, content_type, body):
+        with self.lock:
+            self.responses[self.key(path, params)] = {"status": status, "content_type": content_type, "body": body}
+
+    def save(self):
+        if self.filename is not None:
+            with self.lock:
+                with open(self.filename, "w", encoding="utf-8") as f:
+                    json.dump(self.responses, f, indent=1, sort_keys=True)
+
+class FakeSolrRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.respond(urllib.parse.urlsplit(self.path).query)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        query = urllib.parse.urlsplit(self.path).query
+        self.respond("&".join(part for part in (query, body) if part))
+
+    def respond(self, query):
+        fake = self.server.fake_solr
+        path = urllib.parse.urlsplit(self.path).path.rstrip("/")
+        params = urllib.parse.parse_qs(query, keep_blank_values=True)
+        match = re.match("/solr/(?:(?!admin/)([^/]+)/)?(.+)", path)
+        core, handler = match.groups() if match else (None, path)
+        recorded = fake.recording.get(path, params)
+        if recorded is None and fake.upstream is not None:
+            recorded = fake.record(path, params, query)
+        if recorded is not None:
+            status, content_type, body = recorded["status"], recorded["content_type"], recorded["body"]
+            fake.count("recorded")
+        else:
+            response = fake.synthesizer(core, handler, params)
+            if response is None:
+                status, content_type, body = 404, "text/plain", f"No stand-in for {path}"
+                fake.count("unsupported")
+            else:
+                status = 200
+                content_type, body = render_solr_response(response, first_param(params, "wt", "xml"))
+                fake.count("synthesized")
+
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+class FakeSolr(object):
+    """
+    A local Solr stand-in, serving recorded (or synthesized) responses, in a background thread.
+
+    With reuse_port, several processes can each serve a FakeSolr on the same port (SO_REUSEPORT; the
+      kernel spreads the connections), so the stand-in isn't the bottleneck for several server workers.
+    """
+    def __init__(self, corpus, recording=None, upstream=None, port=0, reuse_port=False):
+        self.synthesizer = SolrSynthesizer(corpus)
+        self.recording = recording if recording is not None else SolrRecording()
+        self.upstream = upstream
+        self.counts = {}
+        self.counts_lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), FakeSolrRequestHandler, bind_and_activate=False)
+        if reuse_port:
+            self.server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.server.server_bind()
+        self.server.server_activate()
+        self.server.daemon_threads = True
+        self.server.fake_solr = self
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/solr/"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, name):
+        with self.counts_lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def record(self, path, params, query):
+        """
+        Forward a request to the upstream Solr, and add its response to the recording
+        """
+        url = self.upstream.rstrip("/") + path[len("/solr"):] if path.startswith("/solr") else self.upstream + path
+        response = requests.post(url, data=query, headers={"Content-Type": "application/x-www-form-urlencoded; charset=utf-8"})
+        self.recording.add(path, params, response.status_code, response.headers.get("Content-Type", "text/plain"), response.text)
+        return self.recording.get(path, params)
+
+#-----------------------------------------------------------------------------
+# MySQL stand-in
+#-----------------------------------------------------------------------------
+# columns and tables the API uses which are newer than the schema dump
+SCHEMA_ADDITIONS = [
+    "ALTER TABLE api_sessions ADD COLUMN api_client_session tinyint(1) DEFAULT 0",
+    "ALTER TABLE api_sessions ADD COLUMN authorized_peparchive tinyint(1) DEFAULT 0",
+    "ALTER TABLE api_sessions ADD COLUMN authorized_pepcurrent tinyint(1) DEFAULT 0",
+    "ALTER TABLE api_session_endpoints ADD COLUMN api_method varchar(12) DEFAULT NULL",
+    """CREATE TABLE api_client_configs (
+         config_id INTEGER PRIMARY KEY AUTOINCREMENT,
+         client_id int(11) NOT NULL,
+         config_name varchar(255) NOT NULL,
+         config_settings text,
+         session_id varchar(60) NOT NULL,
+         last_update timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+         UNIQUE (client_id, config_name)
+       )""",
+]
+
+MYSQL_RUNTIME_TRANSLATIONS = [
+    (re.compile(r"DATE_SUB\(\s*NOW\(\)\s*,\s*INTERVAL\s+(\d+)\s+(\w+?)S?\s*\)", re.I), lambda m: f"datetime('now', 'localtime', '-{m.group(1)} {m.group(2).lower()}')"),
+    (re.compile(r"\bDISTINCTROW\b", re.I), lambda m: "DISTINCT"),
+]
+
+def mysql_to_sqlite(sql):
+    """
+    Translate the MySQL specific parts of a query the API makes
+    """
+    for pattern, replacement in MYSQL_RUNTIME_TRANSLATIONS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+def translate_create_table(statement):
+    """
+    Return the SQLite version of a MySQL CREATE TABLE statement (as dumped in sql/schemas)
+    """
+    lines = statement.splitlines()
+    columns = []
+    auto_increment = None
+    for line in lines[1:-1]:
+        line = line.strip().rstrip(",")
+        if re.match(r"(UNIQUE |FULLTEXT )?INDEX|CONSTRAINT|KEY", line):
+            continue
+        line = re.sub(r" COMMENT '(?:[^'\\]|\\.|'')*'", "", line)
+        line = re.sub(r" CHARACTER SET \w+| COLLATE \w+| USING BTREE| ON UPDATE CURRENT_TIMESTAMP(\(\d\))?| unsigned", "", line, flags=re.I)
+        line = re.sub(r"CURRENT_TIMESTAMP\(\d\)", "CURRENT_TIMESTAMP", line)
+        line = re.sub(r"\b(set|enum)\((?:'[^']*',?)+\)", "text", line)
+        if " AUTO_INCREMENT" in line:
+            auto_increment = line.split("`")[1]
+            line = re.sub(r"`\s+\w+(\(\d+\))?.*", "` INTEGER PRIMARY KEY AUTOINCREMENT", line)
+        if line.startswith("PRIMARY KEY") and auto_increment is not None:
+            continue
+        columns.append(line)
+
+    return lines[0].replace("  (", " (") + "\n  " + ",\n  ".join(columns) + "\n)"
+
+def translate_create_view(statement):
+    """
+    Return the SQLite version of a MySQL CREATE VIEW statement (as dumped in sql/schemas)
+    """
+    ret_val = re.sub(r"CREATE ALGORITHM = \w+ SQL SECURITY \w+ VIEW", "CREATE VIEW", statement)
+    ret_val = ret_val.replace("`opascentral`.", "")
+    ret_val = re.sub(r"now\(\) - interval (\d+) (\w+)", r"datetime('now', 'localtime', '-\1 \2')", ret_val, flags=re.I)
+    ret_val = re.sub(r"\bisnull\(([^()]+)\)", r"(\1 IS NULL)", ret_val)
+    ret_val = re.sub(r"\bconvert\(([^()]+) using \w+\)", r"\1", ret_val)
+    return ret_val.rstrip(";")
+
+def schema_statements(schema_file=SCHEMA_FILE):
+    """
+    Yield the SQLite versions of the tables and views in the schema dump
+    """
+    with open(schema_file, encoding="utf-8", errors="replace") as f:
+        dump = f.read()
+    for statement in re.findall(r"^CREATE TABLE .*?^\).*?;$", dump, re.M | re.S):
+        yield translate_create_table(statement)
+    for statement in re.findall(r"^CREATE ALGORITHM .*?;$", dump, re.M):
+        yield translate_create_view(statement)
+
+def mysql_now():
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def mysql_year(value):
+    try:
+        return int(str(value)[:4])
+    except ValueError:
+        return None
+
+def add_mysql_functions(connection):
+    connection.create_function("NOW", 0, mysql_now)
+    connection.create_function("CURDATE", 0, lambda: datetime.date.today().isoformat())
+    connection.create_function("YEAR", 1, mysql_year)
+    connection.create_function("ANY_VALUE", 1, lambda value: value)
+    connection.create_function("VERSION", 0, lambda: f"SQLite {sqlite3.sqlite_version}")
+
+class SQLiteCursor(object):
+    """
+    A pymysql style cursor (execute returns the row count, %s parameters, optional dict rows)
+    """
+    def __init__(self, connection, dict_rows=False):
+        self.connection = connection
+        self.dict_rows = dict_rows
+        self.cursor = connection.cursor()
+        self.rows = []
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+
+    def execute(self, sql, args=None):
+        sql = mysql_to_sqlite(sql)
+        if args is not None:
+            if isinstance(args, dict):
+                sql = re.sub(r"%\((\w+)\)s", r":\1", sql)
+            else:
+                args = tuple(args) if isinstance(args, (list, tuple)) else (args, )
+                sql = sql.replace("%s", "?")
+            sql = sql.replace("%%", "%")
+            self.cursor.execute(sql, args)
+        else:
+            self.cursor.execute(sql)
+        self.description = self.cursor.description
+        self.lastrowid = self.cursor.lastrowid
+        if self.description is not None:
+            names = [column[0] for column in self.description]
+            self.rows = [dict(zip(names, row)) if self.dict_rows else row for row in self.cursor.fetchall()]
+            self.rowcount = len(self.rows)
+        else:
+            self.rows = []
+            self.rowcount = self.cursor.rowcount
+
+        return self.rowcount
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def fetchmany(self, size=1):
+        ret_val, self.rows = self.rows[:size], self.rows[size:]
+        return ret_val
+
+    def fetchall(self):
+        ret_val, self.rows = self.rows, []
+        return ret_val
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self.cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class SQLiteConnection(object):
+    """
+    A pymysql style connection to the throwaway SQLite database
+    """
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        add_mysql_functions(self.connection)
+        self.open = True
+
+    def cursor(self, cursor_class=None):
+        return SQLiteCursor(self.connection, dict_rows=cursor_class is SQLiteMySQL.cursors.DictCursor)
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+        self.open = False
+
+class SQLiteMySQL(object):
+    """
+    Stands in for the pymysql module: connections go to a throwaway SQLite database with the opascentral schema
+    """
+    cursors = types.SimpleNamespace(Cursor=type("Cursor", (), {}), DictCursor=type("DictCursor", (), {}))
+    Error = sqlite3.Error
+    InternalError = sqlite3.OperationalError
+
+    def __init__(self, filename=None, schema_file=SCHEMA_FILE, create=True):
+        if filename is None:
+            handle, filename = tempfile.mkstemp(prefix="opascentral", suffix=".sqlite")
+            os.close(handle)
+        self.filename = filename
+        self.skipped = []
+        if not create: # an existing database, e.g., created by the process starting the server workers
+            return
+
+        connection = sqlite3.connect(filename)
+        connection.execute("PRAGMA journal_mode=WAL")
+        add_mysql_functions(connection)
+        for statement in schema_statements(schema_file):
+            try:
+                connection.execute(statement)
+            except sqlite3.Error as e:
+                self.skipped.append((statement.split("`")[1], str(e)))
+        # the API needs these, so an error here is raised (rather than failing the calls which use them)
+        for statement in SCHEMA_ADDITIONS:
+            connection.execute(statement)
+        connection.commit()
+        connection.close()
+
+    def connect(self, **kwargs):
+        return SQLiteConnection(self.filename)
+
+    @staticmethod
+    def escape_string(value):
+        return value.replace("'", "''")
+
+    def seed(self, corpus):
+        """
+        Add the sources of the corpus to the product tables, and the not logged in user
+        """
+        connection = self.connect()
+        cursor = connection.cursor()
+        for source in corpus.sources:
+            cursor.execute("""INSERT INTO api_productbase (basecode, articleID, active, pep_class, wall, title, bibabbrev, ISSN, pepcode, jrnl, start_year, end_year, language)
+                              VALUES (%s, %s, 1, 'journal', 3, %s, %s, '0000-0000', %s, 1, 1991, 2020, 'EN')""",
+                           (source, f"{source}.001.0001A", f"{source} Journal", f"{source} J.", source))
+        cursor.execute("INSERT INTO api_user (user_id, username, password, enabled, admin) VALUES (0, 'NotLoggedIn', '', 1, 0)")
+        connection.commit()
+        connection.close()
+
+def install_sqlite_shim(corpus=None, filename=None):
+    """
+    Put a SQLiteMySQL in place of pymysql in opasCentralDBLib (before the API modules are imported):
+      a new database seeded from the corpus, or without a corpus, the existing database in filename
+    """
+    import opasCentralDBLib
+    ret_val = SQLiteMySQL(filename, create=corpus is not None)
+    if corpus is not None:
+        ret_val.seed(corpus)
+    opasCentralDBLib.pymysql = ret_val
+    for name, error in ret_val.skipped:
+        logger.debug(f"Schema object {name} skipped ({error})")
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def prepare_workdir(corpus, workdir):
+    """
+    Write the images and the seeded database of the corpus to the work folder (once, for all the
+      server processes which configure_api with it)
+    """
+    write_images(corpus, os.path.join(workdir, "images"))
+    SQLiteMySQL(os.path.join(workdir, DATABASE_FILE)).seed(corpus)
+
+def configure_api(solr_url, workdir):
+    """
+    Point the API settings at the stand-ins (Solr at solr_url, and the database, images and slow query
+      log in the prepared work folder), before the API modules are imported
+    """
+    import localsecrets
+    localsecrets.SOLRURL = solr_url
+    localsecrets.SOLRUSER = None
+    localsecrets.SOLRPW = None
+    localsecrets.SSH_HOST = None
+    localsecrets.CONFIG = "Local"
+    localsecrets.S3_KEY = None
+    localsecrets.S3_SECRET = None
+    localsecrets.IMAGE_SOURCE_PATH = os.path.join(workdir, "images")
+    localsecrets.PADS_BASED_CLIENT_IDS = []
+
+    import opasConfig
+    opasConfig.SLOW_QUERY_LOG_FILE = os.path.join(workdir, "opasSlowQueries.jsonl")
+    install_sqlite_shim(filename=os.path.join(workdir, DATABASE_FILE))
+
+def write_images(corpus, path):
+    """
+    Write a JPEG for each figure of the corpus to path (the image source folder)
+    """
+    from PIL import Image
+    os.makedirs(path, exist_ok=True)
+    image = Image.new("RGB", (1200, 900), (200, 180, 160))
+    for image_id in corpus.images:
+        image.save(os.path.join(path, f"{image_id}.jpg"), "JPEG", quality=85)
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    print ("Fini. loadTestStandIns Tests complete.")
@@ -116,6 +116,129 @@ DEFAULT_PAGE_LIMIT = 999
 SOLR_HIGHLIGHT_RETURN_FRAGMENT_SIZE = 2520000 # to get a complete document from SOLR, with highlights, needs to be large.  SummaryFields do not have highlighting.
 SOLR_HIGHLIGHT_RETURN_MIN_FRAGMENT_SIZE = 2000 # Abstract size
 
+# Optional process pool for CPU bound document conversions (opasConversionExecutor)
+CONVERSION_POOL_ENABLED = False # when False, conversions run inline (in the calling thread)
+CONVERSION_POOL_WORKERS = None # None for the cores shared by the server's worker processes (server_worker_processes)
+CONVERSION_POOL_START_METHOD = "spawn" # multiprocessing start method for the pool workers
+CONVERSION_TIMEOUT = 120 # seconds to wait for a conversion in the pool
+
+# Caches of results that only change when the corpus is reloaded (opasCorpusCache)
+CORPUS_GENERATION_CHECK_INTERVAL = 30 # seconds between checks of the docs core index version
+CORPUS_GENERATION_TIMEOUT = 5 # seconds to wait for Solr when checking the index version
+CORPUS_CACHE_MAX_ENTRIES = 10000 # per cache
+TERM_COUNT_WILDCARD_WORKERS = 4 # wildcard term expansions run concurrently, in this many threads
+QUERY_SPEC_CACHE_ENABLED = True # memoize parse_search_query_parameters (per corpus generation)
+QUERY_SPEC_CACHE_MAX_ENTRIES = 2000
+SEARCH_RESULT_CACHE_ENABLED = True # cache search results (except full-text returns), without the access limitations
+SEARCH_RESULT_CACHE_MAX_ENTRIES = 500
+CORPUS_CACHE_TTL = None # seconds an entry is kept, even in the same generation (None for no limit)
+
+# Storage of the caches above (opasCacheBackend): "memory" (per process) or "sqlite" (a local file shared
+#  by the server's worker processes on the machine, so entries are computed, and stored, once per machine).
+#  Only these caches; the term indexes, source information and image caches are always per process.
+CACHE_BACKEND = "memory"
+CACHE_BACKEND_BY_CACHE = {} # cache name: backend, to override CACHE_BACKEND, e.g., {"search results": "sqlite"}
+SHARED_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".cache", "opas", "opasSharedCache.sqlite") # on local disk (not a network share), in a folder only the server's user can write
+SHARED_CACHE_MAX_BYTES = 512 * 1024 * 1024 # total size of the entries (all caches); least recently used are evicted
+SHARED_CACHE_MAX_ITEM_BYTES = 16 * 1024 * 1024 # larger values are not cached
+SHARED_CACHE_TIMEOUT = 2 # seconds to wait for another process's write; after that, a lookup is a miss
+
+# Most cited and most viewed leaderboards (materialized per corpus generation)
+LEADERBOARD_DEPTH = 200 # items kept per leaderboard; deeper requests are searched
+LEADERBOARD_MAX_ENTRIES = 200 # leaderboards (parameter combinations) kept
+WHATS_NEW_DEPTH = 100 # volumes kept in the What's New feed
+WHATS_NEW_CACHE_MAX_ENTRIES = 50 # What's New feeds (days_back, source_type combinations) kept
+
+# In memory prefix indexes for the word wheel and author index (opasTermIndex)
+TERM_INDEX_ENABLED = True
+TERM_INDEX_FIELDS = {"docs": ("text", "art_kwds", "art_kwds_str"), # fields (per core) with an in memory index; others go to Solr
+                     "authors": ("art_author_id", )}
+TERM_INDEX_DUMP_PAGE_SIZE = 100000 # terms per /terms request when building an index
+TERM_INDEX_RETRY_INTERVAL = 60 # seconds before retrying a failed index build
+
+# Per request timing of phases (opasRequestTiming): Server-Timing header, log line and per route histograms
+REQUEST_TIMING_ENABLED = True
+REQUEST_TIMING_HEADER = True
+REQUEST_TIMING_LOG = True # log a line (JSON) with the phase times of each request
+REQUEST_TIMING_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000) # histogram bucket upper bounds
+
+# Slow query log (opasSlowQueryLog): the Solr queries of slow requests, as JSON lines in a rotating file
+SLOW_QUERY_LOG_ENABLED = True
+SLOW_QUERY_THRESHOLD_MS = 2000 # requests which take at least this long (ms) have their queries logged
+SLOW_QUERY_SAMPLE_RATE = 0.0 # and this fraction of the other requests (0 is none)
+SLOW_QUERY_LOG_FILE = "opasSlowQueries.jsonl"
+SLOW_QUERY_LOG_MAX_BYTES = 10000000 # rotated at this size (by the server, when it runs one worker process)
+SLOW_QUERY_LOG_BACKUPS = 5
+SLOW_QUERY_LARGE_PAGE = 100 # rows over this are reported as a large page
+SLOW_QUERY_DEEP_OFFSET = 1000 # start over this is reported as deep paging
+
+# Metrics endpoint (/metrics, opasMetrics)
+METRICS_ENABLED = True
+METRICS_ALLOWED_CLIENTS = ("127.0.0.1", "::1") # client addresses allowed to read the metrics (None for any); behind a proxy, restrict /metrics there too
+
+# In memory dictionaries for classifying smart search input (opasSmartSearchDict)
+SMART_SEARCH_DICT_ENABLED = True
+SMART_SEARCH_DICT_PAGE_SIZE = 5000 # documents per Solr request (cursorMark page) when building the dictionaries
+
+# Bulk (NDJSON) export of search results (fields per EXPORT_FIELDS, below)
+EXPORT_PAGE_SIZE = 1000 # documents per Solr request (cursorMark page)
+EXPORT_MAX_ROWS = 100000 # most documents returned by one export
+
+# Image serving (FlexFileSystem) caches
+IMAGE_EXTENSIONS = (".jpg", ".gif", ".tif") # in the order they are checked when no extension is given
+IMAGE_CACHE_PREWARM = True # fill the image resolver cache from a listing of the image folder at startup
+IMAGE_CACHE_RESOLVER_TTL = 24 * 60 * 60 # seconds to remember where an image id was found (also cleared with a new corpus generation)
+IMAGE_CACHE_RESOLVER_MAX_ENTRIES = 200000 # most resolved image names remembered (least recently used evicted); prewarm adds two per image
+IMAGE_CACHE_NEGATIVE_TTL = 600 # seconds to remember an image id was not found
+IMAGE_CACHE_NEGATIVE_MAX_ENTRIES = 10000 # most image ids not found remembered (least recently used evicted)
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024 # total size of the hot image byte cache
+IMAGE_CACHE_MAX_ITEM_BYTES = 2 * 1024 * 1024 # larger images are not kept in the byte cache
+IMAGE_RENDITION_SUBPATH = "renditions" # folder (within the image folder) where derived renditions are stored
+IMAGE_RENDITION_WIDTHS = (150, 300, 600, 900, 1200) # requested widths are rounded up to one of these
+IMAGE_RENDITION_FORMATS = {"jpg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")} # format: (Pillow format, media type)
+IMAGE_RENDITION_QUALITY = 80
+
+# Server startup: importing main doesn't contact Solr or the database (benchmarks/benchmarkStartup.py checks)
+TEXT_SERVER_VERSION_TIMEOUT = 5 # seconds to wait for Solr's version (for the server status), fetched on first use
+TEXT_SERVER_VERSION_RETRY_INTERVAL = 30 # seconds before asking Solr for its version again, after a failure
+STARTUP_IMPORT_BUDGET = 3.0 # seconds; benchmarkStartup reports importing main taking longer as a failure
+
+# Backend timeouts, retries and circuit breakers (opasCircuitBreaker).  After BREAKER_FAILURE_THRESHOLD
+#  consecutive failures (errors or timeouts) of a backend, its calls fail fast (and caches serve stale
+#  entries, where they have them) for BREAKER_RESET_TIMEOUT seconds; then a trial call is let through.
+SOLR_TIMEOUT = 30 # seconds to connect to Solr, and for each read of a response
+SOLR_RETRIES = 2 # retries of a Solr request which couldn't connect, or lost its connection (not of one that timed out)
+MYSQL_CONNECT_TIMEOUT = 5 # seconds to connect to the database
+MYSQL_READ_TIMEOUT = 30 # seconds for each read of a query result
+MYSQL_CONNECT_RETRIES = 1
+PADS_TIMEOUT = 10 # seconds for a PaDS request
+PADS_RETRIES = 1 # retries of a PaDS request which couldn't connect (not of one that timed out, connecting or reading)
+RETRY_BACKOFF = 0.2 # seconds; retry n waits a random time up to RETRY_BACKOFF * 2**n (full jitter)...
+RETRY_BACKOFF_MAX = 2.0 # ...but no longer than this
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+
+# Server processes (gunicorn_conf.py, and main.py run directly).  Each worker process has its own caches;
+#  see Deployment in the README for how they're kept coherent across workers.
+SERVER_WORKERS = None # worker processes; None for SERVER_WORKERS_PER_CORE per core (at least 2)
+SERVER_WORKERS_PER_CORE = 1
+SERVER_MAX_WORKERS = None # most worker processes, when computed per core (None for no limit)
+SERVER_THREADS = 40 # threads per worker process for the endpoints (and their Solr, database and PaDS calls)
+SERVER_TIMEOUT = 120 # seconds a worker can be unresponsive before it's restarted
+SERVER_GRACEFUL_TIMEOUT = 30 # seconds a worker has to finish its requests when restarted
+SERVER_KEEPALIVE = 5 # seconds to keep an idle client connection open
+
+def server_worker_processes():
+    """
+    Return the number of worker processes running on this machine, from the environment (OPAS_SERVER_WORKERS,
+      set for the workers by gunicorn_conf.py and main.py), else 1.  Per process resources (e.g., the
+      conversion pool) are sized by it to share the machine.
+
+    Read when they're created, not when this module is imported: gunicorn imports it (in gunicorn_conf.py)
+      in the master process, before the environment is set, and the workers are forked from the master.
+    """
+    return max(1, int(os.environ.get("OPAS_SERVER_WORKERS", "1")))
+
 #Standard Values for parameters
 # here anything matching the first 4 characters of type matches.
 DICTLEN_KEY = 'length'
@@ -171,8 +294,11 @@ DESCRIPTION_CITECOUNT = "Find documents cited more than 'X' times (or X TO Y tim
 DESCRIPTION_CITED_MORETHAN = f"Limit to articles cited more than this many times (default={DEFAULT_CITED_MORE_THAN})"
 DESCRIPTION_CLIENT_ID = "Numeric ID assigned to a client app by Opas Administrator"
 DESCRIPTION_CORE = "The preset name for the specif core to use (e.g., docs, authors, etc.)"
+DESCRIPTION_CURSOR = "Continuation token for paging: * for the first page, then the nextCursor from the previous page's responseInfo (offset is then ignored)"
 DESCRIPTION_DAYSBACK = "Number of days to look back to assess what's new"
 DESCRIPTION_DOCDOWNLOADFORMAT = f"The format of the downloaded document data.  One of: {list_values(VALS_DOWNLOADFORMAT)}"
+DESCRIPTION_EXPORTFIELDS = "Comma separated list of the fields to export (metadata fields only), e.g., art_id, art_citeas_xml, art_year"
+DESCRIPTION_EXPORTLIMIT = "Maximum number of documents to export"
 DESCRIPTION_DOCIDORPARTIAL = "The document ID (e.g., IJP.077.0217A) or a partial ID (e.g., IJP.077,  no wildcard) for which to return data"
 DESCRIPTION_ENDDATE = "Find records on or before this date (input date as 2020-08-10 or 20200810)"
 DESCRIPTION_ENDYEAR = "Find documents published on or before this year (e.g, 2001)" 
@@ -181,6 +307,8 @@ DESCRIPTION_FULLTEXT1 = "Words or phrases (in quotes) across the document (boole
 DESCRIPTION_FULLTEXT1_V1 = "Words or phrases (in quotes) in a paragraph in the document."
 DESCRIPTION_GLOSSARYID = "The glossary ID (e.g., YN0011849316410) or a partial ID and wildcard (e.g., YN*) for which to return data"
 DESCRIPTION_IMAGEID = "A unique identifier for an image"
+DESCRIPTION_IMAGEWIDTH = f"Return a rendition of the image no wider than this (rounded up to one of {IMAGE_RENDITION_WIDTHS}).  Omit for the original image"
+DESCRIPTION_IMAGEFORMAT = f"Return a rendition of the image in this format (One of: {', '.join(IMAGE_RENDITION_FORMATS.keys())}).  Omit for the original image"
 DESCRIPTION_ISSUE = "The issue number if the source has one"
 DESCRIPTION_LIMIT = "Number of items to return."
 DESCRIPTION_MOST_CITED_PERIOD = f"Most cited articles from this time period (years: {list_values(VALS_YEAROPTIONS)})"
@@ -230,14 +358,19 @@ TITLE_CITECOUNT = "Find Documents cited this many times"
 TITLE_CITED_MORETHAN = "Cited more than this many times"
 TITLE_CLIENT_ID = "Client App Numeric ID"
 TITLE_CORE = "Core to use"
+TITLE_CURSOR = "Paging continuation token"
 TITLE_DAYSBACK = "Days Back"
 TITLE_DOCUMENT_ID = "Document ID or Partial ID"
+TITLE_EXPORTFIELDS = "Fields to export"
+TITLE_EXPORTLIMIT = "Export limit"
 TITLE_ENDDATE = "End date"
 TITLE_ENDYEAR = "End year"
 TITLE_FACETFIELDS = "List of field names for faceting"
 TITLE_FULLTEXT1 = "Document-wide search"
 TITLE_FULLTEXT1_V1 = "Paragraph based search"
 TITLE_IMAGEID = "Image ID (unique)"
+TITLE_IMAGEWIDTH = "Maximum image width"
+TITLE_IMAGEFORMAT = "Image rendition format"
 TITLE_ISSUE = "Issue Number"
 TITLE_LIMIT = "Document return limit"
 TITLE_MOST_CITED_PERIOD = "Most cited articles"
@@ -305,12 +438,15 @@ ENDPOINT_SUMMARY_MOST_VIEWED = "Return the most viewed journal articles publishe
 ENDPOINT_SUMMARY_OPEN_API = "Return the OpenAPI specification for this API"
 ENDPOINT_SUMMARY_SEARCH_ADVANCED = "Advanced document search directly using OPAS schemas with OPAS return structures"
 ENDPOINT_SUMMARY_SEARCH_ANALYSIS = "Analyze search and return term/clause counts"
+ENDPOINT_SUMMARY_SEARCH_EXPORT = "Export all the search results (selected fields) as newline delimited JSON (NDJSON)"
 ENDPOINT_SUMMARY_SEARCH_MORE_LIKE_THESE = "Full Search implementation, but expand the results to include 'More like these'"
 ENDPOINT_SUMMARY_SEARCH_PARAGRAPHS = "Search at the paragraph (lowest) level by paragraph scope (doc, dreams, ...)"
 ENDPOINT_SUMMARY_SEARCH_V1 = "Search at the paragraph level by document zone (API v1 backwards compatible)"
 ENDPOINT_SUMMARY_SEARCH_V2 = "Full search implementation, at the document or paragraph level"
 ENDPOINT_SUMMARY_SEARCH_V3 = "Full search implementation, at the document or paragraph level with body (termlist)"
 ENDPOINT_SUMMARY_SERVER_STATUS = "Return the server status"
+ENDPOINT_SUMMARY_METRICS = "Return the server metrics (Prometheus text format)"
+ENDPOINT_SUMMARY_SLOW_QUERIES = "Report on the slow query log: slow requests' Solr queries by route and query feature, and the slowest (Restricted)"
 ENDPOINT_SUMMARY_SOURCE_NAMES = "Return a list of available sources"
 ENDPOINT_SUMMARY_SUBSCRIBE_USER = "Add a new publication subscription for a user (Restricted)"
 ENDPOINT_SUMMARY_TERM_COUNTS = "Get term frequency counts"
@@ -460,6 +596,10 @@ DOCUMENT_ITEM_STAT_FIELDS = "art_id, \
                              reference_count, \
                              score"
 
+# Fields which can be exported (metadata only; never the text), and the default export fields
+EXPORT_FIELDS = [field.strip() for field in DOCUMENT_ITEM_SUMMARY_FIELDS.split(",") if field.strip() not in ("para", "parent_tag")]
+EXPORT_DEFAULT_FIELDS = "art_id, art_citeas_xml, art_authors, art_title, art_sourcecode, art_year, art_vol, art_iss, art_pgrg, art_doi"
+
 # for Glossary Core
 GLOSSARY_ITEM_DEFAULT_FIELDS = """
                                 art_id,
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OPAS - gunicorn settings for running the API with several worker processes (uvicorn workers)
+
+    gunicorn -c gunicorn_conf.py main:app
+
+The Docker image (tiangolo/uvicorn-gunicorn-fastapi) uses this file (/app/gunicorn_conf.py) when
+  it's there.  As with the image's own settings, the environment overrides the defaults:
+
+    WEB_CONCURRENCY     worker processes (else opasConfig.SERVER_WORKERS, else per core)
+    WORKERS_PER_CORE    worker processes per core (opasConfig.SERVER_WORKERS_PER_CORE)
+    MAX_WORKERS         most worker processes, when computed per core (opasConfig.SERVER_MAX_WORKERS)
+    BIND, or HOST/PORT  address to listen on (0.0.0.0:80)
+    TIMEOUT, GRACEFUL_TIMEOUT, KEEP_ALIVE, LOG_LEVEL
+
+The threads of each worker (for the endpoints) are set by opasConfig.SERVER_THREADS.
+
+The app isn't preloaded: each worker imports main itself (importing main has no side effects),
+  so connections, threads and process pools are always the worker's own, never shared
+  with the master over a fork.
+
+"""
+import os
+import sys
+import multiprocessing
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "config"))
+import opasConfig
+
+def worker_count():
+    """
+    Return the number of worker processes, per the environment, else opasConfig
+    """
+    if os.getenv("WEB_CONCURRENCY"):
+        return max(1, int(os.getenv("WEB_CONCURRENCY")))
+    if opasConfig.SERVER_WORKERS is not None and not os.getenv("WORKERS_PER_CORE"):
+        return max(1, opasConfig.SERVER_WORKERS)
+
+    per_core = float(os.getenv("WORKERS_PER_CORE", opasConfig.SERVER_WORKERS_PER_CORE))
+    ret_val = max(2, int(per_core * multiprocessing.cpu_count()))
+    max_workers = os.getenv("MAX_WORKERS", opasConfig.SERVER_MAX_WORKERS)
+    if max_workers is not None:
+        ret_val = min(ret_val, int(max_workers))
+
+    return ret_val
+
+workers = worker_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND") or f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '80')}"
+preload_app = False
+timeout = int(os.getenv("TIMEOUT", opasConfig.SERVER_TIMEOUT))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", opasConfig.SERVER_GRACEFUL_TIMEOUT))
+keepalive = int(os.getenv("KEEP_ALIVE", opasConfig.SERVER_KEEPALIVE))
+loglevel = os.getenv("LOG_LEVEL", "info")
+errorlog = "-"
+# so each worker sizes its per process resources to share the machine (opasConfig.server_worker_processes).
+#  Also set here, in the master, which the workers are forked from: raw_env is only applied later.
+os.environ["OPAS_SERVER_WORKERS"] = str(workers)
+raw_env = [f"OPAS_SERVER_WORKERS={workers}"]
@@ -9,11 +9,18 @@
 # This is the old way -- should switch to class Solr per https://pythonhosted.org/solrpy/reference.html
 #
 #from solrq import Q
+import threading
 import solrpy as solr
-import pysolr
-# import opasConfig
+import opasConfig
 from localsecrets import SOLRUSER, SOLRPW, SOLRURL
 
+# every connection times out, and retries (with jittered backoff) requests which lose their connection;
+#  failing requests open the Solr circuit breaker (opasCircuitBreaker), so calls fail fast while it's down
+SOLR_CONNECTION_OPTIONS = {"timeout": opasConfig.SOLR_TIMEOUT,
+                           "max_retries": opasConfig.SOLR_RETRIES,
+                           "retry_backoff": opasConfig.RETRY_BACKOFF,
+                           "retry_backoff_max": opasConfig.RETRY_BACKOFF_MAX}
+
 # These are the solr database names used
 SOLR_DOCS = "pepwebdocs"
 # SOLR_DOCPARAS = "pepwebdocparas"  # For testing workaround for paragraph search
@@ -22,37 +29,55 @@ SOLR_AUTHORS = "pepwebauthors"
 SOLR_GLOSSARY = "pepwebglossary"
 
 if SOLRUSER is not None:
-    solr_docs = solr.SolrConnection(SOLRURL + SOLR_DOCS, http_user=SOLRUSER, http_pass=SOLRPW)
+    solr_docs = solr.SolrConnection(SOLRURL + SOLR_DOCS, http_user=SOLRUSER, http_pass=SOLRPW, **SOLR_CONNECTION_OPTIONS)
     solr_docs_term_search = solr.SearchHandler(solr_docs, "/terms")
     #not used anymore
     #solr_refs = solr.SolrConnection(SOLRURL + opasConfig.SOLR_REFS, http_user=SOLRUSER, http_pass=SOLRPW)
-    solr_gloss = solr.SolrConnection(SOLRURL + SOLR_GLOSSARY, http_user=SOLRUSER, http_pass=SOLRPW)
-    solr_authors = solr.SolrConnection(SOLRURL + SOLR_AUTHORS, http_user=SOLRUSER, http_pass=SOLRPW)
+    solr_gloss = solr.SolrConnection(SOLRURL + SOLR_GLOSSARY, http_user=SOLRUSER, http_pass=SOLRPW, **SOLR_CONNECTION_OPTIONS)
+    solr_authors = solr.SolrConnection(SOLRURL + SOLR_AUTHORS, http_user=SOLRUSER, http_pass=SOLRPW, **SOLR_CONNECTION_OPTIONS)
     solr_authors_term_search = solr.SearchHandler(solr_authors, "/terms")
     solr_like_this = solr.SearchHandler(solr_authors, "/mlt")
 else:
-    solr_docs = solr.SolrConnection(SOLRURL + SOLR_DOCS)
+    solr_docs = solr.SolrConnection(SOLRURL + SOLR_DOCS, **SOLR_CONNECTION_OPTIONS)
     solr_docs_term_search = solr.SearchHandler(solr_docs, "/terms")
     
     #not used anymore
     #solr_refs = solr.SolrConnection(SOLRURL + opasConfig.SOLR_REFS)
-    solr_gloss = solr.SolrConnection(SOLRURL + SOLR_GLOSSARY, http_user=SOLRUSER, http_pass=SOLRPW)
-    solr_authors = solr.SolrConnection(SOLRURL + SOLR_AUTHORS, http_user=SOLRUSER, http_pass=SOLRPW)
+    solr_gloss = solr.SolrConnection(SOLRURL + SOLR_GLOSSARY, http_user=SOLRUSER, http_pass=SOLRPW, **SOLR_CONNECTION_OPTIONS)
+    solr_authors = solr.SolrConnection(SOLRURL + SOLR_AUTHORS, http_user=SOLRUSER, http_pass=SOLRPW, **SOLR_CONNECTION_OPTIONS)
     solr_authors_term_search = solr.SearchHandler(solr_authors, "/terms")
     solr_like_this = solr.SearchHandler(solr_authors, "/mlt")
 
-if SOLRUSER is not None and SOLRPW is not None:
-    solr_docs2 = pysolr.Solr(SOLRURL + SOLR_DOCS, auth=(SOLRUSER, SOLRPW))
-    solr_gloss2 = pysolr.Solr(SOLRURL + SOLR_GLOSSARY, auth=(SOLRUSER, SOLRPW))
-    solr_authors2 = pysolr.Solr(SOLRURL + SOLR_AUTHORS, auth=(SOLRUSER, SOLRPW))
-    solr_authors_term_search2 = pysolr.Solr(solr_authors, "/terms")
-    solr_like_this2 = pysolr.Solr(solr_authors, "/mlt")
-else: #  no user and password needed
-    solr_docs2 = pysolr.Solr(SOLRURL + SOLR_DOCS)
-    solr_gloss2 = pysolr.Solr(SOLRURL + SOLR_GLOSSARY)
-    solr_authors2 = pysolr.Solr(SOLRURL + SOLR_AUTHORS)
-    solr_authors_term_search2 = pysolr.Solr(solr_authors, "/terms")
-    solr_like_this2 = pysolr.Solr(solr_authors, "/mlt")
+# pysolr clients (core, search handler), created (and pysolr imported) on first use, since the
+#  server uses the solrpy connections above; the solrpy connections don't connect until used.
+PYSOLR_CLIENTS = {
+    "solr_docs2": (SOLR_DOCS, "select"),
+    "solr_gloss2": (SOLR_GLOSSARY, "select"),
+    "solr_authors2": (SOLR_AUTHORS, "select"),
+    "solr_authors_term_search2": (SOLR_AUTHORS, "terms"),
+    "solr_like_this2": (SOLR_AUTHORS, "mlt"),
+}
+pysolr_clients_lock = threading.Lock()
+
+def __getattr__(name):
+    """
+    Return the pysolr client for a name in PYSOLR_CLIENTS, creating it on first use
+    """
+    if name not in PYSOLR_CLIENTS:
+        raise AttributeError(f"module {__name__} has no attribute {name}")
+
+    with pysolr_clients_lock:
+        ret_val = globals().get(name)
+        if ret_val is None:
+            import pysolr
+            core, search_handler = PYSOLR_CLIENTS[name]
+            if SOLRUSER is not None and SOLRPW is not None:
+                ret_val = pysolr.Solr(SOLRURL + core, search_handler=search_handler, auth=(SOLRUSER, SOLRPW), timeout=opasConfig.SOLR_TIMEOUT)
+            else: #  no user and password needed
+                ret_val = pysolr.Solr(SOLRURL + core, search_handler=search_handler, timeout=opasConfig.SOLR_TIMEOUT)
+            globals()[name] = ret_val
+
+    return ret_val
 
 
 # define cores for ExtendedSearch
@@ -63,6 +88,37 @@ EXTENDED_CORES = {
     "pepwebauthors_terms": solr_authors_term_search,
 }
 
+# solrpy connections hold a single http connection, so they can't be shared between threads;
+# code running requests in its own worker threads should use a connection per thread
+thread_local = threading.local()
+
+def solr_connection(core=SOLR_DOCS):
+    """
+    Return a new (unshared) connection to the core
+    """
+    if SOLRUSER is not None:
+        ret_val = solr.SolrConnection(SOLRURL + core, http_user=SOLRUSER, http_pass=SOLRPW, **SOLR_CONNECTION_OPTIONS)
+    else:
+        ret_val = solr.SolrConnection(SOLRURL + core, **SOLR_CONNECTION_OPTIONS)
+
+    return ret_val
+
+def thread_solr_term_search(core=SOLR_DOCS):
+    """
+    Return a /terms handler for the core, on a connection of the calling thread's own
+    """
+    try:
+        handlers = thread_local.term_search
+    except AttributeError:
+        handlers = thread_local.term_search = {}
+
+    try:
+        ret_val = handlers[core]
+    except KeyError:
+        ret_val = handlers[core] = solr.SearchHandler(solr_connection(core), "/terms")
+
+    return ret_val
+
 def direct_endpoint_call(endpoint, base_api=None):
     if base_api == None:
         base_api = SOLRURL
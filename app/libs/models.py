@@ -92,6 +92,7 @@ class ResponseInfo(BaseModel):
     count: int = Schema(0, title="The number of returned items in the accompanying ResponseSet list.")
     limit: int = Schema(0, title="The limit set by the API client for the ResponseSet list.")
     offset: int = Schema(None, title="The offset the ResponseSet list begins as requested by the client to index into the full set of results, i.e., for paging through the full set.")
+    nextCursor: str = Schema(None, title="If the request was paged by cursor, the cursor to request the next page with; None when there are no more results.")
     page: int = Schema(None, title="If the request for a document was for a specific page number, the page number is listed here.  Offset will then reflect the relative page number from the start of the document.")
     fullCount: int = Schema(None, title="The number of items that could be returned without a limit set.")
     fullCountComplete: bool = Schema(None, title="How many matches 'theoretically' matched, though they cannot be returned for some reason, such as a search engine limitation on returned data.")
@@ -386,6 +387,10 @@ class ServerStatusItem(BaseModel):
     text_server_url: str= Schema(None, title="Current SOLR URL")
     cors_regex: str= Schema(None, title="Current CORS Regex")
     db_server_url: str= Schema(None, title="Current DB URL")
+    term_indexes: list = Schema(None, title="In memory term indexes and smart search dictionaries (size, bytes used)")
+    caches: list = Schema(None, title="Result caches (name, backend, entries, hits, misses, stale hits, hit rate)")
+    backends: list = Schema(None, title="Backend circuit breakers (name, state, consecutive failures, times opened, retry in)")
+    timings: list = Schema(None, title="Request phase times per route (count, mean, p50, p95, p99 in ms)")
 
 #-------------------------------------------------------
 
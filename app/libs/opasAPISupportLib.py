@@ -35,10 +35,36 @@ Also, some of these functions are reused in different API calls.
                 # rather than using the values from the database, as before.  Moving the data to Solr allows these values to be
                 # integrated with a solr query.
 
+    #2026.1019.1 Page extraction and HTML, ePub and PDF conversions in get_fulltext_from_search_results and
+                # prep_document_download go through opasConversionExecutor.run_conversion, so they can run in
+                # a process pool (opasConfig.CONVERSION_POOL_ENABLED) rather than hold the GIL in the server worker.
+                # If the pool doesn't return a conversion in time, it's done inline (the format requested is kept).
+                # Hit marker replacement (KWIC and full-text anchors) uses the precompiled single pass functions
+                # in opasXMLHelper; removed numbered_anchors and its global count_anchors (not thread safe).
+                # search_analysis counts all the clauses in one Solr request (facet.query per clause).
+                # get_term_count_list counts a list of terms in one terms.list request, with wildcard terms
+                # expanded concurrently, and caches the counts for the corpus generation (opasCorpusCache).
+                # get_term_index and authors_get_author_info use the in memory prefix indexes (opasTermIndex)
+                # when there's one for the field.
+                # database_get_most_cited and database_get_most_viewed are served from leaderboards materialized
+                # per corpus generation, when the filters allow (source codes are applied as a post-filter).
+                # database_get_whats_new is served from a feed kept per (days_back, source_type) and corpus generation.
+                # Pages past the feed's depth (opasConfig.WHATS_NEW_DEPTH) are searched (query_whats_new).
+                # search_text_qs, metadata_get_contents and authors_get_author_publications support cursor paging
+                # (Solr cursorMark, with id as the sort tiebreak), returning responseInfo.nextCursor.
+                # search_export streams all the results of a search, as NDJSON, a cursorMark page at a time.
+                # search_text_qs caches results (other than full-text returns) per query and corpus generation, and
+                # applies the access limitations for the session to the cached results (apply_access_limitations).
+                # get_session_info is timed as the session phase of the request (opasRequestTiming).
+                # search_text_qs notes its Solr query for the slow query log (opasSlowQueryLog).
+                # get_text_server_version gets the Solr version on first use (main used to at import).
+                # get_text_server_version doesn't call Solr while its circuit breaker (opasCircuitBreaker) is open.
+                # get_text_server_version waits TEXT_SERVER_VERSION_RETRY_INTERVAL after a failure before asking Solr again.
+
 __author__      = "Neil R. Shapiro"
 __copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
 __license__     = "Apache 2.0"
-__version__     = "2020.0601.1"
+__version__     = "2026.1019.1"
 __status__      = "Development"
 
 import os
@@ -51,6 +77,7 @@ sys.path.append('./libs/configLib')
 
 # print(os.getcwd())
 import http.cookies
+import http.client
 import re
 import secrets
 import socket, struct
@@ -65,6 +92,10 @@ from starlette.responses import Response
                                 #HTTP_500_INTERNAL_SERVER_ERROR, \
                                 #HTTP_503_SERVICE_UNAVAILABLE
 import time
+import json
+import concurrent.futures
+import requests
+from requests.auth import HTTPBasicAuth
 # used this name because later we needed to refer to the module, and datetime is also the name
 #  of the import from datetime.
 import datetime as dtime 
@@ -86,6 +117,7 @@ from localsecrets import BASEURL, SOLRURL, SOLRUSER, SOLRPW, DEBUG_DOCUMENTS, SO
 # from opasConfig import OPASSESSIONID
 # import configLib.opasCoreConfig as opasCoreConfig
 from configLib.opasCoreConfig import solr_docs, solr_authors, solr_gloss, solr_docs_term_search, solr_authors_term_search
+from configLib.opasCoreConfig import thread_solr_term_search, solr_connection, SOLR_DOCS
 from stdMessageLib import COPYRIGHT_PAGE_HTML  # copyright page text to be inserted in ePubs and PDFs
 from configLib.opasCoreConfig import EXTENDED_CORES
 
@@ -104,22 +136,35 @@ from lxml import etree
 from pydantic import ValidationError
 
 # from ebooklib import epub              # for HTML 2 EPUB conversion
-from xhtml2pdf import pisa             # for HTML 2 PDF conversion
+# from xhtml2pdf import pisa             # for HTML 2 PDF conversion (now in opasXMLHelper.html_to_pdf)
 
 # note: documents and documentList share the same internals, except the first level json label (documents vs documentlist)
 import models
 
 import opasXMLHelper as opasxmllib
+from opasConversionExecutor import run_conversion
 import opasQueryHelper
 import opasGenSupportLib as opasgenlib
 import opasCentralDBLib
+import opasCircuitBreaker
 import schemaMap
 import opasDocPermissions as opasDocPerm
-
-count_anchors = 0
+import opasCorpusCache
+import opasRequestTiming
+import opasSlowQueryLog
+import opasTermIndex
 
 TIME_FORMAT_STR = '%Y-%m-%dT%H:%M:%SZ'
 
+# term counts only change when the corpus is reloaded
+term_count_cache = opasCorpusCache.GenerationCache("term counts")
+term_count_executor = concurrent.futures.ThreadPoolExecutor(max_workers=opasConfig.TERM_COUNT_WILDCARD_WORKERS, thread_name_prefix="termcount")
+# materialized most cited and most viewed lists, kept until the corpus generation changes
+leaderboard_cache = opasCorpusCache.GenerationCache("leaderboards", max_entries=opasConfig.LEADERBOARD_MAX_ENTRIES)
+whats_new_cache = opasCorpusCache.GenerationCache("whats new", max_entries=opasConfig.WHATS_NEW_CACHE_MAX_ENTRIES)
+# search results (without the per session access limitations), per query
+search_result_cache = opasCorpusCache.GenerationCache("search results", max_entries=opasConfig.SEARCH_RESULT_CACHE_MAX_ENTRIES)
+
 def authorized(session_info, art_id):
     if session_info.authenticated == True:
         ret_val = True
@@ -141,28 +186,6 @@ def get_basecode(document_id):
 
     return ret_val
 #-----------------------------------------------------------------------------
-def numbered_anchors(matchobj):
-    """
-    Called by re.sub on replacing anchor placeholders for HTML output.  This allows them to be numbered as they are replaced.
-    """
-    global count_anchors
-    JUMPTOPREVHIT = f"""<a onclick='scrollToAnchor("hit{count_anchors}");event.preventDefault();'>🡄</a>"""
-    JUMPTONEXTHIT = f"""<a onclick='scrollToAnchor("hit{count_anchors+1}");event.preventDefault();'>🡆</a>"""
-
-    if matchobj.group(0) == opasConfig.HITMARKERSTART:
-        count_anchors += 1
-        if count_anchors > 1:
-            #return f"<a name='hit{count_anchors}'><a href='hit{count_anchors-1}'>🡄</a>{opasConfig.HITMARKERSTART_OUTPUTHTML}"
-            return f"<a name='hit{count_anchors}'>{JUMPTOPREVHIT}{opasConfig.HITMARKERSTART_OUTPUTHTML}"
-        elif count_anchors <= 1:
-            return f"<a name='hit{count_anchors}'> "
-    if matchobj.group(0) == opasConfig.HITMARKEREND:
-        return f"{opasConfig.HITMARKEREND_OUTPUTHTML}{JUMPTONEXTHIT}"
-
-    else:
-        return matchobj.group(0)
-
-#-----------------------------------------------------------------------------
 def get_max_age(keep_active=False):
     if keep_active:    
         ret_val = opasConfig.COOKIE_MAX_KEEP_TIME    
@@ -214,6 +237,7 @@ def get_max_age(keep_active=False):
     #return ret_val
 
 #-----------------------------------------------------------------------------
+@opasRequestTiming.timed("session")
 def get_session_info(request: Request,
                      response: Response, 
                      access_token=None,
@@ -397,6 +421,45 @@ def get_expiration_time(request):
     ret_val = request.cookies.get(opasConfig.OPASEXPIRES, None)
     return ret_val
 #-----------------------------------------------------------------------------
+text_server_version = None
+text_server_version_retry_at = 0 # after a failure, Solr isn't asked again until then (time.time())
+
+def get_text_server_version():
+    """
+    Return the Solr (Lucene) version, from Solr on the first call (and later calls, until Solr answers),
+      or None if Solr can't be reached (or its circuit breaker is open).
+
+    After a failure, None is returned without asking Solr for opasConfig.TEXT_SERVER_VERSION_RETRY_INTERVAL seconds.
+    This blocks (up to opasConfig.TEXT_SERVER_VERSION_TIMEOUT), so call it from async code via run_in_threadpool.
+    """
+    global text_server_version, text_server_version_retry_at
+    if text_server_version is None \
+       and time.time() >= text_server_version_retry_at \
+       and not opasCircuitBreaker.get_breaker("solr").is_open():
+        url = f"{localsecrets.SOLRURL}admin/info/system"
+        try:
+            if localsecrets.SOLRUSER is not None:
+                r = requests.get(url, params={'wt':'json'}, auth=HTTPBasicAuth(localsecrets.SOLRUSER, localsecrets.SOLRPW),
+                                 timeout=opasConfig.TEXT_SERVER_VERSION_TIMEOUT)
+            else:
+                r = requests.get(url, params={'wt':'json'}, timeout=opasConfig.TEXT_SERVER_VERSION_TIMEOUT)
+        except requests.RequestException as e:
+            logger.warning(f"Could not get the text server version ({e})")
+        else:
+            if r.status_code == 200:
+                ver_json = r.json()
+                try:
+                    text_server_version = ver_json["lucene"]["lucene-spec-version"]
+                except KeyError:
+                    text_server_version = ver_json["lucene"]["solr-spec-version"]
+            else:
+                logger.warning(f"Could not get the text server version (status {r.status_code})")
+
+        if text_server_version is None:
+            text_server_version_retry_at = time.time() + opasConfig.TEXT_SERVER_VERSION_RETRY_INTERVAL
+
+    return text_server_version
+
 def check_solr_docs_connection():
     """
     Queries the solrDocs core (i.e., pepwebdocs) to see if the server is up and running.
@@ -493,6 +556,111 @@ def force_string_return_from_various_return_types(text_str, min_length=5):
 
     return ret_val        
 
+#-----------------------------------------------------------------------------
+def get_leaderboard(key, solr_query_spec, req_url=None):
+    """
+    Return the materialized (most cited or most viewed) leaderboard for key, a tuple of
+      (responseInfo, list of DocumentListItems), the top opasConfig.LEADERBOARD_DEPTH items of
+      the search.  It's computed on first use, and kept until the corpus generation changes
+      (e.g., after a load, or update_views_data).  None if the search fails.
+
+    The items don't have the user's access limitations; those are set per request.
+    """
+    ret_val = leaderboard_cache.get(key)
+    if ret_val is None:
+        results, ret_status = search_text_qs(solr_query_spec, 
+                                             limit=opasConfig.LEADERBOARD_DEPTH,
+                                             offset=0,
+                                             req_url = req_url, 
+                                             session_info=None
+                                            )
+        if isinstance(results, models.DocumentList):
+            ret_val = (results.documentList.responseInfo, results.documentList.responseSet)
+            leaderboard_cache.set(key, ret_val)
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def leaderboard_source_codes(source_code):
+    """
+    Return the set of source codes to filter a leaderboard by, if source_code is a code
+      or list of codes (code OR code), or None if it can't be used as a post-filter (e.g., a name)
+
+    >>> sorted(leaderboard_source_codes("ijp OR ANIJP-EL"))
+    ['ANIJP-EL', 'IJP']
+    >>> leaderboard_source_codes("Int*") is None
+    True
+    """
+    ret_val = None
+    if source_code is not None:
+        codes = {code.strip() for code in source_code.upper().split(" OR ")}
+        if all(re.fullmatch("[A-Z0-9\-]+", code) for code in codes):
+            ret_val = codes
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def apply_access_limitations(document_list_items, session_info, limit):
+    """
+    Fill in the access limitation fields of the document list items for the session (in place).
+    
+    Not done for large (limit) lists, where it's too costly.
+    """
+    if limit < opasConfig.MAX_RECORDS_FOR_ACCESS_INFO_RETURN:
+        for item in document_list_items:
+            opasDocPerm.get_access_limitations( doc_id=item.documentID, 
+                                                classification=item.accessClassification, 
+                                                year=item.year,
+                                                doi=item.doi, 
+                                                session_info=session_info, 
+                                                documentListItem=item) # will updated accessLimited fields in item
+
+#-----------------------------------------------------------------------------
+def leaderboard_document_list(leaderboard, source_codes=None, limit=10, offset=0, req_url=None, session_info=None):
+    """
+    Return a DocumentList of the leaderboard items (optionally only those from source_codes) from offset,
+      with the access limitations for the session.  None if the leaderboard doesn't go deep enough for the
+      request, and it should be a search.
+
+    When a truncated leaderboard is filtered by source_codes, the number of matches isn't known, so
+      fullCount and totalMatchCount are left unset (and fullCountComplete is False).
+    """
+    ret_val = None
+    response_info, items = leaderboard
+    truncated = response_info.fullCount is None or response_info.fullCount > len(items)
+    if source_codes is not None:
+        items = [item for item in items if item.PEPCode in source_codes]
+        # nothing could also mean a source name, rather than code
+        if items == []:
+            return None
+
+    if not truncated or len(items) >= offset + limit:
+        if source_codes is None:
+            full_count = response_info.fullCount
+        elif not truncated:
+            full_count = len(items)
+        else:
+            # matches beyond the leaderboard's depth weren't kept, so the filtered total is unknown
+            full_count = None
+        document_list_items = [item.copy() for item in items[offset:offset + limit]]
+        apply_access_limitations(document_list_items, session_info, limit)
+
+        response_info = response_info.copy(update={"count": len(document_list_items),
+                                                   "fullCount": full_count,
+                                                   "totalMatchCount": full_count, 
+                                                   "fullCountComplete": not truncated and full_count is not None and limit >= full_count, 
+                                                   "limit": limit,
+                                                   "offset": offset,
+                                                   "request": f"{req_url}",
+                                                   "timeStamp": datetime.utcfromtimestamp(time.time()).strftime(TIME_FORMAT_STR)
+                                                  })
+        document_list_struct = models.DocumentListStruct( responseInfo = response_info, 
+                                                          responseSet = document_list_items
+                                                          )
+        ret_val = models.DocumentList(documentList = document_list_struct)
+
+    return ret_val
+
 #-----------------------------------------------------------------------------
 def database_get_most_viewed( publication_period: int=5,
                               author: str=None,
@@ -556,7 +724,27 @@ def database_get_most_viewed( publication_period: int=5,
         field_set = "STAT"
     else:
         field_set = None
-        
+
+    # served from the materialized leaderboard, unless there are filters which need a search
+    source_codes = leaderboard_source_codes(source_code)
+    if author is None and title is None and source_name is None and (source_code is None or source_codes is not None):
+        leaderboard_key = ("most viewed", view_period, more_than, source_type, start_year, abstract_requested, field_set, sort)
+        leaderboard_spec = \
+            opasQueryHelper.parse_search_query_parameters(viewcount=more_than, 
+                                                          viewperiod=view_period, 
+                                                          source_type=source_type,
+                                                          startyear=start_year,
+                                                          abstract_requested=abstract_requested,
+                                                          return_field_set=field_set, 
+                                                          sort = sort,
+                                                          req_url = req_url
+            )
+        leaderboard = get_leaderboard(leaderboard_key, leaderboard_spec, req_url=req_url)
+        if leaderboard is not None:
+            ret_val = leaderboard_document_list(leaderboard, source_codes=source_codes, limit=limit, offset=offset, req_url=req_url, session_info=session_info)
+            if ret_val is not None:
+                return ret_val
+
     solr_query_spec = \
         opasQueryHelper.parse_search_query_parameters(viewcount=more_than, 
                                                       viewperiod=view_period, 
@@ -636,6 +824,25 @@ def database_get_most_cited( publication_period: int=None,   # Limit the conside
         field_set = "STAT"
     else:
         field_set = None
+
+    # served from the materialized leaderboard, unless there are filters which need a search
+    source_codes = leaderboard_source_codes(source_code)
+    if author is None and title is None and source_name is None and (source_code is None or source_codes is not None):
+        leaderboard_key = ("most cited", period, more_than, source_type, start_year, abstract_requested, field_set, sort)
+        leaderboard_spec = \
+            opasQueryHelper.parse_search_query_parameters(citecount=cite_count, 
+                                                          source_type=source_type, 
+                                                          startyear=start_year,
+                                                          return_field_set=field_set, 
+                                                          abstract_requested=abstract_requested, 
+                                                          sort = sort,
+                                                          req_url = req_url
+                                                        )
+        leaderboard = get_leaderboard(leaderboard_key, leaderboard_spec, req_url=req_url)
+        if leaderboard is not None:
+            ret_val = leaderboard_document_list(leaderboard, source_codes=source_codes, limit=limit, offset=offset, req_url=req_url, session_info=session_info)
+            if ret_val is not None:
+                return ret_val, (200, "OK")
     
     solr_query_spec = \
         opasQueryHelper.parse_search_query_parameters(citecount=cite_count, 
@@ -662,18 +869,31 @@ def database_get_most_cited( publication_period: int=None,   # Limit the conside
     return ret_val, ret_status   
 
 #-----------------------------------------------------------------------------
-def database_get_whats_new(days_back=7,
-                           limit=opasConfig.DEFAULT_LIMIT_FOR_WHATS_NEW,
-                           req_url:str=None,
-                           source_type="journal",
-                           offset=0,
-                           session_info=None):
+def get_whats_new_feed(days_back=7, source_type="journal"):
     """
-    Return what JOURNALS have been updated in the last week
+    Return the What's New feed, a tuple of (number found, list of WhatsNewListItems) for the
+      most recently updated volumes (up to opasConfig.WHATS_NEW_DEPTH).
 
-    >>> result = database_get_whats_new()
+    The feed is kept until the corpus generation changes (or the day changes, since
+      the feed is for the last days_back days).  None if the search fails.
+    """
+    key = (days_back, source_type, datetime.utcnow().strftime('%Y-%m-%d'))
+    ret_val = whats_new_cache.get(key)
+    if ret_val is not None:
+        return ret_val
 
-    """    
+    ret_val = query_whats_new(days_back=days_back, source_type=source_type, limit=opasConfig.WHATS_NEW_DEPTH)
+    if ret_val is not None:
+        whats_new_cache.set(key, ret_val)
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def query_whats_new(days_back=7, source_type="journal", limit=opasConfig.WHATS_NEW_DEPTH, offset=0):
+    """
+    Return a tuple of (number found, list of WhatsNewListItems) for the volumes updated in the
+      last days_back days, from offset, most recently updated first.  None if the search fails.
+    """
     field_list = "art_id, title, art_vol, art_iss, art_sourcecode, file_last_modified, timestamp, art_sourcetype"
     sort_by = "file_last_modified"
 
@@ -689,21 +909,10 @@ def database_get_whats_new(days_back=7,
         # logger.debug("databaseWhatsNew Number found: %s", results._numFound)
     except Exception as e:
         logger.error(f"Solr Search Exception: {e}")
-
-    response_info = models.ResponseInfo( count = len(results.results),
-                                         fullCount = results._numFound,
-                                         limit = limit,
-                                         offset = offset,
-                                         listType="newlist",
-                                         fullCountComplete = limit >= results._numFound,
-                                         request=f"{req_url}",
-                                         timeStamp = datetime.utcfromtimestamp(time.time()).strftime(TIME_FORMAT_STR)                     
-                                         )
-
+        return None
 
     whats_new_list_items = []
-    row_count = 0
-    already_seen = []
+    already_seen = set()
     for result in results:
         PEPCode = result.get("art_sourcecode", None)
         #if PEPCode is None or PEPCode in ["SE", "GW", "ZBK", "IPL"]:  # no books
@@ -724,7 +933,7 @@ def database_get_whats_new(days_back=7,
         if display_title in already_seen:
             continue
         else:
-            already_seen.append(display_title)
+            already_seen.add(display_title)
         volume_url = "/v1/Metadata/Contents/%s/%s" % (PEPCode, issue)
         
 
@@ -740,11 +949,48 @@ def database_get_whats_new(days_back=7,
                                         updated = updated
                                         ) 
         whats_new_list_items.append(item)
-        row_count += 1
-        if row_count > limit:
-            break
 
-    response_info.count = len(whats_new_list_items)
+    ret_val = (results._numFound, whats_new_list_items)
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def database_get_whats_new(days_back=7,
+                           limit=opasConfig.DEFAULT_LIMIT_FOR_WHATS_NEW,
+                           req_url:str=None,
+                           source_type="journal",
+                           offset=0,
+                           session_info=None):
+    """
+    Return what JOURNALS have been updated in the last week
+
+    Served from the cached feed, unless offset + limit is past its depth (opasConfig.WHATS_NEW_DEPTH).
+
+    >>> result = database_get_whats_new()
+
+    """    
+    if offset + limit <= opasConfig.WHATS_NEW_DEPTH:
+        feed = get_whats_new_feed(days_back=days_back, source_type=source_type)
+        if feed is not None:
+            feed = (feed[0], feed[1][offset:offset + limit])
+    else:
+        # deeper than the cached feed goes, so it's searched
+        feed = query_whats_new(days_back=days_back, source_type=source_type, limit=limit, offset=offset)
+
+    if feed is None:
+        num_found, whats_new_list_items = 0, []
+    else:
+        num_found, whats_new_list_items = feed
+
+    response_info = models.ResponseInfo( count = len(whats_new_list_items),
+                                         fullCount = num_found,
+                                         limit = limit,
+                                         offset = offset,
+                                         listType="newlist",
+                                         fullCountComplete = limit >= num_found,
+                                         request=f"{req_url}",
+                                         timeStamp = datetime.utcfromtimestamp(time.time()).strftime(TIME_FORMAT_STR)                     
+                                         )
 
     whats_new_list_struct = models.WhatsNewListStruct( responseInfo = response_info, 
                                                        responseSet = whats_new_list_items
@@ -894,15 +1140,56 @@ def metadata_get_volumes(source_code=None,
         
     return ret_val
 
+#-----------------------------------------------------------------------------
+def paging_params(limit, offset, sort, sort_order="asc", cursor=None):
+    """
+    Return the Solr paging and sort parameters for a query: by offset (start), or if a cursor
+      is supplied, by cursorMark, with the sort made stable with the unique key as the tiebreak.
+
+    >>> paging_params(10, 20, "art_year, art_pgrg")
+    {'rows': 10, 'start': 20, 'sort': 'art_year, art_pgrg', 'sort_order': 'asc'}
+    >>> paging_params(10, 20, "art_year, art_pgrg", cursor="*")
+    {'rows': 10, 'start': 0, 'sort': 'art_year asc, art_pgrg asc, id asc', 'sort_order': 'asc', 'cursorMark': '*'}
+    """
+    if cursor is None:
+        ret_val = {"rows": limit, "start": offset, "sort": sort, "sort_order": sort_order}
+    else:
+        ret_val = {"rows": limit,
+                   "start": 0, # Solr requires start=0 with a cursorMark
+                   "sort": opasQueryHelper.cursor_sort(sort, sort_order=sort_order),
+                   "sort_order": sort_order,
+                   "cursorMark": cursor
+                  }
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def next_cursor(results, cursor):
+    """
+    Return the cursor for the next page of results, or None if the query wasn't paged by cursor
+      or there are no more results (Solr returns the cursor it was sent).
+    """
+    ret_val = None
+    if cursor is not None:
+        ret_val = getattr(results, "nextCursorMark", None)
+        if ret_val == cursor:
+            ret_val = None
+
+    return ret_val
+
 #-----------------------------------------------------------------------------
 def metadata_get_contents(pep_code, #  e.g., IJP, PAQ, CPS
                           year="*",
                           vol="*",
                           req_url: str=None, 
-                          limit=opasConfig.DEFAULT_LIMIT_FOR_CONTENTS_LISTS, offset=0):
+                          limit=opasConfig.DEFAULT_LIMIT_FOR_CONTENTS_LISTS, offset=0,
+                          cursor=None):
     """
     Return a source's contents
 
+    If cursor is supplied ("*" for the first page), pages by cursor rather than offset,
+      and responseInfo.nextCursor has the cursor for the next page.
+
     >>> results = metadata_get_contents("IJP", "1993", limit=5, offset=0)
     >>> results.documentList.responseInfo.count == 5
     True
@@ -928,14 +1215,14 @@ def metadata_get_contents(pep_code, #  e.g., IJP, PAQ, CPS
 
     results = solr_docs.query(q = f"art_sourcecode:{pep_code} && {field}:{search_val}",  
                               fields = "art_id, art_vol, art_year, art_iss, art_iss_title, art_newsecnm, art_pgrg, title, art_author_id, art_citeas_xml, art_info_xml",
-                              sort="art_year, art_pgrg", sort_order="asc",
-                              rows=limit, start=offset
+                              **paging_params(limit, offset, "art_year, art_pgrg", cursor=cursor)
                              )
 
     response_info = models.ResponseInfo( count = len(results.results),
                                          fullCount = results._numFound,
                                          limit = limit,
                                          offset = offset,
+                                         nextCursor = next_cursor(results, cursor),
                                          listType="documentlist",
                                          fullCountComplete = limit >= results._numFound,
                                          request=f"{req_url}",
@@ -1371,27 +1658,35 @@ def authors_get_author_info(author_partial,
                                       facet_offset=offset,
                                       rows=0
                                       )       
+        solr_params = results._params
 
     if method == 2:
-        # should be faster way, but about the same measuring tuck (method1) vs tuck.* (method2) both about 2 query time.  However, allowing regex here.
-        if "*" in author_partial or "?" in author_partial or "." in author_partial:
-            results = solr_authors_term_search( terms_fl="art_author_id",
-                                                terms_limit=limit,  # this causes many regex expressions to fail
-                                               terms_regex=author_partial.lower() + ".*",
-                                               terms_sort=author_order  # index or count
-                                               )           
+        # use the in memory prefix index if there is one, otherwise Solr
+        term_prefix_index = opasTermIndex.get_term_prefix_index("authors", "art_author_id")
+        if term_prefix_index is not None:
+            term_counts, solr_params = get_term_prefix_index_matches(term_prefix_index, author_partial, limit=limit, offset=offset, order=author_order)
         else:
-            results = solr_authors_term_search( terms_fl="art_author_id",
-                                                terms_prefix=author_partial.lower(),
-                                               terms_sort=author_order,  # index or count
-                                               terms_limit=limit
-                                               )
+            # should be faster way, but about the same measuring tuck (method1) vs tuck.* (method2) both about 2 query time.  However, allowing regex here.
+            if "*" in author_partial or "?" in author_partial or "." in author_partial:
+                results = solr_authors_term_search( terms_fl="art_author_id",
+                                                    terms_limit=limit,  # this causes many regex expressions to fail
+                                                   terms_regex=author_partial.lower() + ".*",
+                                                   terms_sort=author_order  # index or count
+                                                   )           
+            else:
+                results = solr_authors_term_search( terms_fl="art_author_id",
+                                                    terms_prefix=author_partial.lower(),
+                                                   terms_sort=author_order,  # index or count
+                                                   terms_limit=limit
+                                                   )
+            term_counts = results.terms["art_author_id"]
+            solr_params = results._params
 
     response_info = models.ResponseInfo( limit=limit,
                                          offset=offset,
                                          listType="authorindex",
                                          scopeQuery=[f"Terms: {author_partial}"],
-                                         solrParams=results._params,
+                                         solrParams=solr_params,
                                          request=f"{req_url}",
                                          timeStamp=datetime.utcfromtimestamp(time.time()).strftime(TIME_FORMAT_STR)
                                          )
@@ -1408,7 +1703,7 @@ def authors_get_author_info(author_partial,
                 logger.debug ("authorsGetAuthorInfo", item)
 
     if method == 2:  # faster way
-        for key, value in results.terms["art_author_id"].items():
+        for key, value in term_counts.items():
             if value > 0:
                 item = models.AuthorIndexItem(authorID = key, 
                                               publicationsURL = "/v1/Authors/Publications/{}/".format(key),
@@ -1433,10 +1728,14 @@ def authors_get_author_info(author_partial,
 def authors_get_author_publications(author_partial,
                                     req_url:str=None, 
                                     limit=opasConfig.DEFAULT_LIMIT_FOR_SOLR_RETURNS,
-                                    offset=0):
+                                    offset=0,
+                                    cursor=None):
     """
     Returns a list of publications (per authors partial name), and the number of articles by that author.
 
+    If cursor is supplied ("*" for the first page), pages by cursor rather than offset,
+      and responseInfo.nextCursor has the cursor for the next page.
+
     >>> ret_val =authors_get_author_publications(author_partial="Tuck") # doctest: +ELLIPSIS
     >>> type(ret_val)
     <class 'models.AuthorPubList'>
@@ -1455,8 +1754,7 @@ def authors_get_author_publications(author_partial,
     # wildcard in case nothing found for #1
     results = solr_authors.query( q = "{}".format(query),   
                                   fields = aut_fields,
-                                  sort="art_author_id, art_year_int", sort_order="asc",
-                                  rows=limit, start=offset
+                                  **paging_params(limit, offset, "art_author_id, art_year_int", cursor=cursor)
                                   )
 
     logger.debug("Author Publications: Number found: %s", results._numFound)
@@ -1467,8 +1765,7 @@ def authors_get_author_publications(author_partial,
         logger.debug("Author Publications: trying again - %s", query)
         results = solr_authors.query( q = "{}".format(query),  
                                       fields = aut_fields,
-                                      sort="art_author_id, art_year_int", sort_order="asc",
-                                      rows=limit, start=offset
+                                      **paging_params(limit, offset, "art_author_id, art_year_int", cursor=cursor)
                                       )
 
         logger.debug("Author Publications: Number found: %s", results._numFound)
@@ -1477,14 +1774,14 @@ def authors_get_author_publications(author_partial,
             logger.debug("Author Publications: trying again - %s", query)
             results = solr_authors.query( q = "{}".format(query),  
                                           fields = aut_fields,
-                                          sort="art_author_id, art_year_int", sort_order="asc",
-                                          rows=limit, start=offset
+                                          **paging_params(limit, offset, "art_author_id, art_year_int", cursor=cursor)
                                           )
 
     response_info = models.ResponseInfo( count = len(results.results),
                                          fullCount = results._numFound,
                                          limit = limit,
                                          offset = offset,
+                                         nextCursor = next_cursor(results, cursor),
                                          listType="authorpublist",
                                          scopeQuery=[query],
                                          solrParams = results._params,
@@ -1756,13 +2053,14 @@ def get_fulltext_from_search_results(result,
         if reduce == True or page_limit is not None:
             # extract the requested pages
             try:
-                temp_xml = opasxmllib.xml_get_pages(xmlstr=text_xml,
-                                                    offset=offset,
-                                                    limit=page_limit,
-                                                    pagebrk="pb",
-                                                    inside="body",
-                                                    env="body")
-                temp_xml = temp_xml[0]
+                temp_xml = run_conversion(opasxmllib.xml_get_pages_xmlstr,
+                                          xmlstr=text_xml,
+                                          offset=offset,
+                                          limit=page_limit,
+                                          pagebrk="pb",
+                                          inside="body",
+                                          env="body",
+                                          inline_on_timeout=True)
             except Exception as e:
                 logger.error(f"Page extraction from document failed. Error: {e}.  Keeping entire document.")
             else: # ok
@@ -1782,14 +2080,15 @@ def get_fulltext_from_search_results(result,
                                                pgrg=documentListItem.pgRg,
                                                ret_format="HTML"
                                                )
-        text_xml = opasxmllib.xml_str_to_html(text_xml)  #  e.g, r"./libs/styles/pepkbd3-html.xslt"
-        text_xml = re.sub(f"{opasConfig.HITMARKERSTART}|{opasConfig.HITMARKEREND}", numbered_anchors, text_xml)
-        text_xml = re.sub("\[\[RunningHead\]\]", f"{heading}", text_xml, count=1)
+        # if the pool is too busy, converted here rather than return another format than requested
+        text_xml = run_conversion(opasxmllib.xml_str_to_html, text_xml, inline_on_timeout=True)  #  e.g, r"./libs/styles/pepkbd3-html.xslt"
+        # number the hits, and insert the running head, in one pass
+        text_xml = opasxmllib.hitmarkers_to_numbered_anchors(text_xml, running_head=heading)
     elif format_requested_ci == "textonly":
         # strip tags
         text_xml = opasxmllib.xml_elem_or_str_to_text(text_xml, default_return=text_xml)
     elif format_requested_ci == "xml":
-        text_xml = re.sub(f"{opasConfig.HITMARKERSTART}|{opasConfig.HITMARKEREND}", numbered_anchors, text_xml)
+        text_xml = opasxmllib.hitmarkers_to_numbered_anchors(text_xml)
 
     documentListItem.document = text_xml
     return documentListItem
@@ -2068,33 +2367,26 @@ def prep_document_download(document_id,
                         filename = opas_fs.get_download_filename(filespec=document_id, path=localsecrets.PDF_ORIGINALS_PATH, year=pub_year, ext=".pdf")    
                         ret_val = filename
                     elif ret_format.upper() == "PDF":
-                        pisa.showLogging() # debug only
                         ret_val = opasxmllib.remove_encoding_string(ret_val)
-                        html_string = opasxmllib.xml_str_to_html(ret_val)
+                        html_string = run_conversion(opasxmllib.xml_str_to_html, ret_val, inline_on_timeout=True)
                         html_string = re.sub("\[\[RunningHead\]\]", f"{heading}", html_string, count=1)
                         html_string = re.sub("</html>", f"{COPYRIGHT_PAGE_HTML}</html>", html_string, count=1)                        
-                        # open output file for writing (truncated binary)
-                        filename = document_id + ".PDF" 
-                        result_file = open(filename, "w+b")
                         # convert HTML to PDF
-                        pisaStatus = pisa.CreatePDF(src=html_string,            # the HTML to convert
-                                                    dest=result_file)           # file handle to receive result
-                        # close output file
-                        result_file.close()                 # close output file
-                        # return True on success and False on errors
+                        filename = run_conversion(opasxmllib.html_to_pdf, html_string, output_filename=document_id + ".PDF", inline_on_timeout=True)
                         ret_val = filename
                     elif ret_format.upper() == "EPUB":
                         ret_val = opasxmllib.remove_encoding_string(ret_val)
-                        html_string = opasxmllib.xml_str_to_html(ret_val)
+                        html_string = run_conversion(opasxmllib.xml_str_to_html, ret_val, inline_on_timeout=True)
                         html_string = re.sub("\[\[RunningHead\]\]", f"{heading}", html_string, count=1)
                         html_string = add_epub_elements(html_string)
-                        filename = opasxmllib.html_to_epub(html_string, document_id, document_id)
+                        filename = run_conversion(opasxmllib.html_to_epub, html_string, document_id, document_id, inline_on_timeout=True)
                         ret_val = filename
                     else:
                         logger.warning(f"Format {ret_format} not supported")
     
                 except Exception as e:
                     logger.warning("Can't convert data: %s", e)
+                    ret_val = None
 
     return ret_val
 
@@ -2115,7 +2407,7 @@ def convert_xml_to_html_file(xmltext_str, output_filename=None):
         filename_base = "_".join([basename, suffix]) # e.g. 'mylogfile_120508_171442'        
         output_filename = filename_base + ".html"
 
-    htmlString = opasxmllib.xml_str_to_html(xmltext_str)
+    htmlString = run_conversion(opasxmllib.xml_str_to_html, xmltext_str, inline_on_timeout=True)
     fo = open(output_filename, "w", encoding="utf-8")
     fo.write(str(htmlString))
     fo.close()
@@ -2225,7 +2517,35 @@ def search_analysis( query_list,
         RetStruct = models.TermIndexStruct
         RetList = models.TermIndex
 
+    # Count all the clauses in one request, each as a facet.query, rather than a query per clause.
+    #  q.op applies to the facet queries as a request param; defType doesn't, so it's given as
+    #  local params unless the clause has its own (e.g., {!parent ...})
+    facet_queries = []
     for query_item in query_list:
+        if def_type is not None and not query_item.lstrip().startswith("{!"):
+            facet_queries.append(f"{{!{def_type}}}{query_item}")
+        else:
+            facet_queries.append(query_item)
+
+    if facet_queries:
+        try:
+            results = solr_docs.query(q = "*:*",
+                                      q_op="AND", 
+                                      queryAnalysis = True,
+                                      fields = summary_fields,
+                                      rows = 0,
+                                      start = 0,
+                                      facet = "on",
+                                      facet_query = facet_queries
+                                      )
+            facet_query_counts = results.facet_counts["facet_queries"]
+        except Exception as e:
+            # try to return an error message for now.
+            # logger.error(HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=e))
+            # raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Bad Search syntax")
+            return models.ErrorReturn(error="Search syntax error", error_description=f"There's an error in your input {e}")
+
+    for query_item, facet_query in zip(query_list, facet_queries):
         # get rid of illegal stuff
         # boolean_subs = [termpair.strip() for termpair in re.split("\s+\|\||\&\&|[ ]\s+", query_item)]
         # boolean_subs = [termpair.strip() for termpair in re.split("\s*\|\||\&\&|AND|OR\s*", query_item)]
@@ -2238,20 +2558,7 @@ def search_analysis( query_list,
                 #term_clause = clauses[1]
             #subfield_clauses = shlex.split(term_clause)
 
-        try:
-            results = solr_docs.query(query_item,
-                                      defType = def_type,
-                                      q_op="AND", 
-                                      queryAnalysis = True,
-                                      fields = summary_fields,
-                                      rows = 1,
-                                      start = 0)
-        except Exception as e:
-            # try to return an error message for now.
-            # logger.error(HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=e))
-            # raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail="Bad Search syntax")
-            return models.ErrorReturn(error="Search syntax error", error_description=f"There's an error in your input {e}")
-
+        term_count = facet_query_counts.get(facet_query, 0)
         if "!parent" in query_item:
             term = query_item
             try:
@@ -2309,9 +2616,9 @@ def search_analysis( query_list,
                 term = opasQueryHelper.strip_outer_matching_chars(term, ")")
                 term = f"{query_item} (in text)"
 
-        #logger.debug("Analysis: Term %s, matches %s", field_clause, results._numFound)
+        #logger.debug("Analysis: Term %s, matches %s", field_clause, term_count)
         item = RetItem(term = term, 
-                       termCount = results._numFound, 
+                       termCount = term_count, 
                        field=term_field
                        )
         return_item_list.append(item)
@@ -2354,12 +2661,137 @@ def search_analysis( query_list,
 
     return ret_val
 #-----------------------------------------------------------------------------
+def is_wildcard_term(term):
+    """
+    Return True if the term has wildcard (* ?) or regex (.) characters
+
+    >>> is_wildcard_term("jea?ous*")
+    True
+    >>> is_wildcard_term("jealous")
+    False
+    """
+    return re.match(".*[\*\?\.].*", term) is not None
+
+#-----------------------------------------------------------------------------
+def get_wildcard_term_counts(term, term_field="text_xml", wildcard_match_limit=4):
+    """
+    Expand a wildcard term to the (up to wildcard_match_limit) most frequent matching terms, returning
+      a dict of the matches and their counts, plus the total.
+
+    Runs in the term count worker threads, so it uses a Solr connection of the calling thread's own.
+    Raises solr.SolrException if Solr rejects the request.
+    """
+    ret_val = {}
+    # make sure legit
+    # do subs to make wildcard * into zero or more regex character, and ? to zero or one
+    term = re.sub("(?P<lead>[^\.])(?P<wildc>[\*\?])", "\g<lead>.\g<wildc>", term)
+    try:
+        re.compile(term)
+    except Exception as e:
+        logger.warning(f"Wildcard term {term} skipped, not a valid pattern ({e})")
+    else:
+        term_search = thread_solr_term_search(SOLR_DOCS)
+        results = term_search(terms_fl=term_field,
+                              terms_limit=wildcard_match_limit,
+                              terms_regex=term.lower(), # + ".*",
+                              terms_mincount="1",
+                              terms_sort="count"  # wildcard, pick highest
+                              )
+        try:
+            ret_val = results.terms.get(term_field, {})
+        except AttributeError as e: # no terms in the response
+            logger.warning(f"get_wildcard_term_counts: no terms returned for {term} ({e})")
+            ret_val = {}
+        term_wild = term.replace(".", "")
+        ret_val = {f"{key}({term_wild})": value for (key, value) in ret_val.items()}
+        ret_val.update({f"Total({term_wild})>=":sum(x for x in ret_val.values())})
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def get_exact_term_counts(terms, term_field="text_xml", term_order="index"):
+    """
+    Return a dict of the counts of a list of (exact) terms, from one Solr terms.list request.
+      Terms not in the index are not in the returned dict.
+
+    Raises solr.SolrException if Solr rejects the request.
+    """
+    ret_val = {}
+    if terms:
+        results = solr_docs_term_search( terms_fl=term_field,
+                                         terms_list=",".join(terms),
+                                         terms_sort=term_order,  # index or count
+                                         terms_mincount="1",
+                                         #terms_ttf=True, 
+                                         terms_limit=len(terms)
+                                         )
+        try:
+            ret_val = results.terms.get(term_field, {})
+        except Exception as e:
+            logger.debug(f"get_exact_term_counts error: {e}")
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def get_term_counts(terms, term_field="text_xml", term_order="index", wildcard_match_limit=4):
+    """
+    Return a dict of terms and the number of articles with the term, for a list of terms.
+
+    All the exact terms are counted in one Solr request, and the wildcard terms are expanded
+      concurrently (opasConfig.TERM_COUNT_WILDCARD_WORKERS).  The counts for each term are kept
+      (term_count_cache) until the corpus generation changes.
+
+    Raises solr.SolrException if Solr rejects a request.
+    """
+    ret_val = {}
+    term_counts = {}
+    exact_terms = []
+    wildcard_terms = []
+    terms = [term.strip().lower() for term in terms if term.strip()]
+    for term in terms:
+        cached = term_count_cache.get((term_field, term, term_order, wildcard_match_limit))
+        if cached is not None:
+            term_counts[term] = cached
+        elif is_wildcard_term(term):
+            wildcard_terms.append(term)
+        else:
+            exact_terms.append(term)
+
+    futures = {term: term_count_executor.submit(get_wildcard_term_counts, term, term_field=term_field, wildcard_match_limit=wildcard_match_limit)
+               for term in set(wildcard_terms)}
+    try:
+        exact_counts = get_exact_term_counts(list(dict.fromkeys(exact_terms)), term_field=term_field, term_order=term_order)
+    finally:
+        wildcard_counts = {}
+        for term, future in futures.items():
+            try:
+                wildcard_counts[term] = future.result()
+            except solr.SolrException as e:
+                logger.warning(f"Wildcard term count error for {term}: {e}")
+                wildcard_counts[term] = None
+
+    for term in exact_terms:
+        term_counts[term] = {term: exact_counts[term]} if term in exact_counts else {}
+        term_count_cache.set((term_field, term, term_order, wildcard_match_limit), term_counts[term])
+
+    for term, counts in wildcard_counts.items():
+        if counts is not None:
+            term_counts[term] = counts
+            term_count_cache.set((term_field, term, term_order, wildcard_match_limit), counts)
+
+    # combined, in the order of the request
+    for term in terms:
+        ret_val.update(term_counts.get(term, {}))
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
 def get_term_count_list(term, term_field="text_xml", limit=opasConfig.DEFAULT_LIMIT_FOR_SOLR_RETURNS, offset=0, term_order="index", wildcard_match_limit=4):
     """
     Returns a list of matching terms, and the number of articles with that term.
 
     Args:
-        term (str): Term or comma separated list of terms to return data on.
+        term (str): Term or comma separated list of terms (or a list of terms) to return data on.
         term_field (str): the text field to look in
         limit (int, optional): Paging mechanism, return is limited to this number of items.
         offset (int, optional): Paging mechanism, start with this item in limited return set, 0 is first item.
@@ -2375,87 +2807,47 @@ def get_term_count_list(term, term_field="text_xml", limit=opasConfig.DEFAULT_LI
 
     """
     ret_val = {}
-    ret_status = (200, "OK", "") # default is like HTTP_200_OK
-
-    #  see if there is a wildcard
-    if "," in term: 
-        # It's a comma separated list!
-        try:
-            results = solr_docs_term_search( terms_fl=term_field,
-                                             terms_list=term.lower(),
-                                             terms_sort=term_order,  # index or count
-                                             terms_mincount="1",
-                                             #terms_ttf=True, 
-                                             terms_limit=limit
-                                             )
-        except Exception as e:
-            # ret_status = (e.httpcode, e.reason, e.body) # default is like HTTP_200_OK
-            ret_val = models.ErrorReturn(httpcode=e.httpcode, error="Search syntax error (Solr)", error_description=f"There's an error in your search input.")
-        else:
-            try:
-                ret_val = results.terms.get(term_field, {})
-            except Exception as e:
-                logger.debug(f"get_term_count_list error: {e}")
-
-    elif isinstance(term, list):
-        for term_list_component in term:
-            try:
-                ret_val.update(get_term_count_list(term_list_component))
-            except Exception as e:
-                logger.debug(f"get_term_count_list error: {e}")
+    if isinstance(term, list):
+        terms = term
+    else:
+        # may be a comma separated list
+        terms = term.split(",")
 
-    elif re.match(".*[\*\?\.].*", term):
-        # make sure legit
-        # do subs to make wildcard * into zero or more regex character, and ? to zero or one
-        term = re.sub("(?P<lead>[^\.])(?P<wildc>[\*\?])", "\g<lead>.\g<wildc>", term)
-        try:
-            re.compile(term)
-            is_valid = True
-        except:
-            is_valid = False
+    try:
+        ret_val = get_term_counts(terms, term_field=term_field, term_order=term_order, wildcard_match_limit=wildcard_match_limit)
+    except solr.SolrException as e:
+        ret_val = models.ErrorReturn(httpcode=e.httpcode, error="Search syntax error (Solr)", error_description=f"There's an error in your search input.")
+    except (OSError, http.client.HTTPException) as e: # Solr couldn't be reached (including timeouts)
+        logger.error(f"get_term_count_list error: {e}")
 
-        # #TODO test is_valid below
-        try:
-            results = solr_docs_term_search(terms_fl=term_field,
-                                            terms_limit=wildcard_match_limit,
-                                            terms_regex=term.lower(), # + ".*",
-                                            terms_mincount="1",
-                                            terms_sort="count"  # wildcard, pick highest
-                                            )
-        except solr.SolrException as e:
-            # ret_status = (e.httpcode, e.reason, e.body) # default is like HTTP_200_OK
-            ret_val = models.ErrorReturn(httpcode=e.httpcode, error="Search syntax error (Solr)", error_description=f"There's an error in your search input.")
+    return ret_val
 
+#-----------------------------------------------------------------------------
+#-----------------------------------------------------------------------------
+def get_term_prefix_index_matches(term_prefix_index, term_partial, limit=opasConfig.DEFAULT_LIMIT_FOR_SOLR_RETURNS, offset=0, order="index"):
+    """
+    Return a dict of the terms (and counts) in the prefix index matching term_partial, a prefix or,
+      with wildcards, a regex (as the Solr terms.regex used otherwise), plus a dict of the equivalent
+      Solr /terms params, to report in the response info.
+    """
+    solr_params = {"terms.fl": term_prefix_index.field,
+                   "terms.sort": order,
+                   "terms.limit": limit,
+                   "termindex": True
+                  }
+    if "*" in term_partial or "?" in term_partial or "." in term_partial:
+        solr_params["terms.regex"] = term_partial.lower() + ".*"
         try:
-            ret_val = results.terms.get(term_field, {})
-            term_wild = term.replace(".", "")
-            ret_val = {f"{key}({term_wild})": value for (key, value) in ret_val.items()}
-            ret_val.update({f"Total({term_wild})>=":sum(x for x in ret_val.values())})
-
-        except Exception as e:
-            logger.debug(f"get_term_count_list error: {e}")
+            matches = term_prefix_index.regex_matches(solr_params["terms.regex"], limit=limit, offset=offset, order=order)
+        except re.error as e:
+            logger.warning(f"Term pattern {term_partial} is not valid ({e})")
+            matches = []
     else:
-        # Note: we need an exact match here.
-        try:
-            results = solr_docs_term_search( terms_fl=term_field,
-                                             terms_prefix=term.lower(),
-                                             terms_sort=term_order,  # index or count
-                                             terms_mincount="1",
-                                             #terms_ttf=True, 
-                                             terms_limit=1 # only one response needed
-                                             )
-        except solr.SolrException as e:
-            # ret_status = (e.httpcode, e.reason, e.body) # default is like HTTP_200_OK
-            ret_val = models.ErrorReturn(httpcode=e.httpcode, error="Search syntax error (Solr)", error_description=f"There's an error in your search input.")
-        else:
-            try:
-                ret_val = results.terms.get(term_field, {})
-            except Exception as e:
-                logger.debug(f"get_term_count_list error: {e}")
+        solr_params["terms.prefix"] = term_partial.lower()
+        matches = term_prefix_index.prefix_matches(solr_params["terms.prefix"], limit=limit, offset=offset, order=order)
 
-    return ret_val
+    return dict(matches), solr_params
 
-#-----------------------------------------------------------------------------
 #-----------------------------------------------------------------------------
 def get_term_index(term_partial,
                    term_field="text",
@@ -2513,31 +2905,38 @@ def get_term_index(term_partial,
         # error
         logger.error("Specified core does not have a term index configured")
     else:
-        if "*" in term_partial or "?" in term_partial or "." in term_partial:
-            results = term_index( terms_fl=term_field,
-                                  terms_regex=term_partial.lower() + ".*",
-                                  terms_limit=limit,  
-                                  terms_sort=order  # index or count
-                                  )           
+        # use the in memory prefix index if there is one, otherwise Solr
+        term_prefix_index = opasTermIndex.get_term_prefix_index(core, term_field)
+        if term_prefix_index is not None:
+            term_counts, solr_params = get_term_prefix_index_matches(term_prefix_index, term_partial, limit=limit, offset=offset, order=order)
         else:
-            results = term_index( terms_fl=term_field,
-                                  terms_prefix=term_partial.lower(),
-                                  terms_sort=order,  # index or count
-                                  terms_limit=limit
-                                  )
+            if "*" in term_partial or "?" in term_partial or "." in term_partial:
+                results = term_index( terms_fl=term_field,
+                                      terms_regex=term_partial.lower() + ".*",
+                                      terms_limit=limit,  
+                                      terms_sort=order  # index or count
+                                      )           
+            else:
+                results = term_index( terms_fl=term_field,
+                                      terms_prefix=term_partial.lower(),
+                                      terms_sort=order,  # index or count
+                                      terms_limit=limit
+                                      )
+            term_counts = results.terms[term_field]
+            solr_params = results._params
 
         response_info = models.ResponseInfo( limit=limit,
                                              offset=offset,
                                              listType="termindex",
                                              core=core, 
                                              scopeQuery=[f"Terms: {term_partial}"],
-                                             solrParams=results._params,
+                                             solrParams=solr_params,
                                              request=f"{req_url}",
                                              timeStamp=datetime.utcfromtimestamp(time.time()).strftime(TIME_FORMAT_STR)
                                              )
 
         term_index_items = []
-        for key, value in results.terms[term_field].items():
+        for key, value in term_counts.items():
             if value > 0:
                 item = models.TermIndexItem(term = key, 
                                             field = term_field,
@@ -2649,10 +3048,14 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
                    sort=None, 
                    #authenticated=False,
                    session_info=None,
+                   cursor=None
                    ):
     """
     Full-text search, via the Solr server api.
 
+    If cursor is supplied ("*" for the first page), pages by cursor (Solr cursorMark) rather than offset,
+      and responseInfo.nextCursor has the cursor for the next page (None after the last page).
+
     Returns a pair of values: ret_val, ret_status.  The double return value is important in case the Solr server isn't running or it returns an HTTP error.  The 
        ret_val = a DocumentList model object
        ret_status = a status tuple, consisting of a HTTP status code and a status mesage. Default (HTTP_200_OK, "OK")
@@ -2680,8 +3083,6 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
     """
     ret_val = {}
     ret_status = (200, "OK") # default is like HTTP_200_OK
-    global count_anchors
-    
     if solr_query_spec.solrQueryOpts is None: # initialize a new model
         solr_query_spec.solrQueryOpts = models.SolrQueryOpts()
 
@@ -2773,6 +3174,13 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
     except Exception as e:
         logger.error(f"Solr Param Assignment Error {e}")
         
+    if cursor is not None:
+        # cursor paging: start must be 0, and the sort must end with the unique key
+        solr_query_spec.offset = 0
+        solr_param_dict["start"] = 0
+        solr_param_dict["sort"] = opasQueryHelper.cursor_sort(solr_query_spec.solrQuery.sort)
+        solr_param_dict["cursorMark"] = cursor
+
     # add additional facet parameters from faceSpec
     for key, value in solr_query_spec.facetSpec.items():
         if key[0:1] != "f":
@@ -2797,10 +3205,39 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
         solr_query_spec.core = "pepwebdocs"
         solr_core = solr_docs
 
+    if req_url is None:
+        req_url = solr_query_spec.urlRequest
+
+    # The results are cached per query (and corpus generation), without the access limitations,
+    #  which are per session, and applied to the copy returned.  Not for full-text returns, where
+    #  what's returned depends on access.  The items are cached as rendered, so the key includes
+    #  what the rendering depends on besides the Solr parameters (the abstracts' return and format).
+    cache_key = None
+    if opasConfig.SEARCH_RESULT_CACHE_ENABLED and not solr_query_spec.fullReturn:
+        cache_key = (solr_query_spec.core,
+                     opasQueryHelper.query_spec_cache_key(solr_param_dict),
+                     solr_query_spec.abstractReturn,
+                     solr_query_spec.returnFormat,
+                     solr_query_spec.page)
+        cached = search_result_cache.get(cache_key)
+        if cached is not None:
+            response_info, document_list_items = cached
+            document_list_items = [item.copy(deep=True) for item in document_list_items]
+            apply_access_limitations(document_list_items, session_info, solr_query_spec.limit)
+            response_info = response_info.copy(update={"request": f"{req_url}",
+                                                       "timeStamp": datetime.utcfromtimestamp(time.time()).strftime(TIME_FORMAT_STR)
+                                                      })
+            document_list_struct = models.DocumentListStruct( responseInfo = response_info, 
+                                                              responseSet = document_list_items
+                                                              )
+            ret_val = models.DocumentList(documentList = document_list_struct)
+            return ret_val, ret_status
+
     try:
         results = solr_core.query(**solr_param_dict)
 
     except solr.SolrException as e:
+        opasSlowQueryLog.note_query(solr_query_spec.core, solr_param_dict, error=e.httpcode)
         if e.reason is not None:
             ret_val = models.ErrorReturn(httpcode=e.httpcode, error="Solr engine returned an unknown error", error_description=f"Solr engine returned error {e.httpcode} - {e.reason}")
             logger.error(f"Solr Runtime Search Error: {e.reason}")
@@ -2825,6 +3262,7 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
                                 #          <int name="code">400</int>\n</lst>\n</response>\n'
 
     else: #  search was ok
+        opasSlowQueryLog.note_query(solr_query_spec.core, solr_param_dict, results)
         try:
             logger.debug("Search Performed: %s", solr_query_spec.solrQuery.searchQ)
             logger.debug("The Filtering: %s", solr_query_spec.solrQuery.filterQ)
@@ -2844,15 +3282,12 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
                         #solr_query_spec.fullReturn = False
     
                 for result in results.results:
-                    # reset anchor counts for full-text markup re.sub
-                    count_anchors = 0
                     # authorIDs = result.get("art_authors", None)
                     documentListItem = models.DocumentListItem()
                     documentListItem = get_base_article_info_from_search_result(result, documentListItem)
                     # sometimes, we don't need to check permissions
-                    # Always check if fullReturn is selected
-                    # Don't check when it's not and a large number of records are requested.
-                    if solr_query_spec.fullReturn or limit < opasConfig.MAX_RECORDS_FOR_ACCESS_INFO_RETURN:
+                    # Always check if fullReturn is selected (otherwise, it's done for the list, below)
+                    if solr_query_spec.fullReturn:
                         opasDocPerm.get_access_limitations( doc_id=documentListItem.documentID, 
                                                             classification=documentListItem.accessClassification, 
                                                             year=documentListItem.year,
@@ -2890,13 +3325,9 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
                         #kwicList = getKwicList(textXml, extraContextLen=extraContextLen)  # returning context matches as a list, making it easier for clients to work with
                         kwic_list = []
                         for n in text_xml:
-                            # strip all tags
-                            match = opasxmllib.xml_string_to_text(n)
-                            # change the tags the user told Solr to use to the final output tags they want
+                            # strip all tags, and change the tags the user told Solr to use to the final output tags they want
                             #   this is done to use non-xml-html hit tags, then convert to that after stripping the other xml-html tags
-                            match = re.sub(opasConfig.HITMARKERSTART, opasConfig.HITMARKERSTART_OUTPUTHTML, match)
-                            match = re.sub(opasConfig.HITMARKEREND, opasConfig.HITMARKEREND_OUTPUTHTML, match)
-                            kwic_list.append(match)
+                            kwic_list.append(opasxmllib.xml_string_to_kwic(n))
     
                         kwic = " . . . ".join(kwic_list)  # how its done at GVPi, for compatibility (as used by PEPEasy)
                         # we don't need fulltext
@@ -3010,9 +3441,6 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
                 except:
                     facet_counts = None
     
-            if req_url is None:
-                req_url = solr_query_spec.urlRequest
-    
             # Moved this down here, so we can fill in the Limit, Page and Offset fields based on whether there
             #  was a full-text request with a page offset and limit
             # Solr search was ok
@@ -3022,6 +3450,7 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
                                                totalMatchCount = results._numFound,
                                                limit = solr_query_spec.limit,
                                                offset = solr_query_spec.offset,
+                                               nextCursor = next_cursor(results, cursor),
                                                page = solr_query_spec.page, 
                                                listType="documentlist",
                                                scopeQuery=[scopeofquery], 
@@ -3035,6 +3464,12 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
             )
     
             # responseInfo.count = len(documentItemList)
+
+            if not solr_query_spec.fullReturn:
+                if cache_key is not None:
+                    search_result_cache.set(cache_key, (responseInfo.copy(deep=True), [item.copy(deep=True) for item in documentItemList]))
+                # Don't check when a large number of records are requested.
+                apply_access_limitations(documentItemList, session_info, solr_query_spec.limit)
     
             documentListStruct = models.DocumentListStruct( responseInfo = responseInfo, 
                                                             responseSet = documentItemList
@@ -3050,6 +3485,98 @@ def search_text_qs(solr_query_spec: models.SolrQuerySpec,
 
     return ret_val, ret_status
 
+#-----------------------------------------------------------------------------
+def export_fields_list(fields=None):
+    """
+    Return the list of fields to export, per the comma separated fields, or the default export fields.
+
+    Raises ValueError if a field can't be exported (see opasConfig.EXPORT_FIELDS)
+
+    >>> export_fields_list("art_id, art_year")
+    ['art_id', 'art_year']
+    >>> export_fields_list("art_id, text_xml")
+    Traceback (most recent call last):
+    ...
+    ValueError: Field(s) can't be exported: text_xml
+    """
+    if fields is None or fields.strip() == "":
+        fields = opasConfig.EXPORT_DEFAULT_FIELDS
+
+    ret_val = [field.strip() for field in fields.split(",") if field.strip() != ""]
+    not_allowed = [field for field in ret_val if field not in opasConfig.EXPORT_FIELDS]
+    if not_allowed:
+        raise ValueError(f"Field(s) can't be exported: {', '.join(not_allowed)}")
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def search_export(solr_query_spec: models.SolrQuerySpec,
+                  fields: list,
+                  limit=None,
+                  page_size=None):
+    """
+    Export the results of a search: returns (count, rows), the number of documents which will be exported,
+      and a generator of NDJSON (newline delimited JSON) lines, one per document, with the fields listed
+      (see export_fields_list).
+
+    The results are walked by cursorMark a page (page_size documents) at a time, on a connection of the
+      export's own, so memory use doesn't grow with the size of the result set, and the rows go out as
+      each page comes back from Solr.  The first page is fetched before returning, so a Solr error
+      (solr.SolrException) is raised to the caller, rather than ending the stream.
+    """
+    if limit is None or limit > opasConfig.EXPORT_MAX_ROWS:
+        limit = opasConfig.EXPORT_MAX_ROWS
+
+    if page_size is None:
+        page_size = opasConfig.EXPORT_PAGE_SIZE
+
+    if solr_query_spec.solrQuery is None:
+        solr_query_spec.solrQuery = models.SolrQuery()
+
+    if solr_query_spec.solrQueryOpts is None:
+        solr_query_spec.solrQueryOpts = models.SolrQueryOpts()
+
+    solr_params = {"q": solr_query_spec.solrQuery.searchQ,
+                   "fq": solr_query_spec.solrQuery.filterQ,
+                   "q_op": solr_query_spec.solrQueryOpts.qOper,
+                   "fields": ", ".join(fields),
+                   "score": "score" in fields,
+                   "sort": opasQueryHelper.cursor_sort(solr_query_spec.solrQuery.sort),
+                   "rows": min(page_size, limit)
+                  }
+
+    conn = solr_connection(SOLR_DOCS)
+    try:
+        results = conn.query(cursorMark="*", **solr_params)
+    except Exception:
+        conn.close()
+        raise
+
+    count = min(results._numFound, limit)
+
+    def export_rows(results):
+        sent = 0
+        cursor = "*"
+        try:
+            while sent < count:
+                for result in results.results[:count - sent]:
+                    row = {field: result.get(field, None) for field in fields}
+                    yield json.dumps(row, default=str) + "\n"
+                    sent += 1
+
+                next_cursor_mark = getattr(results, "nextCursorMark", cursor)
+                if sent >= count or next_cursor_mark == cursor or len(results.results) == 0:
+                    break
+                cursor = next_cursor_mark
+                results = conn.query(cursorMark=cursor, **solr_params)
+        except Exception as e:
+            # the response has started, so all that can be done is end it (short)
+            logger.error(f"Export ended after {sent} of {count} documents ({e})")
+        finally:
+            conn.close()
+
+    return count, export_rows(results)
+
 ##================================================================================================================
 def submit_file(submit_token: bytes, xml_data: bytes, pdf_data: bytes): 
     pass
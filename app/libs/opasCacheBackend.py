@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasCacheBackend
+
+Storage for the result caches (opasCorpusCache.GenerationCache), chosen per cache by
+  opasConfig.CACHE_BACKEND (and CACHE_BACKEND_BY_CACHE):
+
+  - "memory": an LRU dict in the process, bounded by entry count.  With several server worker
+    processes, each has its own copy, computed and warmed separately.
+  - "sqlite": a SQLite database on local disk (opasConfig.SHARED_CACHE_FILE), shared by all the
+    worker processes on the machine, bounded by the total size of the entries
+    (opasConfig.SHARED_CACHE_MAX_BYTES).  An entry is computed once per machine, and memory isn't
+    multiplied by the worker count: the hot part of the file is in the OS page cache, once.
+
+Only the GenerationCache caches use a backend.  Other per process state (the source information, the
+  term indexes, the image caches) isn't kept here, and sessions are in the database.
+
+Each entry has a tag (e.g., the corpus generation it was computed in); looking it up with another tag
+  is a miss.  Entries can also have a time to live, and the least recently used are evicted first.
+  Expired entries are kept until evicted, so they can be served stale (e.g., while Solr is down).
+
+Values in the sqlite backend are stored as JSON (encode_value), so a lookup returns a new copy each
+  time; values which can't be encoded (only the models and enums in models, tuples, lists, dicts
+  with string keys, datetimes and JSON's own types can), or are larger than
+  opasConfig.SHARED_CACHE_MAX_ITEM_BYTES, are not cached.  Reading an entry doesn't run code from the
+  file (unlike unpickling), but the file is still only used if it, and its folder, are owned by the
+  server's user, and not writable by others (check_file_permissions); the folder is created with
+  mode 0700.  A cache never fails a request: if the database can't be used (e.g., it's locked for
+  longer than opasConfig.SHARED_CACHE_TIMEOUT, or its permissions are unsafe), the lookup is a miss,
+  and the value isn't stored.
+
+    >>> backend = MemoryBackend("doctest", max_entries=2)
+    >>> for key, value in (("a", 1), ("b", 2), ("c", 3)):
+    ...     backend.set(key, value, tag=1)
+    >>> backend.get("a", tag=1) is MISSING, backend.get("c", tag=1), backend.get("c", tag=2) is MISSING
+    (True, 3, True)
+    >>> import tempfile
+    >>> shared = SQLiteBackend("doctest", filename=os.path.join(tempfile.mkdtemp(), "doctest.sqlite"))
+    >>> shared.set(("IJP", 1), {"count": 10}, tag=1)
+    >>> shared.get(("IJP", 1), tag=1), shared.entry_count()
+    ({'count': 10}, 1)
+    >>> shared.set("gone", 1, ttl=-1)
+    >>> shared.get("gone") is MISSING, shared.get("gone", stale=True)
+    (True, 1)
+    >>> decode_value(encode_value((1, [models.TermIndexItem(term="dream", termCount=3)])))
+    (1, [TermIndexItem(field=None, term='dream', termCount=3)])
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+    #2026.1019.2 - Expired entries kept until evicted, and returned by get with stale
+    #2026.1019.3 - Values stored as JSON rather than pickled; the file and its folder must be private to the server's user
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.3"
+__status__      = "Development"
+
+import os
+import sys
+import json
+import stat
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+from enum import Enum
+from datetime import datetime
+from pydantic import BaseModel
+
+import opasConfig
+import models
+import logging
+logger = logging.getLogger(__name__)
+
+MISSING = object() # returned by get when there's no (current) entry, since None can be cached
+
+# a lookup only records its use (a write) if the entry's last use was longer ago than this (seconds)
+LAST_USED_RESOLUTION = 10
+# the total size is checked (and least recently used entries evicted) after this share of the maximum is written
+EVICTION_CHECK_SHARE = 0.05
+# evictions bring the total size down to this share of the maximum
+EVICTION_TARGET_SHARE = 0.9
+
+#-----------------------------------------------------------------------------
+class MemoryBackend(object):
+    """
+    A thread safe LRU dict in this process, bounded by entry count
+    """
+    shared = False
+
+    def __init__(self, name, max_entries=None):
+        self.name = name
+        self.max_entries = max_entries or opasConfig.CORPUS_CACHE_MAX_ENTRIES
+        self.entries = OrderedDict() # key: (tag, expires, value)
+        self.lock = threading.Lock()
+
+    def get(self, key, tag=None, stale=False):
+        """
+        Return the value for key (with the tag, and not expired, unless stale), or MISSING
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            entry_tag, expires, value = entry
+            if entry_tag != tag:
+                del self.entries[key]
+                return MISSING
+            if expires is not None and expires < time.time() and not stale:
+                return MISSING
+            self.entries.move_to_end(key)
+
+        return value
+
+    def set(self, key, value, tag=None, ttl=None):
+        """
+        Store value for key, with the tag, for ttl seconds (None for no limit)
+        """
+        with self.lock:
+            self.entries[key] = (tag, None if ttl is None else time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def entry_count(self):
+        return len(self.entries)
+
+#-----------------------------------------------------------------------------
+class UnsafeCacheFileError(PermissionError):
+    """
+    The shared cache file (or its folder) could be changed by another user
+    """
+
+def check_file_permissions(path):
+    """
+    Raise UnsafeCacheFileError if path isn't owned by this process's user, or is writable by its group or others
+
+    (Not checked where there are no user ids, e.g., on Windows.)
+    """
+    if hasattr(os, "getuid"):
+        path_stat = os.stat(path)
+        if path_stat.st_uid != os.getuid():
+            raise UnsafeCacheFileError(f"{path} is owned by another user (uid {path_stat.st_uid})")
+        if path_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            raise UnsafeCacheFileError(f"{path} is writable by other users (mode {stat.filemode(path_stat.st_mode)})")
+
+# the keys tagging the encoded values which JSON doesn't have (so, not allowed as dict keys)
+TAGS = ("__tuple__", "__model__", "__enum__", "__datetime__")
+
+def is_models_class(cls, base):
+    # a class (subclass of base) defined in models (not, e.g., BaseModel, which models imports)
+    return isinstance(cls, type) and issubclass(cls, base) \
+           and cls.__module__ == models.__name__ and getattr(models, cls.__name__, None) is cls
+
+def encode_value(value):
+    """
+    Return value as JSON, with the models (and enums) in models, tuples and datetimes tagged, so
+      decode_value can restore them as they were (the models' fields aren't validated again).
+
+    Raises TypeError for a value which can't be encoded.
+
+    >>> encode_value({"dream": (1, 2)})
+    '{"dream": {"__tuple__": [1, 2]}}'
+    >>> encode_value({1: "a"})
+    Traceback (most recent call last):
+    ...
+    TypeError: Only string keys can be cached, not 1
+    """
+    def tagged(value):
+        if value is None or isinstance(value, (str, int, float)) and not isinstance(value, Enum):
+            return value
+        elif isinstance(value, BaseModel):
+            if not is_models_class(type(value), BaseModel):
+                raise TypeError(f"Only the models in models can be cached, not {type(value)}")
+            return {"__model__": type(value).__name__,
+                    "fields": {name: tagged(item) for name, item in value.__dict__.items()},
+                    "fields_set": sorted(value.__fields_set__)}
+        elif isinstance(value, Enum):
+            if not is_models_class(type(value), Enum):
+                raise TypeError(f"Only the enums in models can be cached, not {type(value)}")
+            return {"__enum__": type(value).__name__, "value": tagged(value.value)}
+        elif isinstance(value, datetime):
+            return {"__datetime__": value.isoformat()}
+        elif isinstance(value, tuple):
+            return {"__tuple__": [tagged(item) for item in value]}
+        elif isinstance(value, list):
+            return [tagged(item) for item in value]
+        elif isinstance(value, dict):
+            for key in value:
+                if not isinstance(key, str) or key in TAGS:
+                    raise TypeError(f"Only string keys can be cached, not {key!r}")
+            return {key: tagged(item) for key, item in value.items()}
+        else:
+            raise TypeError(f"{type(value)} can't be cached")
+
+    return json.dumps(tagged(value))
+
+def decode_value(data):
+    """
+    Return the value encoded (as JSON) by encode_value.  Only the models (and enums) in models are created.
+
+    Raises ValueError if the data isn't an encoded value.
+    """
+    def models_class(name, base):
+        ret_val = getattr(models, name, None)
+        if not is_models_class(ret_val, base):
+            raise ValueError(f"Not a {base.__name__} in models: {name}")
+        return ret_val
+
+    def untagged(value):
+        if isinstance(value, list):
+            return [untagged(item) for item in value]
+        elif isinstance(value, dict):
+            if "__tuple__" in value:
+                return tuple(untagged(item) for item in value["__tuple__"])
+            elif "__model__" in value:
+                model = models_class(value["__model__"], BaseModel)
+                return model.construct(_fields_set=set(value["fields_set"]),
+                                       **{name: untagged(item) for name, item in value["fields"].items()})
+            elif "__enum__" in value:
+                return models_class(value["__enum__"], Enum)(untagged(value["value"]))
+            elif "__datetime__" in value:
+                return datetime.fromisoformat(value["__datetime__"])
+            else:
+                return {key: untagged(item) for key, item in value.items()}
+        else:
+            return value
+
+    return untagged(json.loads(data))
+
+#-----------------------------------------------------------------------------
+class SQLiteBackend(object):
+    """
+    Entries (of the cache name) in a SQLite database file shared by the processes on the machine,
+      bounded by the total size of the entries of all the caches in the file
+    """
+    shared = True
+
+    def __init__(self, name, filename=None, max_bytes=None):
+        self.name = name
+        self.filename = filename or opasConfig.SHARED_CACHE_FILE
+        self.max_bytes = max_bytes or opasConfig.SHARED_CACHE_MAX_BYTES
+        self.local = threading.local() # a connection per thread (and process)
+        self.written = 0 # bytes written since the last eviction check
+        self.written_lock = threading.Lock()
+
+    def connection(self):
+        """
+        Return this thread's connection, opening it (and creating the folder, file and table) on first use.
+
+        Raises UnsafeCacheFileError if the file or its folder could be changed by another user.
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None or self.local.pid != os.getpid(): # not one inherited over a fork
+            folder = os.path.dirname(os.path.abspath(self.filename))
+            os.makedirs(folder, mode=0o700, exist_ok=True)
+            check_file_permissions(folder)
+            if not os.path.exists(self.filename):
+                os.close(os.open(self.filename, os.O_CREAT | os.O_WRONLY, 0o600))
+            check_file_permissions(self.filename)
+            connection = sqlite3.connect(self.filename, timeout=opasConfig.SHARED_CACHE_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL") # readers don't wait for the writer
+            connection.execute("PRAGMA synchronous=NORMAL") # it's a cache: a lost write on a crash is fine
+            connection.execute("""CREATE TABLE IF NOT EXISTS cache_entries (
+                                      cache TEXT NOT NULL,
+                                      key TEXT NOT NULL,
+                                      tag TEXT,
+                                      value BLOB NOT NULL,
+                                      size INTEGER NOT NULL,
+                                      expires REAL,
+                                      last_used REAL NOT NULL,
+                                      PRIMARY KEY (cache, key))""")
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_entries_last_used ON cache_entries (last_used)")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+
+        return connection
+
+    @staticmethod
+    def db_key(value):
+        # keys (and tags) are tuples and strings of the query parameters, the same in every process
+        return hashlib.sha1(repr(value).encode("utf-8")).hexdigest()
+
+    def get(self, key, tag=None, stale=False):
+        """
+        Return the value for key (with the tag, and not expired, unless stale), or MISSING
+        """
+        ret_val = MISSING
+        try:
+            connection = self.connection()
+            row = connection.execute("SELECT tag, value, expires, last_used FROM cache_entries WHERE cache = ? AND key = ?",
+                                     (self.name, self.db_key(key))).fetchone()
+            now = time.time()
+            if row is not None and row[0] == self.db_key(tag) and (row[2] is None or row[2] >= now or stale):
+                ret_val = decode_value(row[1])
+                if now - row[3] > LAST_USED_RESOLUTION:
+                    try:
+                        connection.execute("UPDATE cache_entries SET last_used = ? WHERE cache = ? AND key = ?",
+                                           (now, self.name, self.db_key(key)))
+                    except sqlite3.Error:
+                        pass # e.g., locked by another process's write; the entry just looks older
+        except (sqlite3.Error, OSError, ValueError, TypeError) as e:
+            logger.warning(f"Shared cache {self.name} lookup failed ({e})")
+            ret_val = MISSING
+
+        return ret_val
+
+    def set(self, key, value, tag=None, ttl=None):
+        """
+        Store value for key, with the tag, for ttl seconds (None for no limit)
+        """
+        try:
+            data = encode_value(value).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Shared cache {self.name}: value not cached, can't be encoded ({e})")
+            return
+        if len(data) > opasConfig.SHARED_CACHE_MAX_ITEM_BYTES:
+            return
+
+        now = time.time()
+        try:
+            self.connection().execute("INSERT OR REPLACE INTO cache_entries (cache, key, tag, value, size, expires, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      (self.name, self.db_key(key), self.db_key(tag), data, len(data), None if ttl is None else now + ttl, now))
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Shared cache {self.name}: value not stored ({e})")
+            return
+
+        with self.written_lock:
+            self.written += len(data)
+            check = self.written >= self.max_bytes * EVICTION_CHECK_SHARE
+            if check:
+                self.written = 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """
+        If the entries (of all the caches in the file) are over the maximum size, delete the expired
+          entries, then the least recently used, down to EVICTION_TARGET_SHARE of the maximum
+        """
+        try:
+            connection = self.connection()
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            if total > self.max_bytes:
+                connection.execute("DELETE FROM cache_entries WHERE expires < ?", (time.time(), ))
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            excess = total - self.max_bytes * EVICTION_TARGET_SHARE
+            if total > self.max_bytes:
+                rowids = []
+                for rowid, size in connection.execute("SELECT rowid, size FROM cache_entries ORDER BY last_used"):
+                    rowids.append(rowid)
+                    excess -= size
+                    if excess <= 0:
+                        break
+                for n in range(0, len(rowids), 500):
+                    batch = rowids[n:n + 500]
+                    connection.execute(f"DELETE FROM cache_entries WHERE rowid IN ({','.join('?' * len(batch))})", batch)
+                logger.info(f"Shared cache: {len(rowids)} least recently used entries evicted")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Shared cache eviction failed ({e})")
+
+    def clear(self):
+        try:
+            self.connection().execute("DELETE FROM cache_entries WHERE cache = ?", (self.name, ))
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Shared cache {self.name} could not be cleared ({e})")
+
+    def entry_count(self):
+        try:
+            ret_val = self.connection().execute("SELECT COUNT(*) FROM cache_entries WHERE cache = ?", (self.name, )).fetchone()[0]
+        except (sqlite3.Error, OSError):
+            ret_val = None
+
+        return ret_val
+
+#-----------------------------------------------------------------------------
+def get_backend(name, max_entries=None):
+    """
+    Return a new backend for the cache name, of the kind configured for it (opasConfig.CACHE_BACKEND_BY_CACHE,
+      else opasConfig.CACHE_BACKEND); max_entries is the bound of a memory backend
+    """
+    kind = opasConfig.CACHE_BACKEND_BY_CACHE.get(name, opasConfig.CACHE_BACKEND)
+    if kind == "sqlite":
+        ret_val = SQLiteBackend(name)
+    else:
+        if kind != "memory":
+            logger.error(f"Unknown cache backend {kind} for {name}; using memory")
+        ret_val = MemoryBackend(name, max_entries=max_entries)
+
+    return ret_val
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasCacheBackend Tests complete.")
+    sys.exit()
@@ -36,6 +36,11 @@ OPASCENTRAL TABLES (and Views) CURRENTLY USED:
 #2019.1110.1 - Updates for database view/table naming cleanup
 #2020.0426.1 - Updates to ensure doc tests working, a couple of parameters changed names
 #2020.0530.1 - Fixed doc tests for termindex, they were looking at number of terms rather than term counts
+#2026.1019.1 - Connections opened, open and failed, and the time to connect, are counted in opasMetrics
+#2026.1019.1 - SourceInfoDB reads the source data on first use rather than when created (e.g., at import)
+#2026.1019.1 - SourceInfoDB doesn't keep an empty result (e.g., the database was down); it reads again on the next use
+#2026.1019.2 - A dropped connection (no longer open) is discarded, and counted as closed, when closed or replaced
+#2026.1019.2 - Connections have timeouts, are retried after a jittered backoff, and go through the mysql circuit breaker
 
 __author__      = "Neil R. Shapiro"
 __copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
@@ -53,6 +58,8 @@ sys.path.append('../config')
 
 import opasConfig
 from opasConfig import norm_val # use short form everywhere
+import opasMetrics
+import opasCircuitBreaker
 
 import localsecrets
 # from localsecrets import DBHOST, DBUSER, DBPW, DBNAME
@@ -62,6 +69,7 @@ logger = logging.getLogger(__name__)
 
 from datetime import datetime # , timedelta
 import time
+import threading
 
 # import secrets
 # from pydantic import BaseModel
@@ -167,15 +175,33 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 class SourceInfoDB(object):
+    """
+    The productbase data by source code, read from the database on first use
+    """
     def __init__(self):
-        self.sourceData = {}
-        ocd = opasCentralDB()
-        recs = ocd.get_productbase_data()
-        for n in recs:
-            try:
-                self.sourceData[n["pepsrccode"]] = n
-            except KeyError as e:
-                print ("Missing Source Code Value in %s" % n)
+        self.source_data = None
+        self.source_data_lock = threading.Lock()
+
+    @property
+    def sourceData(self):
+        if self.source_data is None:
+            with self.source_data_lock:
+                if self.source_data is None:
+                    source_data = {}
+                    ocd = opasCentralDB()
+                    recs = ocd.get_productbase_data()
+                    for n in recs:
+                        try:
+                            source_data[n["pepsrccode"]] = n
+                        except KeyError as e:
+                            print ("Missing Source Code Value in %s" % n)
+                    if source_data:
+                        self.source_data = source_data
+                    else:
+                        # not kept (e.g., the database couldn't be reached), so it's read again on the next use
+                        return source_data
+
+        return self.source_data
 
     def lookupSourceCode(self, sourceCode):
         """
@@ -237,45 +263,80 @@ class opasCentralDB(object):
             status = False
         
         if status == False:
-            try:
-                tunneling = None
-                if localsecrets.SSH_HOST is not None:
-                    from sshtunnel import SSHTunnelForwarder
-                    self.tunnel = SSHTunnelForwarder(
-                                                      (localsecrets.SSH_HOST,
-                                                       localsecrets.SSH_PORT),
-                                                       ssh_username=localsecrets.SSH_USER,
-                                                       ssh_pkey=localsecrets.SSH_MYPKEY,
-                                                       remote_bind_address=(localsecrets.DBHOST,
-                                                                            localsecrets.DBPORT))
-                    self.tunnel.start()
-                    self.db = pymysql.connect(host='127.0.0.1',
-                                           user=localsecrets.DBUSER,
-                                           passwd=localsecrets.DBPW,
-                                           db=localsecrets.DBNAME,
-                                           port=self.tunnel.local_bind_port)
-                    tunneling = self.tunnel.local_bind_port
-                else:
-                    #  not tunneled
-                    self.db = pymysql.connect(host=localsecrets.DBHOST, port=localsecrets.DBPORT, user=localsecrets.DBUSER, password=localsecrets.DBPW, database=localsecrets.DBNAME)
-
-                logger.debug(f"Database opened by ({caller_name}) Specs: {localsecrets.DBNAME} for host {localsecrets.DBHOST},  user {localsecrets.DBUSER} port {localsecrets.DBPORT} tunnel {tunneling}")
-                self.connected = True
-            except Exception as e:
-                err_str = f"Cannot connect to database {localsecrets.DBNAME} for host {localsecrets.DBHOST},  user {localsecrets.DBUSER} port {localsecrets.DBPORT} ({e})"
-                print(err_str)
-                logger.error(err_str)
+            # a connection which was dropped (e.g., by the server) is replaced
+            self.discard_connection(caller_name)
+            breaker = opasCircuitBreaker.get_breaker("mysql")
+            if not breaker.allow():
+                logger.error(f"Database connection not attempted ({caller_name}): {opasCircuitBreaker.CircuitOpenError('mysql', breaker.retry_in())}")
                 self.connected = False
-                self.db = None
+                return self.connected
+
+            timeouts = {"connect_timeout": opasConfig.MYSQL_CONNECT_TIMEOUT,
+                        "read_timeout": opasConfig.MYSQL_READ_TIMEOUT,
+                        "write_timeout": opasConfig.MYSQL_READ_TIMEOUT}
+            for attempt in range(opasConfig.MYSQL_CONNECT_RETRIES + 1):
+                if attempt:
+                    time.sleep(opasCircuitBreaker.retry_delay(attempt - 1))
+                connect_start = time.time()
+                try:
+                    tunneling = None
+                    if localsecrets.SSH_HOST is not None:
+                        from sshtunnel import SSHTunnelForwarder
+                        self.tunnel = SSHTunnelForwarder(
+                                                          (localsecrets.SSH_HOST,
+                                                           localsecrets.SSH_PORT),
+                                                           ssh_username=localsecrets.SSH_USER,
+                                                           ssh_pkey=localsecrets.SSH_MYPKEY,
+                                                           remote_bind_address=(localsecrets.DBHOST,
+                                                                                localsecrets.DBPORT))
+                        self.tunnel.start()
+                        self.db = pymysql.connect(host='127.0.0.1',
+                                               user=localsecrets.DBUSER,
+                                               passwd=localsecrets.DBPW,
+                                               db=localsecrets.DBNAME,
+                                               port=self.tunnel.local_bind_port,
+                                               **timeouts)
+                        tunneling = self.tunnel.local_bind_port
+                    else:
+                        #  not tunneled
+                        self.db = pymysql.connect(host=localsecrets.DBHOST, port=localsecrets.DBPORT, user=localsecrets.DBUSER, password=localsecrets.DBPW, database=localsecrets.DBNAME, **timeouts)
+
+                    logger.debug(f"Database opened by ({caller_name}) Specs: {localsecrets.DBNAME} for host {localsecrets.DBHOST},  user {localsecrets.DBUSER} port {localsecrets.DBPORT} tunnel {tunneling}")
+                    self.connected = True
+                    breaker.record_success()
+                    opasMetrics.MYSQL_CONNECT_SECONDS.observe(time.time() - connect_start)
+                    opasMetrics.MYSQL_CONNECTIONS_OPENED.inc()
+                    opasMetrics.MYSQL_CONNECTIONS_OPEN.inc()
+                    break
+                except Exception as e:
+                    opasMetrics.MYSQL_CONNECTION_ERRORS.inc()
+                    breaker.record_failure(e)
+                    err_str = f"Cannot connect to database {localsecrets.DBNAME} for host {localsecrets.DBHOST},  user {localsecrets.DBUSER} port {localsecrets.DBPORT} ({e})"
+                    print(err_str)
+                    logger.error(err_str)
+                    self.connected = False
+                    self.db = None
+                    if not breaker.allow(): # now open: fail fast rather than retry
+                        break
 
         return self.connected
 
     def close_connection(self, caller_name=""):
+        self.discard_connection(caller_name)
+        # make sure to mark the connection false in any case
+        self.connected = False           
+
+    def discard_connection(self, caller_name=""):
+        """
+        Close the connection (if it's still open) and drop it.
+
+        Every connection opened was counted as open (opasMetrics.MYSQL_CONNECTIONS_OPEN), so it's counted
+          as closed here, even if it was dropped (e.g., by the server) before being closed.
+        """
         if self.db is not None:
             try:
                 if self.db.open:
                     self.db.close()
-                    self.db = None
                     logger.debug(f"Database closed by ({caller_name})")
                     if localsecrets.CONFIG == "AWSTestAccountTunnel":
                         self.tunnel.stop()
@@ -286,8 +347,8 @@ class opasCentralDB(object):
             except Exception as e:
                 logger.error(f"caller: {caller_name} the db is not open ({e})")
 
-        # make sure to mark the connection false in any case
-        self.connected = False           
+            self.db = None
+            opasMetrics.MYSQL_CONNECTIONS_OPEN.dec()
 
     def end_session(self, session_id, session_end=datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S')):
         """
@@ -1649,7 +1710,12 @@ class opasCentralDB(object):
         headers = {'content-type': 'text/xml'}
         ns = {"pepprod": "http://localhost/PEPProduct/PEPProduct"}
         soap_message = authenticate_more
-        response = requests.post(url_pads, data=soap_message, headers=headers)
+        try:
+            with opasCircuitBreaker.get_breaker("pads").guard(failures=requests.RequestException):
+                response = requests.post(url_pads, data=soap_message, headers=headers, timeout=opasConfig.PADS_TIMEOUT)
+        except (opasCircuitBreaker.CircuitOpenError, requests.RequestException) as e:
+            logger.error(f"PaDS authentication failed ({e})")
+            return ret_val
         #print (response.content)
         root = ET.fromstring(response.content)
         # parse XML return
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasCircuitBreaker
+
+Circuit breakers for the backends (Solr, MySQL and PaDS), so when one hangs or is down, requests
+  fail fast rather than each waiting out its timeout (and the worker threads piling up).
+
+A breaker is closed (calls go through) until opasConfig.BREAKER_FAILURE_THRESHOLD consecutive calls
+  fail, then open: calls fail fast (CircuitOpenError) for opasConfig.BREAKER_RESET_TIMEOUT seconds.
+  Then it's half open: one trial call goes through, which closes the breaker if it succeeds, or opens
+  it again if it fails.
+
+Solr queries (solrpy) are guarded by a request gate and observer registered here: an open breaker
+  raises SolrUnavailableError, a solrpy SolrException (503), so callers handle it as they do Solr's
+  own errors.  Connection errors, timeouts and 5xx responses count as failures; other Solr errors
+  (e.g., a query syntax error) don't.  Other calls are guarded with the guard context manager.  While
+  the Solr breaker is open, the result caches serve stale entries (opasCorpusCache).
+
+The MySQL breaker only guards opening a connection (opasCentralDBLib.opasCentralDB.open_connection):
+  a query which fails, or hangs until MYSQL_READ_TIMEOUT, on a connection already open isn't counted
+  (and isn't stopped by an open breaker).  The PaDS breaker guards each PaDS request
+  (opasDocPermissions.pads_get).
+
+The state of the breakers is in the server status (breaker_status).
+
+    >>> breaker = CircuitBreaker("doctest", failure_threshold=2, reset_timeout=60)
+    >>> for n in range(2):
+    ...     breaker.record_failure()
+    >>> breaker.state, breaker.allow()
+    ('open', False)
+    >>> breaker.opened_at -= 60 # as if the reset timeout had passed
+    >>> breaker.allow(), breaker.state, breaker.allow()
+    (True, 'half open', False)
+    >>> breaker.record_success()
+    >>> breaker.state
+    'closed'
+    >>> 0 <= retry_delay(3, backoff=0.2, backoff_max=1.0) <= 1.0
+    True
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.1"
+__status__      = "Development"
+
+import sys
+import time
+import random
+import threading
+import http.client
+import contextlib
+
+import solrpy as solr
+
+import opasConfig
+import logging
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half open"
+
+breakers = {} # name: CircuitBreaker, for breaker_status
+breakers_lock = threading.Lock()
+
+class CircuitOpenError(Exception):
+    """
+    The backend's breaker is open: the call wasn't made
+    """
+    def __init__(self, name, retry_in=None):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"{name} is unavailable (circuit breaker open; retrying in {retry_in or 0:.0f} seconds)")
+
+class SolrUnavailableError(solr.SolrException, CircuitOpenError):
+    """
+    The Solr breaker is open: a SolrException (503), for the callers handling Solr's errors
+    """
+    def __init__(self, retry_in=None):
+        CircuitOpenError.__init__(self, "solr", retry_in)
+        solr.SolrException.__init__(self, httpcode=503, reason=self.args[0])
+
+#-----------------------------------------------------------------------------
+def retry_delay(attempt, backoff=None, backoff_max=None):
+    """
+    Return the seconds to wait before retry attempt (0 for the first retry): a random time up to
+      backoff * 2**attempt, capped at backoff_max (full jitter, so retries from many threads spread out)
+    """
+    backoff = opasConfig.RETRY_BACKOFF if backoff is None else backoff
+    backoff_max = opasConfig.RETRY_BACKOFF_MAX if backoff_max is None else backoff_max
+    return random.uniform(0, min(backoff_max, backoff * 2 ** attempt))
+
+#-----------------------------------------------------------------------------
+class CircuitBreaker(object):
+    """
+    A thread safe circuit breaker for a backend
+    """
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or opasConfig.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or opasConfig.BREAKER_RESET_TIMEOUT
+        self.state = CLOSED
+        self.failures = 0 # consecutive
+        self.opened_at = None
+        self.trial_started = None
+        self.times_opened = 0
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """
+        Return True if a call may be made now (when half open, only for the one trial call)
+        """
+        with self.lock:
+            now = time.time()
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.trial_started = now
+                logger.info(f"Circuit breaker {self.name} half open: trying a call")
+                return True
+            if self.state == HALF_OPEN and now - self.trial_started >= self.reset_timeout:
+                # the trial's outcome was never recorded; allow another
+                self.trial_started = now
+                return True
+
+        return False
+
+    def retry_in(self):
+        """
+        Return the seconds until a trial call is allowed (0 if the breaker isn't open)
+        """
+        with self.lock:
+            if self.state != OPEN:
+                return 0
+            return max(0, self.opened_at + self.reset_timeout - time.time())
+
+    def is_open(self):
+        return self.state != CLOSED
+
+    def check(self):
+        """
+        Raise CircuitOpenError if a call may not be made now
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.warning(f"Circuit breaker {self.name} closed: the backend is answering again")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self, error=None):
+        with self.lock:
+            self.failures += 1
+            self.last_error = str(error)[:200] if error is not None else None
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.time()
+                self.times_opened += 1
+                logger.error(f"Circuit breaker {self.name} open after {self.failures} failures ({self.last_error}); "
+                             f"failing fast for {self.reset_timeout} seconds")
+
+    @contextlib.contextmanager
+    def guard(self, failures=(Exception, )):
+        """
+        Make a call through the breaker: raise CircuitOpenError if it's open, else record the call's
+          outcome, where an exception of the failures types is a failure
+        """
+        self.check()
+        try:
+            yield self
+        except failures as e:
+            self.record_failure(e)
+            raise
+        except Exception:
+            self.record_success() # the backend answered
+            raise
+        self.record_success()
+
+    def status(self):
+        """
+        Return a dict of the breaker's state
+        """
+        retry_in = self.retry_in()
+        with self.lock:
+            ret_val = {"name": self.name,
+                       "state": self.state,
+                       "consecutive_failures": self.failures,
+                       "times_opened": self.times_opened,
+                       "retry_in_seconds": round(retry_in, 1) if self.state == OPEN else None,
+                       "last_error": self.last_error
+                      }
+        return ret_val
+
+#-----------------------------------------------------------------------------
+def get_breaker(name):
+    """
+    Return the breaker for the backend name, creating it on first use
+    """
+    with breakers_lock:
+        ret_val = breakers.get(name)
+        if ret_val is None:
+            ret_val = breakers[name] = CircuitBreaker(name)
+
+    return ret_val
+
+def breaker_status():
+    """
+    Return a list of the state of each breaker (see CircuitBreaker.status)
+    """
+    return [breaker.status() for breaker in [get_breaker(name) for name in ("solr", "mysql", "pads")]]
+
+#-----------------------------------------------------------------------------
+# Solr (solrpy) queries
+
+def solr_request_gate(selector):
+    """
+    solrpy request gate: fail fast while the Solr breaker is open
+    """
+    breaker = get_breaker("solr")
+    if not breaker.allow():
+        raise SolrUnavailableError(breaker.retry_in())
+
+def solr_request_observed(selector, seconds, response_bytes, qtime, error):
+    """
+    solrpy request observer: record the outcome with the Solr breaker
+    """
+    if error is None:
+        get_breaker("solr").record_success()
+    elif isinstance(error, solr.SolrException) and (error.httpcode or 0) < 500:
+        get_breaker("solr").record_success() # Solr answered (e.g., a query syntax error)
+    elif isinstance(error, (OSError, http.client.HTTPException, solr.SolrException)): # including timeouts
+        get_breaker("solr").record_failure(error)
+    else:
+        get_breaker("solr").record_success() # e.g., parsing the response
+
+solr.request_gates.append(solr_request_gate)
+solr.request_observers.append(solr_request_observed)
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasCircuitBreaker Tests complete.")
+    sys.exit()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasConversionExecutor
+
+Optional process pool for the CPU bound document conversions (XML to HTML, page extraction,
+  HTML to ePub and PDF).  These hold the GIL, so run inline in a server worker they stall every
+  other request on that worker.  With the pool enabled (opasConfig.CONVERSION_POOL_ENABLED),
+  run_conversion submits the call to a worker process and waits for the result (without the GIL).
+
+The pool is created on first use.  If it's disabled, can't be started, or breaks, the call is
+  run inline instead, so callers don't need to care whether the pool is available.
+
+The function and its arguments must be picklable: use module level functions, e.g., from opasXMLHelper.
+
+    >>> import opasXMLHelper
+    >>> run_conversion(opasXMLHelper.remove_encoding_string, '<?xml version="1.0" encoding="UTF-8"?>\\n<p/>')
+    '<p/>'
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+    #2026.1019.2 - Default pool size shares the cores among the server's worker processes
+    #2026.1019.3 - run_conversion with inline_on_timeout converts inline when the pool times out
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.3"
+__status__      = "Development"
+
+import os
+import pickle
+import threading
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+import opasConfig
+import logging
+logger = logging.getLogger(__name__)
+
+conversion_pool = None
+conversion_pool_lock = threading.Lock()
+
+class ConversionTimeoutError(Exception):
+    """
+    The conversion didn't complete within the timeout.
+    """
+    pass
+
+#-----------------------------------------------------------------------------
+def get_conversion_pool():
+    """
+    Return the process pool, creating it on first use; None if the pool is disabled or can't be started.
+    """
+    global conversion_pool
+    if not opasConfig.CONVERSION_POOL_ENABLED:
+        return None
+
+    with conversion_pool_lock:
+        if conversion_pool is None:
+            # the cores are shared by the pools of all the server's worker processes
+            workers = opasConfig.CONVERSION_POOL_WORKERS or max(1, (os.cpu_count() or 1) // opasConfig.server_worker_processes())
+            try:
+                mp_context = multiprocessing.get_context(opasConfig.CONVERSION_POOL_START_METHOD)
+                conversion_pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+            except Exception as e:
+                logger.error(f"Conversion pool could not be started; converting inline ({e})")
+                conversion_pool = None
+            else:
+                logger.info(f"Conversion pool started with {workers} worker processes")
+
+    return conversion_pool
+
+#-----------------------------------------------------------------------------
+def shutdown_conversion_pool(wait=True):
+    """
+    Shut down the process pool, if it was started (e.g., at server shutdown)
+    """
+    global conversion_pool
+    with conversion_pool_lock:
+        if conversion_pool is not None:
+            conversion_pool.shutdown(wait=wait)
+            conversion_pool = None
+
+#-----------------------------------------------------------------------------
+def run_conversion(func, *args, timeout=None, inline_on_timeout=False, **kwargs):
+    """
+    Run func(*args, **kwargs) in the conversion pool if enabled, otherwise inline, and return its result.
+
+    Exceptions raised by func are raised to the caller as usual.  If the result isn't back within
+      timeout seconds (default opasConfig.CONVERSION_TIMEOUT), raises ConversionTimeoutError, or with
+      inline_on_timeout, runs func inline instead (e.g., when the pool is saturated), so the caller still
+      gets the conversion.  (The worker process finishes the job in the background; it can't be interrupted.)
+    """
+    pool = get_conversion_pool()
+    if pool is None:
+        return func(*args, **kwargs)
+
+    if timeout is None:
+        timeout = opasConfig.CONVERSION_TIMEOUT
+
+    try:
+        future = pool.submit(func, *args, **kwargs)
+        ret_val = future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        err = f"Conversion {func.__name__} did not complete in {timeout} seconds"
+        if not inline_on_timeout:
+            logger.error(err)
+            raise ConversionTimeoutError(err)
+        logger.warning(f"{err}; converting inline")
+        ret_val = func(*args, **kwargs)
+    except BrokenProcessPool as e:
+        logger.error(f"Conversion pool is broken; restarting it, and converting inline ({e})")
+        shutdown_conversion_pool(wait=False)
+        ret_val = func(*args, **kwargs)
+    except pickle.PicklingError as e:
+        logger.warning(f"Conversion {func.__name__} can't be sent to the pool; converting inline ({e})")
+        ret_val = func(*args, **kwargs)
+
+    return ret_val
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    import sys
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasConversionExecutor Tests complete.")
+    sys.exit()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasCorpusCache
+
+Caches for results which only change when the loader updates the corpus (e.g., term counts).
+
+The corpus generation is the index version of the pepwebdocs core, which changes with every
+  commit the loader (or update_views_data) makes.  It's checked at most every
+  opasConfig.CORPUS_GENERATION_CHECK_INTERVAL seconds, so cached results can be up to that
+  old after a load.  invalidate_corpus_caches() forces a new generation in this process.
+
+A GenerationCache drops its entries whenever the corpus generation changes.  Other caches (e.g., the
+  image resolver) can be cleared too, with add_generation_listener.  Its entries are kept
+  in a backend (opasCacheBackend) per opasConfig.CACHE_BACKEND: in this process (memory), or in a
+  local store shared by the server's worker processes (sqlite), where entries are tagged with the
+  index version, so they're shared by workers in the same generation.
+
+While the Solr circuit breaker (opasCircuitBreaker) is open, an expired entry (of the last known
+  generation) is served rather than a miss, so the cached results are still available, if stale.
+
+    >>> cache = GenerationCache("doctest", max_entries=2)
+    >>> publish_corpus_generation(1)
+    >>> cache.set("a", 10)
+    >>> cache.get("a")
+    10
+    >>> publish_corpus_generation(2)
+    >>> cache.get("a") is None
+    True
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+    #2026.1019.2 - Entries kept in a pluggable backend (opasCacheBackend), with an optional time to live
+    #2026.1019.3 - Expired entries served while the Solr circuit breaker is open; generation checks go through it
+    #2026.1019.4 - add_generation_listener, to clear caches kept outside GenerationCache when the generation changes
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.4"
+__status__      = "Development"
+
+import time
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.auth import HTTPBasicAuth
+
+import localsecrets
+import opasConfig
+import opasCacheBackend
+import opasCircuitBreaker
+from configLib.opasCoreConfig import SOLR_DOCS
+import logging
+logger = logging.getLogger(__name__)
+
+corpus_generation = None      # index version of the docs core, when last checked
+corpus_generation_checked = 0 # time of the last check
+local_generation = 0          # bumped by invalidate_corpus_caches
+corpus_generation_lock = threading.Lock()
+generation_caches = {}        # name: GenerationCache, for cache_stats
+generation_listeners = []     # functions called (without arguments) when the generation changes
+
+#-----------------------------------------------------------------------------
+def fetch_corpus_generation():
+    """
+    Return the current index version of the docs core from Solr, or None if it can't be read
+      (or the Solr circuit breaker is open)
+    """
+    ret_val = None
+    breaker = opasCircuitBreaker.get_breaker("solr")
+    if not breaker.allow():
+        return ret_val
+
+    url = f"{localsecrets.SOLRURL}{SOLR_DOCS}/admin/luke"
+    params = {"numTerms": 0, "show": "index", "wt": "json"}
+    try:
+        if localsecrets.SOLRUSER is not None:
+            r = requests.get(url, params=params, auth=HTTPBasicAuth(localsecrets.SOLRUSER, localsecrets.SOLRPW),
+                             timeout=opasConfig.CORPUS_GENERATION_TIMEOUT)
+        else:
+            r = requests.get(url, params=params, timeout=opasConfig.CORPUS_GENERATION_TIMEOUT)
+        if r.status_code >= 500:
+            breaker.record_failure(f"HTTP {r.status_code}")
+        else:
+            breaker.record_success()
+        if r.status_code == 200:
+            ret_val = r.json()["index"]["version"]
+        else:
+            logger.warning(f"Corpus generation could not be read from Solr ({r.status_code})")
+    except requests.RequestException as e:
+        breaker.record_failure(e)
+        logger.warning(f"Corpus generation could not be read from Solr ({e})")
+    except Exception as e:
+        logger.warning(f"Corpus generation could not be read from Solr ({e})")
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def get_corpus_generation():
+    """
+    Return the corpus generation, a value that changes whenever the corpus (or its counts) change.
+
+    If Solr can't be reached, the last known generation is kept.
+    """
+    global corpus_generation, corpus_generation_checked
+    now = time.time()
+    changed = False
+    if now - corpus_generation_checked >= opasConfig.CORPUS_GENERATION_CHECK_INTERVAL:
+        with corpus_generation_lock:
+            # another thread may have just checked
+            if now - corpus_generation_checked >= opasConfig.CORPUS_GENERATION_CHECK_INTERVAL:
+                generation = fetch_corpus_generation()
+                if generation is not None:
+                    if generation != corpus_generation and corpus_generation is not None:
+                        logger.info(f"Corpus generation changed from {corpus_generation} to {generation}")
+                        changed = True
+                    corpus_generation = generation
+                corpus_generation_checked = time.time()
+
+    if changed:
+        notify_generation_listeners()
+
+    return (corpus_generation, local_generation)
+
+#-----------------------------------------------------------------------------
+def publish_corpus_generation(generation):
+    """
+    Set the corpus generation, e.g., by a loader running in this process, rather than wait for the next check.
+    """
+    global corpus_generation, corpus_generation_checked
+    with corpus_generation_lock:
+        changed = generation != corpus_generation
+        corpus_generation = generation
+        corpus_generation_checked = time.time()
+
+    if changed:
+        notify_generation_listeners()
+
+#-----------------------------------------------------------------------------
+def invalidate_corpus_caches():
+    """
+    Start a new generation in this process, so all GenerationCache entries are dropped, and
+      check Solr for the index version on next use.  Entries in a shared backend are deleted,
+      for all the processes using it.
+    """
+    global local_generation, corpus_generation_checked
+    with corpus_generation_lock:
+        local_generation += 1
+        corpus_generation_checked = 0
+    for cache in list(generation_caches.values()):
+        if cache.backend.shared:
+            cache.clear()
+    notify_generation_listeners()
+
+#-----------------------------------------------------------------------------
+def add_generation_listener(listener):
+    """
+    Call listener (without arguments) whenever the corpus generation changes in this process,
+      e.g., to clear a cache which isn't a GenerationCache.
+
+    >>> cleared = []
+    >>> add_generation_listener(lambda: cleared.append(True))
+    >>> publish_corpus_generation("listener1")
+    >>> publish_corpus_generation("listener1")
+    >>> len(cleared)
+    1
+    """
+    if listener not in generation_listeners:
+        generation_listeners.append(listener)
+
+#-----------------------------------------------------------------------------
+def notify_generation_listeners():
+    """
+    Call the generation listeners; an error in one is logged, and doesn't stop the others
+    """
+    for listener in list(generation_listeners):
+        try:
+            listener()
+        except Exception as e:
+            logger.error(f"Corpus generation listener error ({e})")
+
+#-----------------------------------------------------------------------------
+class GenerationCache(object):
+    """
+    A thread safe cache (LRU, in the backend configured for name), cleared whenever the corpus generation changes.
+    """
+    def __init__(self, name, max_entries=None, ttl=None):
+        self.name = name
+        self.max_entries = max_entries or opasConfig.CORPUS_CACHE_MAX_ENTRIES
+        self.ttl = ttl or opasConfig.CORPUS_CACHE_TTL
+        self.backend = opasCacheBackend.get_backend(name, max_entries=self.max_entries)
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.lock = threading.Lock()
+        generation_caches[name] = self
+
+    def _tag(self):
+        """
+        Return the tag of the entries of the current generation
+        """
+        generation = get_corpus_generation()
+        with self.lock:
+            if generation != self.generation:
+                if not self.backend.shared:
+                    self.backend.clear() # free the memory now, rather than as the entries are looked up
+                self.generation = generation
+
+        if self.backend.shared:
+            # the index version, the same in all the processes (invalidate_corpus_caches clears shared entries)
+            return generation[0]
+        return generation
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if it's not cached (in this generation).
+
+        While Solr is unavailable (its breaker is open), an expired entry is returned.
+        """
+        tag = self._tag()
+        ret_val = self.backend.get(key, tag=tag)
+        stale = False
+        if ret_val is opasCacheBackend.MISSING and opasCircuitBreaker.get_breaker("solr").is_open():
+            ret_val = self.backend.get(key, tag=tag, stale=True)
+            stale = ret_val is not opasCacheBackend.MISSING
+        with self.lock:
+            if stale:
+                self.stale_hits += 1
+            if ret_val is opasCacheBackend.MISSING:
+                self.misses += 1
+                ret_val = default
+            else:
+                self.hits += 1
+
+        return ret_val
+
+    def set(self, key, value):
+        """
+        Cache value for key, in the current generation
+        """
+        self.backend.set(key, value, tag=self._tag(), ttl=self.ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """
+        Return a dict of the cache statistics
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            ret_val = {"name": self.name,
+                       "backend": "shared" if self.backend.shared else "memory",
+                       "entries": self.backend.entry_count(),
+                       "hits": self.hits,
+                       "misses": self.misses,
+                       "stale_hits": self.stale_hits,
+                       "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                       "generation": self.generation
+                      }
+        return ret_val
+
+#-----------------------------------------------------------------------------
+def cache_stats():
+    """
+    Return a list of the statistics of each GenerationCache (see GenerationCache.stats)
+    """
+    return [cache.stats() for cache in list(generation_caches.values())]
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    import sys
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasCorpusCache Tests complete.")
+    sys.exit()
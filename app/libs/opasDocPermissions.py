@@ -1,28 +1,70 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import time
 import requests
 import opasConfig
+import opasMetrics
+import opasRequestTiming
+import opasCircuitBreaker
 import models
+import logging
+logger = logging.getLogger(__name__)
 
 # import localsecrets
 from localsecrets import PADS_TEST_ID, PADS_TEST_PW, PADS_BASED_CLIENT_IDS
 base = "https://padstest.zedra.net/PEPSecure/api"
 
+def pads_get(full_URL):
+    """
+    Get the PaDS URL through the PaDS circuit breaker, with opasConfig.PADS_TIMEOUT, retrying
+      (opasConfig.PADS_RETRIES times, after a jittered backoff) when the connection fails (e.g., it's
+      refused or reset).  A timeout, connecting or reading, isn't retried: PaDS isn't waited for again.
+      
+    Returns the response, or None if PaDS didn't answer (or its breaker is open)
+    """
+    ret_val = None
+    breaker = opasCircuitBreaker.get_breaker("pads")
+    for attempt in range(opasConfig.PADS_RETRIES + 1):
+        if attempt:
+            time.sleep(opasCircuitBreaker.retry_delay(attempt - 1))
+        try:
+            with breaker.guard(failures=requests.RequestException):
+                ret_val = requests.get(full_URL, timeout=opasConfig.PADS_TIMEOUT)
+        except opasCircuitBreaker.CircuitOpenError as e:
+            logger.warning(f"PaDS call not made: {e}")
+            break
+        except requests.ConnectTimeout as e: # a ConnectionError, but a timeout: don't wait for it again
+            logger.error(f"PaDS connection timed out ({e})")
+            break
+        except requests.ConnectionError as e:
+            logger.warning(f"PaDS connection failed ({e})")
+        except requests.RequestException as e: # e.g., a timeout: don't wait for it again
+            logger.error(f"PaDS call failed ({e})")
+            break
+        else:
+            break
+
+    return ret_val
+
+@opasRequestTiming.timed("pads")
+@opasMetrics.PADS_REQUEST_SECONDS.time("login")
 def pads_login(username=PADS_TEST_ID, password=PADS_TEST_PW):
     ret_val = False
     full_URL = base + f"/v1/Authenticate?UserName={username}&Password={password}"
-    response = requests.get(full_URL)
-    if response.ok == True:
+    response = pads_get(full_URL)
+    if response is not None and response.ok == True:
         ret_val = response.json()
     return ret_val
     
+@opasRequestTiming.timed("pads")
+@opasMetrics.PADS_REQUEST_SECONDS.time("permits")
 def pads_session_check(session_id, doc_id, doc_year):
     ret_val = False
     ret_resp = None
     full_URL = base + f"/v1/Permits?SessionId={session_id}&DocId={doc_id}&DocYear={doc_year}"
-    response = requests.get(full_URL)
-    if response.ok == True:
+    response = pads_get(full_URL)
+    if response is not None and response.ok == True:
         ret_resp = response.json()
         ret_val = ret_resp["Permit"]
 
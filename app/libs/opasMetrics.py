@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasMetrics
+
+Process metrics, served by the /metrics endpoint in the Prometheus text exposition format
+  (rendered here, so there's no client library or push gateway to install or reach).
+
+The metrics are defined here, and updated where they happen:
+  - Solr requests: latency, errors and response bytes per core and handler (a solrpy request observer)
+  - MySQL connections: open, opened, failed, and the time to connect (opasCentralDBLib)
+  - PaDS requests: latency (opasDocPermissions)
+
+and, when rendered, collected from:
+  - opasRequestTiming: requests per route, method and status, and the latency of each route and its phases
+  - opasCorpusCache: hits, misses, hit ratio and entries of each cache
+
+Histograms are kept with the (ms) buckets of opasConfig.REQUEST_TIMING_BUCKETS_MS, and rendered in seconds.
+
+    >>> counter = Counter("opas_doctest_total", "Doctest counter", ("core", ))
+    >>> counter.inc("pepwebdocs")
+    >>> print (counter.render())
+    # HELP opas_doctest_total Doctest counter
+    # TYPE opas_doctest_total counter
+    opas_doctest_total{core="pepwebdocs"} 1
+    >>> histogram = LatencyHistogram("opas_doctest_seconds", "Doctest latency", buckets=(10, 100))
+    >>> histogram.observe(0.05)
+    >>> print (histogram.render())
+    # HELP opas_doctest_seconds Doctest latency
+    # TYPE opas_doctest_seconds histogram
+    opas_doctest_seconds_bucket{le="0.01"} 0
+    opas_doctest_seconds_bucket{le="0.1"} 1
+    opas_doctest_seconds_bucket{le="+Inf"} 1
+    opas_doctest_seconds_sum 0.05
+    opas_doctest_seconds_count 1
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.1"
+__status__      = "Development"
+
+import sys
+import time
+import functools
+import threading
+
+import solrpy as solr
+
+import opasConfig
+import opasCorpusCache
+import opasRequestTiming
+from opasRequestTiming import Histogram
+import logging
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#-----------------------------------------------------------------------------
+def escape_label_value(value):
+    """
+    Escape a label value for the exposition format
+
+    >>> escape_label_value('say "hi"')
+    'say \\\\"hi\\\\"'
+    """
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(labels):
+    """
+    Return the {name="value",...} label set for a list of (name, value), or "" if there are none
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + "}"
+
+def format_value(value):
+    if value is None:
+        return "NaN"
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+def metric_header(name, help_text, metric_type):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+
+def histogram_lines(name, labels, histogram):
+    """
+    Return the bucket, sum and count lines for an opasRequestTiming.Histogram (ms), in seconds
+    """
+    ret_val = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+        cumulative += count
+        ret_val.append(f"{name}_bucket{format_labels(labels + [('le', format_value(bound / 1000))])} {cumulative}")
+    ret_val.append(f"{name}_bucket{format_labels(labels + [('le', '+Inf')])} {histogram.count}")
+    ret_val.append(f"{name}_sum{format_labels(labels)} {format_value(histogram.sum / 1000)}")
+    ret_val.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+class Counter(object):
+    """
+    A counter, per label values
+    """
+    metric_type = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def render(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        if values == [] and self.labelnames == ():
+            values = [((), 0)]
+        lines = metric_header(self.name, self.help_text, self.metric_type)
+        for labelvalues, value in values:
+            lines.append(f"{self.name}{format_labels(list(zip(self.labelnames, labelvalues)))} {format_value(value)}")
+
+        return "\n".join(lines)
+
+class Gauge(Counter):
+    """
+    A value which goes up and down, per label values
+    """
+    metric_type = "gauge"
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+class LatencyHistogram(object):
+    """
+    A histogram of durations, per label values
+    """
+    def __init__(self, name, help_text, labelnames=(), buckets=None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, seconds, *labelvalues):
+        with self.lock:
+            try:
+                histogram = self.histograms[labelvalues]
+            except KeyError:
+                histogram = self.histograms[labelvalues] = Histogram(self.buckets)
+            histogram.observe(seconds * 1000)
+
+    def time(self, *labelvalues):
+        """
+        Decorator to observe the duration of each call of the function (including failed calls)
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.time()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(time.time() - start, *labelvalues)
+            return wrapper
+
+        return decorator
+
+    def render(self):
+        lines = metric_header(self.name, self.help_text, "histogram")
+        with self.lock:
+            for labelvalues, histogram in sorted(self.histograms.items()):
+                lines.extend(histogram_lines(self.name, list(zip(self.labelnames, labelvalues)), histogram))
+
+        return "\n".join(lines)
+
+#-----------------------------------------------------------------------------
+# Metrics updated where they happen
+
+SOLR_REQUEST_SECONDS = LatencyHistogram("opas_solr_request_seconds", "Solr request time, including transfer and parsing", ("core", "handler"))
+SOLR_REQUEST_ERRORS = Counter("opas_solr_request_errors_total", "Solr requests which failed", ("core", "handler"))
+SOLR_RESPONSE_BYTES = Counter("opas_solr_response_bytes_total", "Bytes of Solr responses", ("core", "handler"))
+MYSQL_CONNECTIONS_OPEN = Gauge("opas_mysql_connections_open", "MySQL connections currently open")
+MYSQL_CONNECTIONS_OPENED = Counter("opas_mysql_connections_opened_total", "MySQL connections opened")
+MYSQL_CONNECTION_ERRORS = Counter("opas_mysql_connection_errors_total", "MySQL connections which failed to open")
+MYSQL_CONNECT_SECONDS = LatencyHistogram("opas_mysql_connect_seconds", "Time to open a MySQL connection")
+PADS_REQUEST_SECONDS = LatencyHistogram("opas_pads_request_seconds", "PaDS request time", ("call", ))
+
+METRICS = [SOLR_REQUEST_SECONDS, SOLR_REQUEST_ERRORS, SOLR_RESPONSE_BYTES,
+           MYSQL_CONNECTIONS_OPEN, MYSQL_CONNECTIONS_OPENED, MYSQL_CONNECTION_ERRORS, MYSQL_CONNECT_SECONDS,
+           PADS_REQUEST_SECONDS]
+
+def solr_request_observed(selector, seconds, response_bytes, qtime, error):
+    """
+    solrpy request observer: the selector is /solr/<core>/<handler>
+    """
+    core, handler = (selector.rstrip("/").split("/")[-2:] + ["", ""])[:2]
+    SOLR_REQUEST_SECONDS.observe(seconds, core, handler)
+    if error is not None:
+        SOLR_REQUEST_ERRORS.inc(core, handler)
+    if response_bytes is not None:
+        SOLR_RESPONSE_BYTES.inc(core, handler, amount=response_bytes)
+
+solr.request_observers.append(solr_request_observed)
+
+#-----------------------------------------------------------------------------
+# Metrics collected from the other modules' statistics
+
+def request_metrics():
+    """
+    Return the lines of the request counts and latency histograms per route (from opasRequestTiming)
+    """
+    with opasRequestTiming.route_histograms_lock:
+        counts = sorted(opasRequestTiming.route_request_counts.items(), key=str)
+        histograms = sorted(opasRequestTiming.route_histograms.items())
+        lines = metric_header("opas_requests_total", "API requests", "counter")
+        for (route, method, status), count in counts:
+            lines.append(f"opas_requests_total{format_labels([('route', route), ('method', method), ('status', status)])} {count}")
+
+        lines.extend(metric_header("opas_request_seconds", "API request time, to the start of the response", "histogram"))
+        for route, phases in histograms:
+            if "total" in phases:
+                lines.extend(histogram_lines("opas_request_seconds", [("route", route)], phases["total"]))
+
+        lines.extend(metric_header("opas_request_phase_seconds", "API request time per phase (see Server-Timing)", "histogram"))
+        for route, phases in histograms:
+            for phase, histogram in sorted(phases.items()):
+                if phase != "total":
+                    lines.extend(histogram_lines("opas_request_phase_seconds", [("route", route), ("phase", phase)], histogram))
+
+    return lines
+
+def cache_metrics():
+    """
+    Return the lines of the cache statistics (from opasCorpusCache)
+    """
+    stats = opasCorpusCache.cache_stats()
+    ret_val = []
+    for name, key, help_text, metric_type in (("opas_cache_hits_total", "hits", "Cache hits", "counter"),
+                                              ("opas_cache_misses_total", "misses", "Cache misses", "counter"),
+                                              ("opas_cache_hit_ratio", "hit_rate", "Cache hits per lookup", "gauge"),
+                                              ("opas_cache_entries", "entries", "Cache entries", "gauge")):
+        ret_val.extend(metric_header(name, help_text, metric_type))
+        for cache in stats:
+            ret_val.append(f"{name}{format_labels([('cache', cache['name'])])} {format_value(cache[key])}")
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def render_metrics():
+    """
+    Return all the metrics, in the Prometheus text exposition format
+    """
+    lines = request_metrics()
+    for metric in METRICS:
+        lines.append(metric.render())
+    lines.extend(cache_metrics())
+
+    return "\n".join(lines) + "\n"
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasMetrics Tests complete.")
+    sys.exit()
@@ -10,6 +10,7 @@ This library is meant to hold parsing and other functions which support query tr
 2019.1205.1 - First version
 2020.0416.1 - Sort fixes, new viewcount options
 2020.0530.1 - Doc Test updates
+2026.1019.1 - parse_search_query_parameters is memoized per corpus generation (cached_query_spec)
 
 """
 __author__      = "Neil R. Shapiro"
@@ -19,8 +20,12 @@ __version__     = "2020.0530.1"
 __status__      = "Development"
 
 import re
+import json
+import inspect
+import functools
 import models
 import opasCentralDBLib
+import opasCorpusCache
 
 import logging
 logger = logging.getLogger(__name__)
@@ -34,6 +39,10 @@ sourceDB = opasCentralDBLib.SourceInfoDB()
 ocd = opasCentralDBLib.opasCentralDB()
 pat_prefix_amps = re.compile("^\s*&& ")
 
+# built query specs, per (normalized) parameters; cleared when the corpus changes, since the parse
+#  looks up sources and (smart search) terms
+query_spec_cache = opasCorpusCache.GenerationCache("query_specs", max_entries=opasConfig.QUERY_SPEC_CACHE_MAX_ENTRIES)
+
 def cleanup_solr_query(solrquery):
     """
     Clean up whitespace and extra symbols that happen when building up query or solr query filter
@@ -64,6 +73,94 @@ def strip_outer_matching_chars(s, outer_char):
     if (s[0] == s[-1]) and s.startswith(outer_char):
         return s[1:-1]
     return s
+
+#-----------------------------------------------------------------------------
+def cursor_sort(sort, sort_order=None, unique_key="id"):
+    """
+    Return the sort with the unique key added as the final tiebreak, as Solr requires for
+      cursorMark paging (so the order, and hence the cursor, is stable).
+
+    If sort_order is given (solrpy style, applied to each field), it's applied to each field here.
+
+    >>> cursor_sort(None)
+    'score desc, id asc'
+    >>> cursor_sort("art_year, art_pgrg", sort_order="asc")
+    'art_year asc, art_pgrg asc, id asc'
+    >>> cursor_sort("art_cited_5 desc, id desc")
+    'art_cited_5 desc, id desc'
+    """
+    if sort is None or sort.strip() == "":
+        sort = "score desc"
+
+    fields = [field.strip() for field in sort.split(",") if field.strip() != ""]
+    if sort_order is not None:
+        fields = [f"{field} {sort_order}" for field in fields]
+    if unique_key not in [field.split()[0] for field in fields]:
+        fields.append(f"{unique_key} asc")
+
+    return ", ".join(fields)
+
+#-----------------------------------------------------------------------------
+def query_spec_cache_key(params: dict):
+    """
+    Return a hashable key for a dict of parameters: values are normalized to their JSON form (models
+      per their json()), so equal parameters make the same key however they were passed.
+
+    >>> query_spec_cache_key({"title": "west", "facetspec": {"b": 1, "a": 2}, "vol": 10})
+    (('facetspec', '{"a": 2, "b": 1}'), ('title', 'west'), ('vol', 10))
+    """
+    ret_val = []
+    for name in sorted(params):
+        value = params[name]
+        if hasattr(value, "json"):
+            value = value.json()
+        elif isinstance(value, (dict, list, tuple)):
+            value = json.dumps(value, sort_keys=True, default=str)
+        elif value is not None and not isinstance(value, (str, int, float, bool)):
+            value = repr(value)
+        ret_val.append((name, value))
+
+    return tuple(ret_val)
+
+#-----------------------------------------------------------------------------
+def cached_query_spec(func):
+    """
+    Memoize a query spec builder (parse_search_query_parameters): the built SolrQuerySpec is cached
+      (LRU, per corpus generation) by its normalized parameters, other than limit and offset, so
+      repeated searches and paging through the results skip the parse.
+
+    Callers change the spec they get (e.g., search_text_qs), so each call gets its own copy.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not opasConfig.QUERY_SPEC_CACHE_ENABLED:
+            return func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        limit = params.pop("limit", None)
+        offset = params.pop("offset", None)
+        key = query_spec_cache_key({name: value for name, value in params.items() if name != "req_url"})
+        ret_val = query_spec_cache.get(key)
+        if ret_val is None:
+            ret_val = func(limit=None, offset=None, **params)
+            query_spec_cache.set(key, ret_val.copy(deep=True))
+        else:
+            ret_val = ret_val.copy(deep=True)
+
+        if limit is not None:
+            ret_val.limit = limit
+
+        if offset is not None:
+            ret_val.offset = offset
+
+        return ret_val
+
+    return wrapper
+
 #-----------------------------------------------------------------------------
 def search_qualifiers(searchstr, field_label, field_thesaurus=None, paragraph_len=25):
     """
@@ -321,6 +418,7 @@ def get_term_list_spec(termlist):
 
 #---------------------------------------------------------------------------------------------------------
 # this function lets various endpoints like search, searchanalysis, and document, share this large parameter set.
+@cached_query_spec
 def parse_search_query_parameters(search=None,             # url based parameters, e.g., from previous search to be parsed
                                   # model based query specification, allows full specification 
                                   # of words/thes in request body, component at a time, per model
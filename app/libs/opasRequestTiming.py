@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasRequestTiming
+
+Per request timing of named phases (session, solr, xslt, pads, serialize...), so the time of a
+  slow request can be broken down.
+
+Code times a phase with the phase context manager or the timed decorator.  The times go to the
+  current request's RequestTimer, kept in a context variable, so each request has its own (whatever
+  thread its endpoint runs in), and are ignored outside of a request (e.g., background builds).
+  A phase nested in a phase of the same name is only counted once.
+
+Solr requests are timed (as solr, with Solr's QTime as solr_qtime, so the rest is the transfer
+  and parsing) by a solrpy request observer.
+
+The app starts a timer per request, and reports it, with opasRequestTimingMiddleware; the durations
+  of each request are added to the histograms of its route (see timing_stats).
+
+    >>> timer = RequestTimer()
+    >>> token = current_timer.set(timer)
+    >>> with phase("xslt"):
+    ...     with phase("xslt"):
+    ...         pass
+    >>> timer.counts["xslt"]
+    1
+    >>> current_timer.reset(token)
+    >>> histogram = Histogram(buckets=(10, 100, 1000))
+    >>> for ms in (5, 20, 30, 500):
+    ...     histogram.observe(ms)
+    >>> histogram.quantile(0.5), histogram.quantile(0.99)
+    (100, 1000)
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.1"
+__status__      = "Development"
+
+import sys
+import time
+import asyncio
+import functools
+import threading
+import contextlib
+import contextvars
+from bisect import bisect_left
+
+import solrpy as solr
+
+import opasConfig
+import logging
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------------------------------
+class RequestTimer(object):
+    """
+    The phase durations (seconds) and counts of one request
+    """
+    def __init__(self):
+        self.start = time.time()
+        self.route = None
+        self.durations = {}
+        self.counts = {}
+        self.active = set()
+        self.solr_queries = [] # noted for the slow query log (opasSlowQueryLog.note_query)
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, count=1):
+        with self.lock:
+            self.durations[name] = self.durations.get(name, 0) + seconds
+            self.counts[name] = self.counts.get(name, 0) + count
+
+    def elapsed(self):
+        return time.time() - self.start
+
+    def server_timing(self, total):
+        """
+        Return the Server-Timing header value for the phases, and the total (seconds)
+
+        >>> timer = RequestTimer()
+        >>> timer.add("solr", 0.0123)
+        >>> timer.add("solr", 0.002)
+        >>> timer.server_timing(0.05)
+        'solr;dur=14.3;desc="2 calls", total;dur=50.0'
+        """
+        metrics = []
+        for name, seconds in self.durations.items():
+            metric = f"{name};dur={seconds * 1000:.1f}"
+            if self.counts.get(name, 1) > 1:
+                metric += f';desc="{self.counts[name]} calls"'
+            metrics.append(metric)
+        metrics.append(f"total;dur={total * 1000:.1f}")
+
+        return ", ".join(metrics)
+
+current_timer = contextvars.ContextVar("opas_request_timer", default=None)
+
+#-----------------------------------------------------------------------------
+@contextlib.contextmanager
+def phase(name):
+    """
+    Time the enclosed code as the named phase of the current request (if any)
+    """
+    timer = current_timer.get()
+    if timer is None or name in timer.active:
+        yield
+    else:
+        timer.active.add(name)
+        start = time.time()
+        try:
+            yield
+        finally:
+            timer.active.discard(name)
+            timer.add(name, time.time() - start)
+
+def timed(name):
+    """
+    Decorator to time each call of the function as the named phase of the current request (if any)
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with phase(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+
+    return decorator
+
+#-----------------------------------------------------------------------------
+def solr_request_observed(selector, seconds, response_bytes, qtime, error):
+    """
+    solrpy request observer: add the request time (and QTime) to the current request's timer
+    """
+    timer = current_timer.get()
+    if timer is not None and "solr" not in timer.active:
+        timer.add("solr", seconds)
+        if qtime is not None:
+            timer.add("solr_qtime", qtime / 1000)
+
+solr.request_observers.append(solr_request_observed)
+
+#-----------------------------------------------------------------------------
+class Histogram(object):
+    """
+    Counts of observations (ms) per bucket (upper bounds, plus one for larger values)
+    """
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or opasConfig.REQUEST_TIMING_BUCKETS_MS)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, ms):
+        self.bucket_counts[bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.sum += ms
+
+    def quantile(self, q):
+        """
+        Return the upper bound of the bucket the q quantile falls in (None if it's over the largest)
+        """
+        ret_val = None
+        if self.count > 0:
+            rank = q * self.count
+            cumulative = 0
+            for bound, count in zip(self.buckets, self.bucket_counts):
+                cumulative += count
+                if cumulative >= rank:
+                    ret_val = bound
+                    break
+
+        return ret_val
+
+    def stats(self):
+        return {"count": self.count,
+                "mean_ms": round(self.sum / self.count, 1) if self.count else None,
+                "p50_ms": self.quantile(0.5),
+                "p95_ms": self.quantile(0.95),
+                "p99_ms": self.quantile(0.99)
+               }
+
+route_histograms = {} # route: {phase: Histogram}
+route_request_counts = {} # (route, method, status): requests
+route_histograms_lock = threading.Lock()
+
+def observe_request(route, durations, method=None, status=None):
+    """
+    Add the phase durations (dict of name: seconds) of a request to the route's histograms,
+      and count the request (by method and status)
+    """
+    with route_histograms_lock:
+        key = (route, method, status)
+        route_request_counts[key] = route_request_counts.get(key, 0) + 1
+        histograms = route_histograms.setdefault(route, {})
+        for name, seconds in durations.items():
+            try:
+                histogram = histograms[name]
+            except KeyError:
+                histogram = histograms[name] = Histogram()
+            histogram.observe(seconds * 1000)
+
+def timing_stats():
+    """
+    Return a list of dicts with the count and quantiles of each phase (and the total) per route
+    """
+    with route_histograms_lock:
+        ret_val = [{"route": route,
+                    "phases": {name: histogram.stats() for name, histogram in histograms.items()}}
+                   for route, histograms in sorted(route_histograms.items())]
+
+    return ret_val
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasRequestTiming Tests complete.")
+    sys.exit()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasRequestTimingMiddleware
+
+The app side of opasRequestTiming.
+
+RequestTimingMiddleware starts the timer for each request, and when the response starts:
+  - adds a Server-Timing header with the phase durations (ms)
+  - logs a line (JSON) with the route, status and phase durations
+  - adds the durations to the histograms of the route (opasRequestTiming.timing_stats)
+
+TimedRoute, the app's route class, times the endpoint, and the rest of the route handler (mostly the
+  validation and serialization of the response model) as "serialize".
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.1"
+__status__      = "Development"
+
+import json
+import time
+
+from fastapi.routing import APIRoute
+from starlette.middleware.base import BaseHTTPMiddleware
+
+import opasConfig
+import opasSlowQueryLog
+from opasRequestTiming import RequestTimer, current_timer, timed, observe_request
+import logging
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------------------------------
+class TimedRoute(APIRoute):
+    """
+    An APIRoute which times its endpoint, and the rest of its handler (as serialize)
+    """
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, timed("endpoint")(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def timed_route_handler(request):
+            timer = current_timer.get()
+            if timer is None:
+                return await handler(request)
+
+            timer.route = route
+            start = time.time()
+            try:
+                return await handler(request)
+            finally:
+                handler_time = time.time() - start
+                timer.add("serialize", max(0, handler_time - timer.durations.get("endpoint", 0)))
+
+        return timed_route_handler
+
+#-----------------------------------------------------------------------------
+class RequestTimingMiddleware(BaseHTTPMiddleware):
+    """
+    Times each request, and reports the phase durations (Server-Timing header, log line and histograms)
+    """
+    async def dispatch(self, request, call_next):
+        if not opasConfig.REQUEST_TIMING_ENABLED:
+            return await call_next(request)
+
+        timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            response = await call_next(request)
+        finally:
+            current_timer.reset(token)
+
+        total = timer.elapsed()
+        if opasConfig.REQUEST_TIMING_HEADER:
+            response.headers["Server-Timing"] = timer.server_timing(total)
+        durations = dict(timer.durations, total=total)
+        route = timer.route or "(unrouted)"
+        observe_request(route, durations, method=request.method, status=response.status_code)
+        opasSlowQueryLog.request_finished(timer, total, request.method, route, request.url.path, response.status_code)
+        if opasConfig.REQUEST_TIMING_LOG:
+            logger.info(json.dumps({"method": request.method,
+                                    "route": route,
+                                    "path": request.url.path,
+                                    "status": response.status_code,
+                                    "ms": {name: round(seconds * 1000, 1) for name, seconds in durations.items()},
+                                    "calls": timer.counts
+                                   }))
+
+        return response
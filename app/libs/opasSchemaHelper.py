@@ -6,6 +6,7 @@
 opasSchemaHelper
 
 2020.0821.1 - First version
+2026.1019.1 - Schema requests time out after opasConfig.SOLR_TIMEOUT
 
 """
 __author__      = "Neil R. Shapiro"
@@ -26,7 +27,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 # import schemaMap
-# import opasConfig
+import opasConfig
 from configLib.opasCoreConfig import EXTENDED_CORES, direct_endpoint_call
 
 # -------------------------------------------------------------------------------------------------------
@@ -45,7 +46,7 @@ def solr_field_check(core, field_name):
         endpoint = f"/{core}/schema/fields/{field_name}/?showDefaults=true"
         
         apicall = direct_endpoint_call(endpoint, SOLRURL)
-        response = requests.get(apicall, auth=HTTPBasicAuth(SOLRUSER, SOLRPW))
+        response = requests.get(apicall, auth=HTTPBasicAuth(SOLRUSER, SOLRPW), timeout=opasConfig.SOLR_TIMEOUT)
         r = response.json()
         try:
             if r["field"]["name"] == field_name:
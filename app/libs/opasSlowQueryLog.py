@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasSlowQueryLog
+
+A log of the Solr queries of slow requests, to find the kinds of queries (highlighting, wildcards,
+  facets, deep paging...) which dominate the load.
+
+Code which queries Solr for a request notes the query (note_query): the final Solr parameters,
+  QTime, numFound and the response size.  When the request is done, if it took at least
+  opasConfig.SLOW_QUERY_THRESHOLD_MS (or is sampled, per opasConfig.SLOW_QUERY_SAMPLE_RATE), its
+  queries are written, one JSON record per line, with the route and the total handler time, to a
+  rotating local file (opasConfig.SLOW_QUERY_LOG_FILE).
+
+slow_query_report summarizes the records in the file (and its backups), for the admin report endpoint.
+
+    >>> query_features({"q": "text:freud*", "hl": "true", "rows": 10})
+    ['highlighting', 'wildcard']
+    >>> query_features({"q": "art_id:IJP.001.0001A", "facet_field": ["art_year"], "rows": 1000})
+    ['facets', 'large_page']
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+    #2026.1019.2 - Records file not rotated in process when several worker processes share it
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.2"
+__status__      = "Development"
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import logging.handlers
+
+import opasConfig
+import opasRequestTiming
+logger = logging.getLogger(__name__)
+
+# the records go to their own rotating file, rather than the API log
+record_logger = logging.getLogger("opasSlowQueryLog.records")
+record_logger.propagate = False
+record_logger.setLevel(logging.INFO)
+record_file_handler = None
+
+#-----------------------------------------------------------------------------
+def record_handler():
+    """
+    Return the file handler of the records, adding it (on first use).
+
+    The file is shared by the server's worker processes, which append whole lines to it.  With one
+      process, the handler rotates the file; with several, rotating in one would lose the others'
+      records, so the file is reopened when moved instead (rotate it externally, e.g., logrotate).
+    """
+    global record_file_handler
+    if record_file_handler is None:
+        if opasConfig.server_worker_processes() > 1:
+            record_file_handler = logging.handlers.WatchedFileHandler(opasConfig.SLOW_QUERY_LOG_FILE, encoding="utf-8")
+        else:
+            record_file_handler = logging.handlers.RotatingFileHandler(opasConfig.SLOW_QUERY_LOG_FILE,
+                                                                       maxBytes=opasConfig.SLOW_QUERY_LOG_MAX_BYTES,
+                                                                       backupCount=opasConfig.SLOW_QUERY_LOG_BACKUPS,
+                                                                       encoding="utf-8")
+        record_file_handler.setFormatter(logging.Formatter("%(message)s"))
+        record_logger.addHandler(record_file_handler)
+
+    return record_file_handler
+
+#-----------------------------------------------------------------------------
+def note_query(core, solr_params, results=None, error=None):
+    """
+    Note a Solr query of the current request (if any), for the slow query log
+    """
+    timer = opasRequestTiming.current_timer.get()
+    if timer is not None and opasConfig.SLOW_QUERY_LOG_ENABLED:
+        query = {"core": core,
+                 "params": {key: value for key, value in solr_params.items() if value is not None},
+                }
+        if results is not None:
+            query["qtime_ms"] = getattr(results, "header", {}).get("QTime")
+            query["num_found"] = getattr(results, "_numFound", None)
+            query["response_bytes"] = getattr(results, "_response_bytes", None)
+        if error is not None:
+            query["error"] = str(error)
+        timer.solr_queries.append(query)
+
+#-----------------------------------------------------------------------------
+def request_finished(timer, total, method, route, path, status):
+    """
+    Write the noted queries of a finished request, if it was slow (or sampled)
+    """
+    if not opasConfig.SLOW_QUERY_LOG_ENABLED or timer.solr_queries == []:
+        return
+
+    handler_ms = round(total * 1000, 1)
+    if handler_ms >= opasConfig.SLOW_QUERY_THRESHOLD_MS:
+        reason = "slow"
+    elif random.random() < opasConfig.SLOW_QUERY_SAMPLE_RATE:
+        reason = "sampled"
+    else:
+        return
+
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(timer.start))
+    try:
+        record_handler()
+        for query in timer.solr_queries:
+            record = {"time": timestamp,
+                      "reason": reason,
+                      "method": method,
+                      "route": route,
+                      "path": path,
+                      "status": status,
+                      "handler_ms": handler_ms,
+                      "solr_ms": round(timer.durations.get("solr", 0) * 1000, 1),
+                      **query
+                     }
+            record_logger.info(json.dumps(record, default=str))
+    except Exception as e:
+        logger.warning(f"Slow query record could not be written ({e})")
+
+#-----------------------------------------------------------------------------
+def query_features(params):
+    """
+    Return the (sorted) list of the costly features of a query, per its Solr parameters
+    """
+    ret_val = set()
+    if str(params.get("hl", "")).lower() in ("true", "on"):
+        ret_val.add("highlighting")
+    for key in ("q", "fq"):
+        value = params.get(key)
+        if value is not None and ("*" in str(value).replace("*:*", "") or "?" in str(value)):
+            ret_val.add("wildcard")
+    if any(key.startswith("facet_") or key.startswith("facet.") for key in params) or params.get("facet") in ("true", "on"):
+        ret_val.add("facets")
+    try:
+        if int(params.get("rows", 0)) > opasConfig.SLOW_QUERY_LARGE_PAGE:
+            ret_val.add("large_page")
+        if int(params.get("start", 0)) > opasConfig.SLOW_QUERY_DEEP_OFFSET:
+            ret_val.add("deep_paging")
+    except (TypeError, ValueError):
+        pass
+
+    return sorted(ret_val)
+
+def read_records(filename=None):
+    """
+    Yield the records in the log file and its backups (oldest first)
+    """
+    if filename is None:
+        filename = opasConfig.SLOW_QUERY_LOG_FILE
+    filenames = [f"{filename}.{n}" for n in range(opasConfig.SLOW_QUERY_LOG_BACKUPS, 0, -1)] + [filename]
+    for name in filenames:
+        if os.path.exists(name):
+            with open(name, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        pass # e.g., a line cut off by a crash
+
+def summarize(groups):
+    return {key: {"count": len(times),
+                  "mean_ms": round(sum(times) / len(times), 1),
+                  "max_ms": max(times)}
+            for key, times in sorted(groups.items())}
+
+def slow_query_report(limit=20, filename=None):
+    """
+    Return a dict summarizing the slow query log: the records per route and per query feature
+      (count, mean and max handler time), and the slowest (limit) records
+    """
+    by_route = {}
+    by_feature = {}
+    slowest = []
+    count = 0
+    first = last = None
+    for record in read_records(filename):
+        count += 1
+        first = first or record.get("time")
+        last = record.get("time")
+        handler_ms = record.get("handler_ms", 0)
+        by_route.setdefault(record.get("route"), []).append(handler_ms)
+        for feature in query_features(record.get("params", {})) or ["plain"]:
+            by_feature.setdefault(feature, []).append(handler_ms)
+        slowest.append(record)
+        if len(slowest) > limit * 10:
+            slowest = sorted(slowest, key=lambda rec: -rec.get("handler_ms", 0))[:limit]
+
+    ret_val = {"records": count,
+               "from": first,
+               "to": last,
+               "threshold_ms": opasConfig.SLOW_QUERY_THRESHOLD_MS,
+               "by_route": summarize(by_route),
+               "by_feature": summarize(by_feature),
+               "slowest": sorted(slowest, key=lambda rec: -rec.get("handler_ms", 0))[:limit]
+              }
+
+    return ret_val
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasSlowQueryLog Tests complete.")
+    sys.exit()
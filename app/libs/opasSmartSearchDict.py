@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasSmartSearchDict
+
+In memory dictionaries for smart search (smartsearch.smart_search), so classifying the user's input
+  (is it a document ID, an author, a title...) doesn't take Solr requests while the query is parsed.
+
+The dictionaries are built from one walk of the docs core (by cursorMark), in the background at startup,
+  and rebuilt when the corpus generation changes (i.e., after the loader commits); meanwhile, the previous
+  dictionaries are used, or Solr if there aren't any yet.
+
+  - art_ids: the document IDs
+  - authors: the author names (the docs core authors field, matched exactly)
+  - author_names: the author names, for phrase matching (as in the authors core authors field)
+  - author_citations: the author citations (art_authors_citation), for phrase matching
+  - titles: the document titles, for phrase matching
+
+Matching of text fields is on lower case word tokens, as Solr's text_simple fields do.  The docs core text
+  (which isn't stored) is checked against the docs text term index (opasTermIndex) instead.
+
+    >>> index = PhraseIndex(["Object Relations Theories and the Developmental Tilt", "The Analyst's Dream"])
+    >>> index.contains("object relations theories")
+    True
+    >>> index.contains("object theories")
+    False
+    >>> index.contains("object theories", slop=10)
+    True
+    >>> index.contains("dream analyst", all_terms=True)
+    True
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.1"
+__status__      = "Development"
+
+import re
+import sys
+import time
+import threading
+from array import array
+
+import opasConfig
+import opasCorpusCache
+import opasTermIndex
+from configLib.opasCoreConfig import solr_connection, SOLR_DOCS
+import logging
+logger = logging.getLogger(__name__)
+
+rx_token = re.compile(r"\w+")
+# phrase slop, per is_value_in_field match type
+SLOP = {"exact": 0, "ordered": 10, "proximate": 25}
+
+#-----------------------------------------------------------------------------
+def tokenize(text):
+    """
+    Return the list of lower case word tokens in text
+
+    >>> tokenize("Tuckett, D. & Fonagy")
+    ['tuckett', 'd', 'fonagy']
+    """
+    return rx_token.findall(text.lower())
+
+#-----------------------------------------------------------------------------
+def tokens_match(value_tokens, tokens, slop=0):
+    """
+    Return True if the tokens occur in value_tokens, in order, with at most slop tokens between them (in all)
+
+    >>> tokens_match(["the", "analyst", "s", "dream"], ["analyst", "dream"], slop=1)
+    True
+    >>> tokens_match(["the", "analyst", "s", "dream"], ["analyst", "dream"])
+    False
+    """
+    for start, token in enumerate(value_tokens):
+        if token != tokens[0]:
+            continue
+        gaps = 0
+        pos = start
+        for token in tokens[1:]:
+            try:
+                next_pos = value_tokens.index(token, pos + 1, pos + 2 + slop - gaps)
+            except ValueError:
+                break
+            gaps += next_pos - pos - 1
+            pos = next_pos
+        else:
+            return True
+
+    return False
+
+#-----------------------------------------------------------------------------
+class PhraseIndex(object):
+    """
+    A list of (tokenized) values, with an inverted index from token to value positions, for phrase matching
+    """
+    def __init__(self, values):
+        self.values = []
+        self.postings = {}
+        for value in values:
+            tokens = tokenize(value)
+            if tokens == []:
+                continue
+            position = len(self.values)
+            self.values.append(" ".join(tokens))
+            for token in set(tokens):
+                try:
+                    self.postings[token].append(position)
+                except KeyError:
+                    self.postings[token] = array("L", [position])
+
+    def __len__(self):
+        return len(self.values)
+
+    def contains(self, text, slop=0, all_terms=False):
+        """
+        Return True if a value contains the words of text: as a phrase (with up to slop words between them),
+          or, with all_terms, in any order.
+        """
+        tokens = tokenize(text)
+        if tokens == []:
+            return False
+
+        postings = [self.postings.get(token) for token in set(tokens)]
+        if None in postings:
+            return False
+
+        for position in min(postings, key=len):
+            value_tokens = self.values[position].split(" ")
+            if all_terms:
+                if set(tokens).issubset(value_tokens):
+                    return True
+            elif tokens_match(value_tokens, tokens, slop):
+                return True
+
+        return False
+
+    def memory_bytes(self):
+        """
+        Return the approximate memory used by the index, in bytes
+        """
+        return sum(sys.getsizeof(value) for value in self.values) \
+               + sum(sys.getsizeof(positions) for positions in self.postings.values())
+
+#-----------------------------------------------------------------------------
+class SmartSearchDictionaries(object):
+    """
+    The dictionaries used by smart search, built from (docs core) documents with the fields in DOCUMENT_FIELDS
+    """
+    DOCUMENT_FIELDS = "art_id, title, authors, art_authors_citation"
+
+    def __init__(self, documents, generation=None):
+        art_ids = set()
+        authors = set()
+        titles = []
+        citations = []
+        for document in documents:
+            art_ids.add(document.get("art_id"))
+            authors.update(document.get("authors", []))
+            title = document.get("title")
+            if title is not None:
+                titles.append(title)
+            citation = document.get("art_authors_citation")
+            if citation is not None:
+                citations.append(citation)
+
+        art_ids.discard(None)
+        self.art_ids = frozenset(art_ids)
+        self.authors = frozenset(authors)
+        self.author_names = PhraseIndex(sorted(authors))
+        self.author_citations = PhraseIndex(citations)
+        self.titles = PhraseIndex(titles)
+        self.generation = generation
+        self.built = time.time()
+
+    def memory_bytes(self):
+        return sum(sys.getsizeof(value) for value in self.art_ids) \
+               + sum(sys.getsizeof(value) for value in self.authors) \
+               + self.author_names.memory_bytes() \
+               + self.author_citations.memory_bytes() \
+               + self.titles.memory_bytes()
+
+    def stats(self):
+        return {"name": "smart search",
+                "documents": len(self.art_ids),
+                "authors": len(self.authors),
+                "bytes": self.memory_bytes(),
+                "built": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.built))
+               }
+
+#-----------------------------------------------------------------------------
+smart_search_dictionaries = None
+smart_search_build = None # build thread, while running
+smart_search_failed = 0 # time of the last failed build
+smart_search_lock = threading.Lock()
+
+#-----------------------------------------------------------------------------
+def dump_documents(fields, page_size=None):
+    """
+    Yield all the documents (level 1) in the docs core, with the fields, a page at a time (by cursorMark)
+    """
+    if page_size is None:
+        page_size = opasConfig.SMART_SEARCH_DICT_PAGE_SIZE
+    conn = solr_connection(SOLR_DOCS)
+    cursor = "*"
+    try:
+        while True:
+            results = conn.query(q="art_level:1", fields=fields, score=False, sort="id asc", rows=page_size, cursorMark=cursor)
+            for document in results.results:
+                yield document
+            next_cursor = getattr(results, "nextCursorMark", cursor)
+            if next_cursor == cursor or len(results.results) < page_size:
+                break
+            cursor = next_cursor
+    finally:
+        conn.close()
+
+#-----------------------------------------------------------------------------
+def build_smart_search_dictionaries():
+    """
+    Build the smart search dictionaries, and make them the ones in use
+    """
+    global smart_search_dictionaries, smart_search_build, smart_search_failed
+    generation = opasCorpusCache.get_corpus_generation()
+    start = time.time()
+    try:
+        dictionaries = SmartSearchDictionaries(dump_documents(SmartSearchDictionaries.DOCUMENT_FIELDS), generation=generation)
+    except Exception as e:
+        logger.error(f"Smart search dictionaries could not be built ({e})")
+        with smart_search_lock:
+            smart_search_failed = time.time()
+    else:
+        with smart_search_lock:
+            smart_search_dictionaries = dictionaries
+            smart_search_failed = 0
+        logger.info(f"Smart search dictionaries built in {time.time() - start:.1f} seconds: {len(dictionaries.art_ids)} documents, {dictionaries.memory_bytes()} bytes")
+    finally:
+        with smart_search_lock:
+            smart_search_build = None
+
+#-----------------------------------------------------------------------------
+def start_smart_search_build():
+    """
+    Build the smart search dictionaries in a background thread, unless a build is already running
+    """
+    global smart_search_build
+    if not opasConfig.SMART_SEARCH_DICT_ENABLED:
+        return
+
+    with smart_search_lock:
+        if smart_search_build is not None:
+            return
+        if time.time() - smart_search_failed < opasConfig.TERM_INDEX_RETRY_INTERVAL:
+            return
+        smart_search_build = threading.Thread(target=build_smart_search_dictionaries, name="smartsearchdict", daemon=True)
+        thread = smart_search_build
+
+    thread.start()
+
+#-----------------------------------------------------------------------------
+def get_smart_search_dictionaries():
+    """
+    Return the smart search dictionaries, or None if they're not built (yet).
+
+    If the corpus has changed since they were built, a rebuild is started, and the current ones returned.
+    """
+    ret_val = None
+    if opasConfig.SMART_SEARCH_DICT_ENABLED:
+        ret_val = smart_search_dictionaries
+        if ret_val is None or ret_val.generation != opasCorpusCache.get_corpus_generation():
+            start_smart_search_build()
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def index_has_term(index, term):
+    """
+    Return True if the term is in the (opasTermIndex) prefix index
+
+    >>> index = opasTermIndex.TermPrefixIndex([("mother", 30), ("moth", 2)])
+    >>> index_has_term(index, "moth"), index_has_term(index, "mot")
+    (True, False)
+    """
+    start, end = index.prefix_range(term)
+    return start < end and index.term(start) == term
+
+#-----------------------------------------------------------------------------
+def value_in_field(value, field, core="docs", match_type="exact"):
+    """
+    Return True or False if the value is (or isn't) in the field, as smartsearch.is_value_in_field would
+      find with a Solr query, or None if the dictionaries can't tell (not built yet, or not kept for the field).
+
+    The match types are approximated: the proximate match on the text is just that all the words are in
+      the text index, and a bool match is that all the words are in one value.
+    """
+    ret_val = None
+    if field == "text" and core != "authors":
+        index = opasTermIndex.get_term_prefix_index("docs", "text")
+        if index is not None:
+            tokens = tokenize(value)
+            ret_val = tokens != [] and all(index_has_term(index, token) for token in tokens)
+        return ret_val
+
+    dictionaries = get_smart_search_dictionaries()
+    if dictionaries is None:
+        return ret_val
+
+    if match_type in SLOP:
+        slop = SLOP[match_type]
+        all_terms = False
+    else:
+        slop = 0
+        all_terms = True
+
+    if core == "authors":
+        if field == "authors":
+            ret_val = dictionaries.author_names.contains(value, slop=slop, all_terms=all_terms)
+    elif field == "art_id":
+        ret_val = value in dictionaries.art_ids
+    elif field == "authors":
+        if all_terms:
+            ret_val = dictionaries.author_names.contains(value, all_terms=True)
+        else:
+            ret_val = value in dictionaries.authors
+    elif field == "title":
+        ret_val = dictionaries.titles.contains(value, slop=slop, all_terms=all_terms)
+    elif field == "art_authors_citation":
+        ret_val = dictionaries.author_citations.contains(value, slop=slop, all_terms=all_terms)
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def smart_search_dict_stats():
+    """
+    Return a list with a dict of the size of the dictionaries (if built)
+    """
+    dictionaries = smart_search_dictionaries
+    if dictionaries is None:
+        ret_val = []
+    else:
+        ret_val = [dictionaries.stats()]
+
+    return ret_val
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasSmartSearchDict Tests complete.")
+    sys.exit()
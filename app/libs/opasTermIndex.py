@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+opasTermIndex
+
+In memory prefix (term) indexes for the word wheel (get_term_index) and the author index
+  (authors_get_author_info), so typeahead doesn't go to the Solr /terms handler for every keystroke.
+
+Each index is built from a dump of the field's terms (and document counts) from the /terms handler,
+  for the fields configured in opasConfig.TERM_INDEX_FIELDS.  The terms are kept as one UTF-8 byte
+  string with an array of offsets, sorted (in UTF-8 byte order, the same as Solr's index order), so
+  prefix lookup is a binary search, and an index takes little more memory than the terms themselves.
+
+The indexes are built in the background at startup, and rebuilt when the corpus generation changes
+  (e.g., after a load); meanwhile the previous index is used, or Solr if there isn't one yet.
+
+    >>> index = TermPrefixIndex([("mother", 30), ("moth", 2), ("motive", 12), ("dream", 50)])
+    >>> index.prefix_matches("mot")
+    [('moth', 2), ('mother', 30), ('motive', 12)]
+    >>> index.prefix_matches("mot", limit=2, order="count")
+    [('mother', 30), ('motive', 12)]
+    >>> index.regex_matches("mo.h.*")
+    [('moth', 2), ('mother', 30)]
+
+"""
+#Revision Notes:
+    #2026.1019.1 - Initial version
+
+__author__      = "Neil R. Shapiro"
+__copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
+__license__     = "Apache 2.0"
+__version__     = "2026.1019.1"
+__status__      = "Development"
+
+import re
+import sys
+import time
+import threading
+from array import array
+
+import opasConfig
+import opasCorpusCache
+from configLib.opasCoreConfig import thread_solr_term_search, SOLR_DOCS, SOLR_AUTHORS
+import logging
+logger = logging.getLogger(__name__)
+
+# term index core names used by the API, to Solr core names
+CORE_NAMES = {"docs": SOLR_DOCS, "authors": SOLR_AUTHORS}
+
+# regex characters which end the literal prefix of a pattern
+REGEX_SPECIAL_CHARS = ".^$*+?{}[]\\|()"
+
+#-----------------------------------------------------------------------------
+def regex_literal_prefix(pattern):
+    """
+    Return the literal prefix every term matching the (whole term) regex pattern must start with
+
+    >>> regex_literal_prefix("tuck.*")
+    'tuck'
+    >>> regex_literal_prefix("jea?lous.*")
+    'je'
+    >>> regex_literal_prefix("freud|jung")
+    ''
+    """
+    ret_val = []
+    if "|" not in pattern:
+        for ch in pattern:
+            if ch in REGEX_SPECIAL_CHARS:
+                if ch in "*?{" and ret_val:
+                    # the preceding char is optional
+                    ret_val.pop()
+                break
+            ret_val.append(ch)
+
+    return "".join(ret_val)
+
+#-----------------------------------------------------------------------------
+class TermPrefixIndex(object):
+    """
+    A sorted, compact array of terms and their document counts.
+    """
+    def __init__(self, term_counts, core=None, field=None, generation=None):
+        terms = sorted((term.encode("utf-8"), count) for term, count in term_counts)
+        self.core = core
+        self.field = field
+        self.generation = generation
+        self.built = time.time()
+        self.blob = b"".join(term for term, count in terms)
+        self.offsets = array("L", [0])
+        offset = 0
+        for term, count in terms:
+            offset += len(term)
+            self.offsets.append(offset)
+        self.counts = array("L", (count for term, count in terms))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def term_bytes(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]]
+
+    def term(self, i):
+        return self.term_bytes(i).decode("utf-8")
+
+    def lower_bound(self, key):
+        """
+        Return the position of the first term >= key (bytes)
+        """
+        lo = 0
+        hi = len(self.counts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term_bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def prefix_range(self, prefix):
+        """
+        Return the (start, end) positions of the terms starting with prefix
+        """
+        key = prefix.encode("utf-8")
+        # 0xFF never occurs in UTF-8, so sorts after any term with the prefix
+        return self.lower_bound(key), self.lower_bound(key + b"\xff")
+
+    def select(self, positions, limit, offset, order):
+        """
+        Return a list of (term, count) for the positions (in index order), in order (index or count)
+        """
+        if order == "count":
+            positions = sorted(positions, key=lambda i: -self.counts[i])
+        else:
+            positions = list(positions)
+
+        if limit is None or limit < 0:
+            positions = positions[offset:]
+        else:
+            positions = positions[offset:offset + limit]
+
+        return [(self.term(i), self.counts[i]) for i in positions]
+
+    def prefix_matches(self, prefix, limit=None, offset=0, order="index"):
+        """
+        Return a list of (term, count) for terms starting with prefix, like the Solr /terms terms.prefix
+        """
+        start, end = self.prefix_range(prefix)
+        if order != "count" and limit is not None and limit >= 0:
+            end = min(end, start + offset + limit)
+
+        return self.select(range(start, end), limit, offset, order)
+
+    def regex_matches(self, pattern, limit=None, offset=0, order="index"):
+        """
+        Return a list of (term, count) for terms matching the regex pattern (the whole term, like the
+          Solr /terms terms.regex).  Only the terms with the pattern's literal prefix are checked.
+        """
+        matcher = re.compile(pattern)
+        start, end = self.prefix_range(regex_literal_prefix(pattern))
+        positions = []
+        wanted = None
+        if order != "count" and limit is not None and limit >= 0:
+            wanted = offset + limit
+
+        for i in range(start, end):
+            if matcher.fullmatch(self.term(i)):
+                positions.append(i)
+                if wanted is not None and len(positions) >= wanted:
+                    break
+
+        return self.select(positions, limit, offset, order)
+
+    def memory_bytes(self):
+        """
+        Return the approximate memory used by the index, in bytes
+        """
+        return sys.getsizeof(self.blob) \
+               + self.offsets.itemsize * len(self.offsets) \
+               + self.counts.itemsize * len(self.counts)
+
+    def stats(self):
+        return {"core": self.core,
+                "field": self.field,
+                "terms": len(self.counts),
+                "bytes": self.memory_bytes(),
+                "built": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.built))
+               }
+
+#-----------------------------------------------------------------------------
+term_indexes = {}       # (core, field): TermPrefixIndex
+term_index_builds = {}  # (core, field): build thread
+term_index_failures = {} # (core, field): time of the last failed build
+term_index_lock = threading.Lock()
+
+#-----------------------------------------------------------------------------
+def dump_terms(core, field, page_size=None):
+    """
+    Yield (term, count) for all the terms in the field, from the Solr /terms handler, a page at a time
+    """
+    if page_size is None:
+        page_size = opasConfig.TERM_INDEX_DUMP_PAGE_SIZE
+    term_search = thread_solr_term_search(CORE_NAMES[core])
+    lower = None
+    while True:
+        params = {"terms_fl": field,
+                  "terms_limit": page_size,
+                  "terms_sort": "index",
+                  "terms_mincount": 1
+                 }
+        if lower is not None:
+            params["terms_lower"] = lower
+            params["terms_lower_incl"] = "false"
+        results = term_search(**params)
+        terms = results.terms.get(field, {})
+        for term, count in terms.items():
+            yield term, count
+            lower = term
+        if len(terms) < page_size:
+            break
+
+#-----------------------------------------------------------------------------
+def build_term_index(core, field):
+    """
+    Build the prefix index for the field, and make it the one in use
+    """
+    key = (core, field)
+    generation = opasCorpusCache.get_corpus_generation()
+    start = time.time()
+    try:
+        index = TermPrefixIndex(dump_terms(core, field), core=core, field=field, generation=generation)
+    except Exception as e:
+        logger.error(f"Term index for {core} {field} could not be built ({e})")
+        with term_index_lock:
+            term_index_failures[key] = time.time()
+    else:
+        with term_index_lock:
+            term_indexes[key] = index
+            term_index_failures.pop(key, None)
+        logger.info(f"Term index for {core} {field} built in {time.time() - start:.1f} seconds: {len(index)} terms, {index.memory_bytes()} bytes")
+    finally:
+        with term_index_lock:
+            term_index_builds.pop(key, None)
+
+#-----------------------------------------------------------------------------
+def start_term_index_build(core, field):
+    """
+    Build the prefix index for the field in a background thread, unless a build is already running
+    """
+    key = (core, field)
+    with term_index_lock:
+        if key in term_index_builds:
+            return
+        if time.time() - term_index_failures.get(key, 0) < opasConfig.TERM_INDEX_RETRY_INTERVAL:
+            return
+        thread = threading.Thread(target=build_term_index, args=(core, field), name=f"termindex-{core}-{field}", daemon=True)
+        term_index_builds[key] = thread
+
+    thread.start()
+
+#-----------------------------------------------------------------------------
+def start_term_index_builds():
+    """
+    Build all the configured prefix indexes, in the background (e.g., at startup)
+    """
+    if opasConfig.TERM_INDEX_ENABLED:
+        for core, fields in opasConfig.TERM_INDEX_FIELDS.items():
+            for field in fields:
+                start_term_index_build(core, field)
+
+#-----------------------------------------------------------------------------
+def get_term_prefix_index(core, field):
+    """
+    Return the prefix index for the field, or None if there's no index for the field (yet).
+
+    If the corpus has changed since the index was built, a rebuild is started, and the current index returned.
+    """
+    ret_val = None
+    if opasConfig.TERM_INDEX_ENABLED and field in opasConfig.TERM_INDEX_FIELDS.get(core, ()):
+        ret_val = term_indexes.get((core, field))
+        if ret_val is None or ret_val.generation != opasCorpusCache.get_corpus_generation():
+            start_term_index_build(core, field)
+
+    return ret_val
+
+#-----------------------------------------------------------------------------
+def term_index_stats():
+    """
+    Return a list of dicts with the size (terms and bytes) of each prefix index
+    """
+    with term_index_lock:
+        indexes = list(term_indexes.values())
+
+    return [index.stats() for index in indexes]
+
+# -------------------------------------------------------------------------------------------------------
+# run it!
+
+if __name__ == "__main__":
+    print ("Running in Python %s" % sys.version_info[0])
+
+    import doctest
+    doctest.testmod()
+    print ("Fini. opasTermIndex Tests complete.")
+    sys.exit()
@@ -54,11 +54,27 @@ Various support functions having to do with XML conversion (e.g., to HTML, ePub,
 
     #2020.0812.1 - Cleaned up some error print messages.
 
+    #2026.1019.1 - XSLT_Transformer keeps the parsed stylesheets, and compiles the XSLT per thread
+                # (lazily, on first use in the thread) since lxml XSLT objects are not safe to share
+                # across threads.  Use g_transformer.get_transformer(name) to get the thread's transformer.
+
+                # Added hitmarkers_to_html, xml_string_to_kwic and hitmarkers_to_numbered_anchors: faster replacement
+                # of the search hit markers (and, for full-text, the running head placeholder in the same
+                # precompiled pass), with the anchor count local to the call rather than a module global.
+
+                # XSLT_Transformer.set_transformer only finds the stylesheet file; it's parsed on first use, so
+                # importing the module doesn't read and parse the stylesheets.  ebooklib is imported by
+                # html_to_epub, when needed (as xhtml2pdf is by html_to_pdf).
+
+                # html_to_pdf returns None (rather than the file name) when the conversion reports errors.
+
+    #2026.1019.2 - xmlstr_to_etree removes any XML declaration from a str (lxml won't parse a str with one), not
+                # only encoding='UTF-8', and returns None (rather than failing) when the XML can't be parsed.
 
 __author__      = "Neil R. Shapiro"
 __copyright__   = "Copyright 2020, Psychoanalytic Electronic Publishing"
 __license__     = "Apache 2.0"
-__version__     = "2020.0812.1"
+__version__     = "2026.1019.2"
 __status__      = "Development"
 
 
@@ -73,6 +89,7 @@ import stdMessageLib
 import logging
 logger = logging.getLogger(__name__)
 import copy
+import threading
 import urllib
 import urllib.request
 os.environ['XML_CATALOG_FILES'] = urllib.request.pathname2url(r"X:\_PEPA1\catalog.xml")
@@ -82,9 +99,9 @@ from lxml import etree
 import lxml.html as lhtml
 
 import opasConfig
+import opasRequestTiming
 from localsecrets import APIURL, IMAGE_API_LINK
 
-from ebooklib import epub
 from io import StringIO, BytesIO
 
 show_dbg_messages = False
@@ -250,56 +267,110 @@ class FirstPageCollector:
 
 # -------------------------------------------------------------------------------------------------------
 class XSLT_Transformer(object):
-    # to allow transformers to be saved at class level in dict
-    transformers = {}
+    """
+    Keeps the XSLT stylesheets by name (parsed once, on first use), and compiles an etree.XSLT
+      transformer from them per thread, on first use in that thread.
+      
+    lxml XSLT objects should not be shared across threads, so the compiled transformers
+      are kept in thread local storage.
+      
+    >>> transformer = g_transformer.get_transformer(opasConfig.TRANSFORMER_XMLTOHTML)
+    >>> transformer is g_transformer.get_transformer(opasConfig.TRANSFORMER_XMLTOHTML)
+    True
+    """
+    # to allow parsed stylesheets to be saved at class level in dict
+    stylesheets = {}
+    # compiled transformers, per thread
+    thread_local = threading.local()
+    compile_lock = threading.Lock()
 
     def __init__(self):
         pass
     
     def set_transformer(self, transformer_name, xslt_file, style_path=opasConfig.STYLE_PATH):
         self.transformer_name = transformer_name
-        self.transformer_tree = None
         self.file_spec = None
         style_paths = style_path.split(";")
         # find path of file
         for relative_path in style_paths:
             self.file_spec = os.path.join(relative_path, xslt_file)
             if os.path.exists(self.file_spec):
+                # save it to class dict by name; parsed on first use, and compiled per thread on first use
+                self.__class__.stylesheets[transformer_name] = (os.path.abspath(self.file_spec), None)
+                break;
+        if not os.path.exists(self.file_spec):
+            err = f"XSLT file {self.file_spec} missing for all folders in STYLE path."
+            if stop_on_exceptions:
+                raise FileNotFoundError(err)
+            else:
+                logger.error(err)
+
+    def parsed_stylesheet(self, transformer_name):
+        """
+        Return (file spec, parsed stylesheet) for the name, parsing the stylesheet on first use.
+          Returns None if there's no stylesheet set for the name.
+
+        Call with compile_lock held.
+        """
+        ret_val = self.__class__.stylesheets.get(transformer_name, None)
+        if ret_val is not None and ret_val[1] is None:
+            file_spec = ret_val[0]
+            try:
+                ret_val = self.__class__.stylesheets[transformer_name] = (file_spec, etree.parse(file_spec))
+            except Exception as e:
+                err =  f"Parse error for XSLT file {file_spec}.  Error {e}"
+                if stop_on_exceptions:
+                    raise Exception(err)
+                else:
+                    logger.error(err)
+                    ret_val = None
+
+        return ret_val
+
+    def get_transformer(self, transformer_name):
+        """
+        Return the compiled XSLT transformer for this thread, compiling it from the parsed
+          stylesheet if this is the first use in the thread.  Returns None if there's no
+          stylesheet set for the name.
+        """
+        ret_val = None
+        transformers = getattr(self.__class__.thread_local, "transformers", None)
+        if transformers is None:
+            transformers = self.__class__.thread_local.transformers = {}
+
+        ret_val = transformers.get(transformer_name, None)
+        if ret_val is None and transformer_name in self.__class__.stylesheets:
+            # the shared parsed tree is only read, but parse and compile one at a time to be safe
+            with self.__class__.compile_lock:
+                stylesheet = self.parsed_stylesheet(transformer_name)
+            if stylesheet is not None:
+                file_spec, transformer_tree = stylesheet
                 try:
-                    self.transformer_tree=etree.parse(self.file_spec)
+                    with self.__class__.compile_lock:
+                        ret_val = etree.XSLT(transformer_tree)
                 except Exception as e:
-                    err =  f"Parse error for XSLT file {self.file_spec}.  Error {e}"
+                    err = f"Transform definition error for XSLT file {file_spec}.  Error {e}"
                     if stop_on_exceptions:
                         raise Exception(err)
                     else:
                         logger.error(err)
                 else:
-                    try:
-                        # save it to class dict by name
-                        self.__class__.transformers[transformer_name] = etree.XSLT(self.transformer_tree)
-                    except Exception as e:
-                        err = f"Transform definition error for XSLT file {self.file_spec}.  Error {e}"
-                        if stop_on_exceptions:
-                            raise Exception(err)
-                        else:
-                            logger.error(err)
-                    else:
-                        break;
-        if not os.path.exists(self.file_spec):
-            err = f"XSLT file {self.file_spec} missing for all folders in STYLE path."
-            if stop_on_exceptions:
-                raise FileNotFoundError(err)
-            else:
-                logger.error(err)
+                    transformers[transformer_name] = ret_val
+
+        return ret_val
         
 
 # -------------------------------------------------------------------------------------------------------
-# create module level persistent transformers
+# create module level persistent transformers (the stylesheets are parsed on first use)
 g_transformer = XSLT_Transformer()
 g_transformer.set_transformer(opasConfig.TRANSFORMER_XMLTOHTML, opasConfig.XSLT_XMLTOHTML)
 g_transformer.set_transformer(opasConfig.TRANSFORMER_XMLTOTEXT_EXCERPT, opasConfig.XSLT_XMLTOTEXT_EXCERPT)
 g_transformer.set_transformer(opasConfig.TRANSFORMER_XMLTOHTML_EXCERPT, opasConfig.XSLT_XMLTOHTML_EXCERPT)
 
+# search hit markers (as Solr was told to return them), and the running head placeholder from the XSLT
+HITMARKER_MATCHER = re.compile(f"{re.escape(opasConfig.HITMARKERSTART)}|{re.escape(opasConfig.HITMARKEREND)}")
+HITMARKER_OR_RUNNINGHEAD_MATCHER = re.compile(f"{re.escape(opasConfig.HITMARKERSTART)}|{re.escape(opasConfig.HITMARKEREND)}|\\[\\[RunningHead\\]\\]")
+XML_DECLARATION_MATCHER = re.compile(r"^\s*<\?xml\s[^>]*\?>")
 ENCODER_MATCHER = re.compile("\<\?xml\s+version=[\'\"]1.0[\'\"]\s+encoding=[\'\"](UTF-?8|ISO-?8859-?1?)[\'\"]\s*\?\>\n")  # TODO - Move to module globals to optimize
 
 # -------------------------------------------------------------------------------------------------------
@@ -458,8 +529,12 @@ def get_html_citeas(authors_bib_style, art_year, art_title, art_pep_sourcetitle_
 def xmlstr_to_etree(xmlstr):
     """
     Convenience function - take an xmlstr, in bytes or string or as etree, and return root of an etree
-    """
+      (None if it can't be parsed)
 
+    >>> xmlstr_to_etree('<?xml version="1.0" encoding="UTF-8"?>\\n<body><p>text</p></body>').getroot().tag
+    'body'
+    """
+    root = None
     if isinstance(xmlstr, bytes):
         try:
             root = etree.parse(BytesIO(xmlstr))
@@ -467,7 +542,8 @@ def xmlstr_to_etree(xmlstr):
             logger.error(f"Error parsing Bytes xmlstr: {e}")
     elif isinstance(xmlstr, str):
         try:
-            xmlstr = xmlstr.replace("encoding=\'UTF-8\'", "")
+            # lxml doesn't take an encoding declaration in a (unicode) str
+            xmlstr = XML_DECLARATION_MATCHER.sub("", xmlstr, count=1)
             root = etree.parse(StringIO(xmlstr))
         except Exception as e:
             logger.error(f"Error parsing xmlstr: {e}")
@@ -723,6 +799,17 @@ def xml_get_pages(xmlstr, offset=0, limit=1, inside="body", env="body", pagebrk=
 
     return ret_val
 
+def xml_get_pages_xmlstr(xmlstr, offset=0, limit=1, inside="body", env="body", pagebrk="pb", pagenbr="n", remove_tags=[]):
+    """
+    Same as xml_get_pages, but returns only the xml string of the extracted pages (the first entry of the tuple),
+      which, unlike the element list, can be returned from a conversion pool process (opasConversionExecutor).
+    
+    >>> xml_get_pages_xmlstr(test_xml2, 2, 1, inside="test", env="body") == xml_get_pages(test_xml2, 2, 1, inside="test", env="body")[0]
+    True
+    """
+    ret_val = xml_get_pages(xmlstr, offset=offset, limit=limit, inside=inside, env=env, pagebrk=pagebrk, pagenbr=pagenbr, remove_tags=remove_tags)
+    return ret_val[0]
+
 def xml_get_pages_html(xmlorhtmlstr, offset=0, limit=1, inside="div[@id='body']", env="body", pagebrk="div[@class='pagebreak']", pagenbr="p[@class='pagenumber']", remove_tags=[]):
     """
     First converts XML to HTML (if not passed in html) then returns the
@@ -1127,6 +1214,7 @@ def xml_iterate_tree(elemtree):
         pass
 
 #-----------------------------------------------------------------------------
+@opasRequestTiming.timed("xslt")
 def xml_elem_or_str_to_excerpt(elem_or_xmlstr, transformer_name=opasConfig.TRANSFORMER_XMLTOTEXT_EXCERPT):
     """
     Use xslt to extract a formatted excerpt
@@ -1157,7 +1245,7 @@ def xml_elem_or_str_to_excerpt(elem_or_xmlstr, transformer_name=opasConfig.TRANS
         try:
             #xslt_file = etree.parse(xslt_file)
             #xslt_transformer = etree.XSLT(xslt_file)
-            transformer = g_transformer.transformers.get(transformer_name, None)
+            transformer = g_transformer.get_transformer(transformer_name)
             # transform the doc or fragment
             transformed_data = transformer(source_data)
             
@@ -1453,6 +1541,7 @@ def xml_file_to_xmlstr(xml_file, remove_encoding=False, resolve_entities=True, d
     
     return ret_val
 
+@opasRequestTiming.timed("xslt")
 def xml_str_to_html(elem_or_xmlstr, transformer_name=opasConfig.TRANSFORMER_XMLTOHTML):
     """
     Convert XML to HTML per Doc level XSLT file configured as g_xslt_doc_transformer.
@@ -1499,14 +1588,15 @@ def xml_str_to_html(elem_or_xmlstr, transformer_name=opasConfig.TRANSFORMER_XMLT
                     try:
                         #xslt_doc_transformer_file = etree.parse(xslt_file)
                         #xslt_doc_transformer = etree.XSLT(xslt_doc_transformer_file)
-                        transformer = g_transformer.transformers[transformer_name]
+                        transformer = g_transformer.get_transformer(transformer_name)
+                        if transformer is None:
+                            raise KeyError(transformer_name)
                         # transform the doc or fragment
                         transformed_data = transformer(sourceFile)
                     except KeyError as e:
-                        if transformer is None:
-                            logger.error(f"Selected Transformer: {transformer_name} not found ({e})")
-                            if stop_on_exceptions:
-                                raise Exception(ret_val)
+                        logger.error(f"Selected Transformer: {transformer_name} not found ({e})")
+                        if stop_on_exceptions:
+                            raise Exception(ret_val)
                     except Exception as e:
                         # return this error, so it will be displayed (for now) instead of the document
                         ret_val = f"<p align='center'>Sorry, due to a transformation error, we cannot display this document right now.</p><p align='center'>Please report this to PEP.</p>  <p align='center'>XSLT Transform Error: {e}</p>"
@@ -1523,13 +1613,15 @@ def xml_str_to_html(elem_or_xmlstr, transformer_name=opasConfig.TRANSFORMER_XMLT
 
 def html_to_epub(htmlstr, output_filename_base, art_id, lang="en", html_title=None, stylesheet=opasConfig.CSS_STYLESHEET): #  e.g., "./libs/styles/pep-html-preview.css"
     """
-    uses ebooklib
+    uses ebooklib (imported here, only when needed)
     
     >>> htmlstr = xml_str_to_html(test_xml3)
     >>> document_id = "epubconversiontest"
     >>> filename = html_to_epub(htmlstr, output_filename_base=document_id, art_id=document_id)
     
     """
+    from ebooklib import epub # for HTML 2 EPUB conversion
+    
     if html_title is None:
         html_title = art_id
         
@@ -1598,6 +1690,91 @@ def html_to_epub(htmlstr, output_filename_base, art_id, lang="en", html_title=No
     epub.write_epub(filename, book)
     return filename
 
+def html_to_pdf(htmlstr, output_filename):
+    """
+    uses xhtml2pdf (imported here, only when needed)
+
+    Returns the output filename, or None if the conversion reported errors
+    
+    >>> htmlstr = xml_str_to_html(test_xml3)
+    >>> filename = html_to_pdf(htmlstr, output_filename="pdfconversiontest.PDF")
+    """
+    from xhtml2pdf import pisa # for HTML 2 PDF conversion
+
+    ret_val = output_filename
+    # open output file for writing (truncated binary)
+    with open(output_filename, "w+b") as result_file:
+        # convert HTML to PDF
+        pisa_status = pisa.CreatePDF(src=htmlstr,           # the HTML to convert
+                                     dest=result_file)      # file handle to receive result
+
+    if pisa_status.err:
+        logger.error(f"PDF conversion errors for {output_filename}: {pisa_status.err}")
+        ret_val = None
+
+    return ret_val
+
+def hitmarkers_to_html(text):
+    """
+    Replace the search hit markers with the HTML output markers (e.g., for KWIC).
+      (The markers are literals, so str.replace is much faster here than re.sub)
+
+    >>> hitmarkers_to_html(f"the {opasConfig.HITMARKERSTART}dream{opasConfig.HITMARKEREND} of")
+    "the <span class='searchhit'>dream</span> of"
+    """
+    return text.replace(opasConfig.HITMARKERSTART, opasConfig.HITMARKERSTART_OUTPUTHTML).replace(opasConfig.HITMARKEREND, opasConfig.HITMARKEREND_OUTPUTHTML)
+
+def hitmarkers_to_numbered_anchors(text, running_head=None):
+    """
+    Replace the search hit markers in a full-text return with numbered anchors (hitN) with links to
+      jump to the previous and next hits, and, if running_head is supplied, the first [[RunningHead]]
+      placeholder, in one pass.
+      
+    Thread safe: the anchor count is local to the call (one count per document).
+
+    >>> print (hitmarkers_to_numbered_anchors(f"[[RunningHead]] a {opasConfig.HITMARKERSTART}b{opasConfig.HITMARKEREND} [[RunningHead]]", running_head="(2020)"))
+    (2020) a <a name='hit1'> b</span><a onclick='scrollToAnchor("hit2");event.preventDefault();'>🡆</a> [[RunningHead]]
+    """
+    count_anchors = 0
+    
+    def numbered_anchors(matchobj):
+        nonlocal count_anchors, running_head
+        marker = matchobj.group(0)
+        if marker == opasConfig.HITMARKERSTART:
+            count_anchors += 1
+            if count_anchors > 1:
+                jump_to_prev_hit = f"""<a onclick='scrollToAnchor("hit{count_anchors-1}");event.preventDefault();'>🡄</a>"""
+                return f"<a name='hit{count_anchors}'>{jump_to_prev_hit}{opasConfig.HITMARKERSTART_OUTPUTHTML}"
+            else:
+                return f"<a name='hit{count_anchors}'> "
+        elif marker == opasConfig.HITMARKEREND:
+            jump_to_next_hit = f"""<a onclick='scrollToAnchor("hit{count_anchors+1}");event.preventDefault();'>🡆</a>"""
+            return f"{opasConfig.HITMARKEREND_OUTPUTHTML}{jump_to_next_hit}"
+        elif running_head is not None:
+            # only the first running head placeholder
+            ret_val = running_head
+            running_head = None
+            return ret_val
+        else:
+            return marker
+
+    if running_head is None:
+        matcher = HITMARKER_MATCHER
+    else:
+        matcher = HITMARKER_OR_RUNNINGHEAD_MATCHER
+        
+    return matcher.sub(numbered_anchors, text)
+
+def xml_string_to_kwic(xmlstr):
+    """
+    Return the text of a highlighted (hit marked) fragment with the tags stripped, and the
+      hit markers changed to the output (HTML) markers
+      
+    >>> xml_string_to_kwic(f"<p>the <i>{opasConfig.HITMARKERSTART}dream{opasConfig.HITMARKEREND}</i> of</p>")
+    "the <span class='searchhit'>dream</span> of"
+    """
+    return hitmarkers_to_html(xml_string_to_text(xmlstr))
+
 def remove_encoding_string(xmlstr):
     # Get rid of the encoding for lxml
     ret_val = ENCODER_MATCHER.sub("", xmlstr)                
@@ -3,6 +3,8 @@ import sys
 from datetime import datetime
 from optparse import OptionParser
 from configLib.opasCoreConfig import solr_docs, solr_authors, solr_gloss, solr_docs_term_search, solr_authors_term_search
+import opasSmartSearchDict
+import opasTermIndex
 import logging
 
 logger = logging.getLogger(__name__)
@@ -67,6 +69,8 @@ def is_value_in_field(value,
     """
     Returns True if the value is found in the field specified in the docs core.
     
+    The smart search dictionaries (opasSmartSearchDict) are checked first; Solr only if they can't tell.
+
     Args:
         value (str): String prefix of term to check.
         field (str): Where to look for term
@@ -93,6 +97,10 @@ def is_value_in_field(value,
         False
         
     """
+    ret_val = opasSmartSearchDict.value_in_field(value, field, core=core, match_type=match_type)
+    if ret_val is not None:
+        return ret_val
+
     ret_val = False
 
     cores  = {
@@ -137,6 +145,8 @@ def is_term_in_index(term_partial,
     """
     Returns True if the term_partial matches the index specified
     
+    The in memory term index (opasTermIndex) is used if there is one for the field.
+
     Args:
         term_partial (str): String prefix of term to check.
         term_field (str): Where to look for term
@@ -177,25 +187,35 @@ def is_term_in_index(term_partial,
         if "*" in term_partial or "?" in term_partial: # or "." in term_partial:
             # Wildcard expected, not RE
             term_partial = term_partial.lower().replace("*", ".*")
-            results = term_index( terms_fl=term_field,
-                                  terms_regex=term_partial,
-                                  terms_limit=limit,  
-                                  terms_sort=order  # index or count
-                                 )           
-
-            for n in results.terms[term_field].keys():
+            prefix_index = opasTermIndex.get_term_prefix_index(core, term_field)
+            if prefix_index is not None:
+                terms = [term for term, count in prefix_index.regex_matches(term_partial, limit=limit, order=order)]
+            else:
+                results = term_index( terms_fl=term_field,
+                                      terms_regex=term_partial,
+                                      terms_limit=limit,  
+                                      terms_sort=order  # index or count
+                                     )           
+                terms = results.terms[term_field].keys()
+
+            for n in terms:
                 m = re.match(term_partial, n)
                 if m is not None:
                     ret_val = True
                     break
         else:
-            results = term_index( terms_fl=term_field,
-                                  terms_prefix=term_partial.lower(),
-                                  terms_sort=order,  # index or count
-                                  terms_limit=limit
-                                 )
+            prefix_index = opasTermIndex.get_term_prefix_index(core, term_field)
+            if prefix_index is not None:
+                terms = [term for term, count in prefix_index.prefix_matches(term_partial.lower(), limit=limit, order=order)]
+            else:
+                results = term_index( terms_fl=term_field,
+                                      terms_prefix=term_partial.lower(),
+                                      terms_sort=order,  # index or count
+                                      terms_limit=limit
+                                     )
+                terms = results.terms[term_field].keys()
         
-            for n in results.terms[term_field].keys():
+            for n in terms:
                 n_partial = re.split("[\s,]+", n)
                 term_adj = term_partial.lower()
                 if term_adj == n or term_adj == n_partial[0]:
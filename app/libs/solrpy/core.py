@@ -241,6 +241,8 @@ Enter a raw query, without processing the returned HTML contents.
 
 """
 import sys
+import time
+import random
 import socket
 import codecs
 import datetime
@@ -259,10 +261,31 @@ import six.moves.urllib.parse as urlparse
 import six.moves.urllib.parse as urllib
 
 __all__ = ['SolrException', 'Solr', 'SolrConnection',
-           'Response', 'SearchHandler']
+           'Response', 'SearchHandler', 'request_observers', 'request_gates']
 
 _python_version = sys.version_info[0]+(sys.version_info[1]/10.0)
 
+# Callables notified after each query (SearchHandler call), for timing and metrics:
+#   observer(selector, seconds, response_bytes, qtime, error)
+# selector is the handler path (e.g., /solr/pepwebdocs/select), seconds the time of the
+# request, transfer and parse, qtime Solr's QTime (ms) and error the exception (if it failed)
+request_observers = []
+
+# Callables called before each query (SearchHandler call): gate(selector), which may raise an
+# exception to refuse the request (e.g., a circuit breaker, while the server is down)
+request_gates = []
+
+def _check_request_gates(selector):
+    for gate in request_gates:
+        gate(selector)
+
+def _notify_request_observers(selector, seconds, response_bytes, qtime, error):
+    for observer in request_observers:
+        try:
+            observer(selector, seconds, response_bytes, qtime, error)
+        except Exception as e:
+            logging.warning("solrpy request observer failed: %s" % e)
+
 # ===================================================================
 # Exceptions
 # ===================================================================
@@ -350,6 +373,8 @@ class Solr:
                  http_pass=None,
                  post_headers={},
                  max_retries=3,
+                 retry_backoff=0,
+                 retry_backoff_max=2.0,
                  debug=False):
 
         """
@@ -374,6 +399,13 @@ class Solr:
             http_user, http_pass -- If given, include HTTP Basic authentication 
                 in all request headers.
 
+            max_retries -- Retries of a request which couldn't connect or lost
+                its connection (a request which timed out isn't retried).
+
+            retry_backoff, retry_backoff_max -- Retry n waits a random time
+                up to retry_backoff * 2**n seconds (at most retry_backoff_max).
+                Defaults to no wait.
+
         """
 
         self.scheme, self.host, self.path = urlparse.urlparse(url, 'http')[:3]
@@ -387,12 +419,14 @@ class Solr:
         self.ssl_key = ssl_key
         self.ssl_cert = ssl_cert
         self.max_retries = int(max_retries)
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
 
         assert self.max_retries >= 0
 
         kwargs = {}
 
-        if self.timeout and _python_version >= 2.6 and _python_version < 3:
+        if self.timeout and _python_version >= 2.6:
             kwargs['timeout'] = self.timeout
 
         if self.scheme == 'https':
@@ -643,21 +677,30 @@ class Solr:
     def _post(self, url, body, headers):
         _headers = self.auth_headers.copy()
         _headers.update(headers)
-        attempts = self.max_retries + 1
-        while attempts > 0:
+        retries = 0
+        while True:
             try:
                 self.conn.request('POST', url, body.encode('UTF-8'), _headers)
                 return check_response_status(self.conn.getresponse())
+            except socket.timeout:
+                # don't retry: a server which is hanging would just be waited
+                # on again; the connection reopens on the next request
+                self.close()
+                raise
             except (socket.error,
                     httplib.ImproperConnectionState,
                     httplib.BadStatusLine):
                     # We include BadStatusLine as they are spurious
                     # and may randomly happen on an otherwise fine
                     # Solr connection (though not often)
-                self._reconnect()
-                attempts -= 1
-                if attempts <= 0:
+                # the connection reopens on the next request (with the timeout)
+                self.reconnects += 1
+                self.close()
+                if retries >= self.max_retries:
                     raise
+                if self.retry_backoff:
+                    time.sleep(random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * 2 ** retries)))
+                retries += 1
 
 
 class SolrConnection(Solr):
@@ -806,11 +849,23 @@ class SearchHandler(object):
         params['version'] = self.conn.response_version
         params['wt'] = 'xml'
 
-        json = self.raw(**params)
-        if PY3 and type(json) == str:
-            json = json.encode("utf-8")
-        return parse_query_response("XML", StringIO(json),  params, self)
-        # return parse_query_response("JSON", StringIO(json), params, self)
+        _check_request_gates(self.selector)
+        start = time.time()
+        try:
+            json = self.raw(**params)
+            if PY3 and type(json) == str:
+                json = json.encode("utf-8")
+            response = parse_query_response("XML", StringIO(json),  params, self)
+            # response = parse_query_response("JSON", StringIO(json), params, self)
+        except Exception as e:
+            _notify_request_observers(self.selector, time.time() - start, None, None, e)
+            raise
+
+        qtime = getattr(response, "header", {}).get("QTime")
+        if response is not None:
+            response._response_bytes = len(json)
+        _notify_request_observers(self.selector, time.time() - start, len(json), qtime, None)
+        return response
 
     def raw(self, **params):
         """
@@ -26,6 +26,10 @@ Run with:
 
     uvicorn main:app --debug --log-level=debug
 
+    or in production, with several worker processes (settings in gunicorn_conf.py and opasConfig):
+
+    gunicorn -c gunicorn_conf.py main:app
+
 (Debug set up in this file as well: app = FastAPI(debug=True))
 
 Endpoint and model documentation automatically available when server is running at:
@@ -88,6 +92,9 @@ sys.path.append('./libs/solrpy')
 
 import os.path
 import time
+import asyncio
+import threading
+import concurrent.futures
 import datetime
 from datetime import datetime
 import re
@@ -101,15 +108,15 @@ from urllib import parse
 # from http import cookies
 
 # from enum import Enum
-import uvicorn
 from fastapi import FastAPI, Query, Body, Path, Cookie, Header, Security, Depends, HTTPException, File, Form, UploadFile
 from fastapi.openapi.utils import get_openapi
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.security.api_key import APIKeyQuery, APIKeyCookie, APIKeyHeader, APIKey
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response, RedirectResponse, FileResponse
+from starlette.responses import JSONResponse, Response, RedirectResponse, FileResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 import starlette.status as httpCodes
 #from starlette.middleware.sessions import SessionMiddleware
 from typing import Optional
@@ -144,32 +151,25 @@ from errorMessages import *
 import models
 # import modelsOpasCentralPydantic
 import opasCentralDBLib
+import opasCircuitBreaker
+import opasConversionExecutor
+import opasCorpusCache
 import opasFileSupport
+import opasMetrics
 import opasQueryHelper
+import opasRequestTiming
+import opasRequestTimingMiddleware
 import opasSchemaHelper
+import opasSlowQueryLog
+import opasTermIndex
+import opasSmartSearchDict
 
 # from sourceInfoDB import SourceInfoDB
 
-# Check text server version
-# doesn't work for some reason.  Works for localhost, but not cross-domain.
-# on the bitnami server, I get unauthorized (401).  I get an error on the
-# codesypher server.
-text_server_ver = None
+# Note: nothing here should contact Solr or the database at import, so workers start fast, and
+#  start even if Solr is briefly down; e.g., the text server version (for the server status) is
+#  fetched on first use (opasAPISupportLib.get_text_server_version).
 text_server_url = localsecrets.SOLRURL
-PARAMS = {'wt':'json'}
-url = f"{localsecrets.SOLRURL}admin/info/system"
-if localsecrets.SOLRUSER is not None:
-    # need username and password
-    r = requests.get(url = url, params = PARAMS, auth=HTTPBasicAuth(localsecrets.SOLRUSER, localsecrets.SOLRPW))
-else:
-    r = requests.get(url = url, params = PARAMS)
-    
-if r.status_code == 200:
-    ver_json = r.json()
-    try:
-        text_server_ver = ver_json["lucene"]["lucene-spec-version"]
-    except KeyError:
-        text_server_ver = ver_json["lucene"]["solr-spec-version"]
 
 CURRENT_DEVELOPMENT_STATUS = "Developing"
 
@@ -193,7 +193,38 @@ app.add_middleware(
     allow_headers = ["*"],
 )
 
+# time the phases of each request (Server-Timing header, log line, and histograms per route)
+app.router.route_class = opasRequestTimingMiddleware.TimedRoute
+app.add_middleware(opasRequestTimingMiddleware.RequestTimingMiddleware)
+
 opas_fs = opasFileSupport.FlexFileSystem(key=localsecrets.S3_KEY, secret=localsecrets.S3_SECRET)
+# images may be added or replaced by a load, so where they were found is forgotten with each new corpus generation
+opasCorpusCache.add_generation_listener(opas_fs.clear_image_resolver_cache)
+
+@app.on_event("startup")
+async def set_thread_pool_size():
+    # the (non async) endpoints, and so their Solr, database and PaDS calls, run in the loop's default executor
+    asyncio.get_event_loop().set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=opasConfig.SERVER_THREADS,
+                                                                                         thread_name_prefix="opasapi"))
+
+@app.on_event("startup")
+async def prewarm_image_cache():
+    # one listing of the image folder, rather than extension probes per image request; in the
+    #  background, since the listing (S3 when keyed) can take a while and would block the event loop
+    if opasConfig.IMAGE_CACHE_PREWARM:
+        threading.Thread(target=opas_fs.prewarm_image_cache, kwargs={"path": localsecrets.IMAGE_SOURCE_PATH},
+                         name="imageprewarm", daemon=True).start()
+
+@app.on_event("startup")
+async def build_term_indexes():
+    # in memory prefix indexes for the word wheel and author index, built in the background
+    opasTermIndex.start_term_index_builds()
+    # and the dictionaries smart search classifies its input with
+    opasSmartSearchDict.start_smart_search_build()
+
+@app.on_event("shutdown")
+async def shutdown_conversion_pool():
+    opasConversionExecutor.shutdown_conversion_pool(wait=False)
 
 logger.info('Started at %s', datetime.today().strftime('%Y-%m-%d %H:%M:%S"'))
 
@@ -278,6 +309,48 @@ async def api_live_doc(api_key: APIKey = Depends(get_api_key)):
     )
     return response
 
+#-----------------------------------------------------------------------------
+@app.get("/metrics", tags=["Admin"], summary=opasConfig.ENDPOINT_SUMMARY_METRICS)
+def server_metrics(request: Request):
+    """
+    ## Function
+       <b>Return the server metrics, in the Prometheus text exposition format, for scraping.</b>
+
+       Request counts and latency per route (and phase), Solr latency and errors per core,
+       MySQL connections, cache hit ratios and PaDS latency.  Collected in process,
+       so it doesn't open database or Solr connections.
+
+    ## Return Type
+       text/plain (Prometheus text format 0.0.4)
+
+    ## Status
+       Status: Working
+
+    ## Sample Call
+         /metrics
+
+    ## Notes
+       Disabled (404) when opasConfig.METRICS_ENABLED is False
+
+       There's no login for this endpoint, so it's only served to the client addresses in
+       opasConfig.METRICS_ALLOWED_CLIENTS (by default, the local host, e.g., a scraper on the
+       same machine).  Behind a proxy or load balancer, the client address is the proxy's, so
+       /metrics must also be restricted there (e.g., not routed from outside).
+
+    ## Potential Errors
+       403 if the client address isn't allowed
+
+    """
+    if not opasConfig.METRICS_ENABLED:
+        raise HTTPException(status_code=httpCodes.HTTP_404_NOT_FOUND, detail="Metrics are not enabled")
+
+    if opasConfig.METRICS_ALLOWED_CLIENTS is not None:
+        client_host = request.client.host if request.client is not None else None
+        if client_host not in opasConfig.METRICS_ALLOWED_CLIENTS:
+            raise HTTPException(status_code=httpCodes.HTTP_403_FORBIDDEN, detail="Metrics are not available to this client")
+
+    return Response(content=opasMetrics.render_metrics(), media_type=opasMetrics.CONTENT_TYPE)
+
 #-----------------------------------------------------------------------------
 @app.get("/v2/Reports/{report}", response_model=models.Report, tags=["Reports"], summary=opasConfig.ENDPOINT_SUMMARY_DOCUMENTATION)
 async def reports(response: Response, 
@@ -856,6 +929,47 @@ async def admin_change_user_password(response: Response,
         )        
     return ret_val
 #-----------------------------------------------------------------------------
+@app.get("/v2/Admin/SlowQueries/", tags=["Admin"], summary=opasConfig.ENDPOINT_SUMMARY_SLOW_QUERIES)
+def admin_slow_queries(response: Response, 
+                       request: Request=Query(None, title=opasConfig.TITLE_REQUEST, description=opasConfig.DESCRIPTION_REQUEST),  
+                       limit: int=Query(20, title=opasConfig.TITLE_LIMIT, description="Number of the slowest records to return"), 
+                       ):
+    """
+    ## Function
+       <b>Report on the slow query log</b>
+
+       The Solr queries (final parameters, QTime, numFound, response bytes) of requests which took at least
+       opasConfig.SLOW_QUERY_THRESHOLD_MS, summarized by route and by query feature (highlighting, wildcard,
+       facets, large page, deep paging), with the slowest records.
+
+    ## Return Type
+       dict (records, from, to, threshold_ms, by_route, by_feature, slowest)
+
+    ## Status
+       Status: Working
+
+    ## Sample Call
+         /v2/Admin/SlowQueries/?limit=10
+
+    ## Notes
+         Restricted to admins.
+
+    ## Potential Errors
+       NA
+
+    """
+    ocd, session_info = opasAPISupportLib.get_session_info(request, response)
+    # ensure user is admin
+    if ocd.verify_admin(session_info):
+        ret_val = opasSlowQueryLog.slow_query_report(limit=limit)
+    else:
+        raise HTTPException(
+            status_code=httpCodes.HTTP_401_UNAUTHORIZED, 
+            detail="Not authorized"
+        )        
+    return ret_val
+
+#-----------------------------------------------------------------------------
 @app.post("/v2/Admin/SubscribeUser/", response_model=models.User, response_model_exclude_unset=True, tags=["Admin"], summary=opasConfig.ENDPOINT_SUMMARY_SUBSCRIBE_USER)
 async def admin_subscribe_user(response: Response, 
                                request: Request=Query(None, title=opasConfig.TITLE_REQUEST, description=opasConfig.DESCRIPTION_REQUEST),  
@@ -975,7 +1089,7 @@ async def session_status(response: Response,
        NA
 
     """
-    global text_server_ver
+    text_server_ver = await run_in_threadpool(opasAPISupportLib.get_text_server_version)
     
     ocd, session_info = opasAPISupportLib.get_session_info(request, response)   
 
@@ -1009,6 +1123,10 @@ async def session_status(response: Response,
                                                          db_server_version = mysql_ver,
                                                          cors_regex=localsecrets.CORS_REGEX, 
                                                          config_name = config_name,
+                                                         term_indexes = opasTermIndex.term_index_stats() + opasSmartSearchDict.smart_search_dict_stats(),
+                                                         caches = opasCorpusCache.cache_stats(),
+                                                         timings = opasRequestTiming.timing_stats(),
+                                                         backends = opasCircuitBreaker.breaker_status(),
                                                          user_count = 0
                                                          )
         except ValidationError as e:
@@ -1022,6 +1140,7 @@ async def session_status(response: Response,
                                                          opas_version = __version__, 
                                                          user_ip = request.client.host,
                                                          timeStamp = datetime.utcfromtimestamp(time.time()).strftime('%Y-%m-%dT%H:%M:%SZ'), 
+                                                         backends = opasCircuitBreaker.breaker_status(),
                                                          )
         except ValidationError as e:
             logger.warning("ValidationError", e.json())
@@ -1982,10 +2101,11 @@ async def database_advanced_search(response: Response,
                                             req_url=request.url._url
                                             )
     # try the query
-    ret_val, ret_status = opasAPISupportLib.search_text_qs(solr_query_spec,
-                                                           #authenticated=session_info.authenticated, 
-                                                           session_info=session_info
-                                                           )
+    # full-text returns are converted (see opasConversionExecutor); run in a thread so waiting on that doesn't block the event loop
+    ret_val, ret_status = await run_in_threadpool(opasAPISupportLib.search_text_qs,
+                                                  solr_query_spec,
+                                                  session_info=session_info
+                                                  )
     
     #  if there's a Solr server error in the call, it returns a non-200 ret_status[0]
     if ret_status[0] != httpCodes.HTTP_200_OK:
@@ -2199,10 +2319,11 @@ async def database_advanced_search_v3(response: Response,
                                             req_url=request.url._url
                                             )
     # try the query
-    ret_val, ret_status = opasAPISupportLib.search_text_qs(solr_query_spec,
-                                                           #authenticated=session_info.authenticated
-                                                           session_info=session_info
-                                                           )
+    # full-text returns are converted (see opasConversionExecutor); run in a thread so waiting on that doesn't block the event loop
+    ret_val, ret_status = await run_in_threadpool(opasAPISupportLib.search_text_qs,
+                                                  solr_query_spec,
+                                                  session_info=session_info
+                                                  )
     
     #  if there's a Solr server error in the call, it returns a non-200 ret_status[0]
     if ret_status[0] != httpCodes.HTTP_200_OK:
@@ -2627,14 +2748,15 @@ async def database_search_paragraphs(response: Response,
     solr_query_params = solr_query_spec.solrQuery
     solr_query_opts = solr_query_spec.solrQueryOpts
        
-    ret_val, ret_status = opasAPISupportLib.search_text_qs(solr_query_spec,
-                                                           extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
-                                                           limit=limit,
-                                                           offset=offset,
-                                                           req_url=request.url._url, 
-                                                           #authenticated=session_info.authenticated
-                                                           session_info=session_info
-                                                           )
+    ret_val, ret_status = await run_in_threadpool(opasAPISupportLib.search_text_qs,
+                                                  solr_query_spec,
+                                                  extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
+                                                  limit=limit,
+                                                  offset=offset,
+                                                  req_url=request.url._url, 
+                                                  #authenticated=session_info.authenticated
+                                                  session_info=session_info
+                                                  )
     #  if there's a Solr server error in the call, it returns a non-200 ret_status[0]
     if ret_status[0] != httpCodes.HTTP_200_OK:
         #  throw an exception rather than return an object (which will fail)
@@ -2698,7 +2820,8 @@ async def database_search_v3(
     facetoffset: int=Query(0, title="Offset that can be used for paging through a facet"),
     sort: str=Query("score desc", title=opasConfig.TITLE_SORT, description=opasConfig.DESCRIPTION_SORT),
     limit: int=Query(15, title=opasConfig.TITLE_LIMIT, description=opasConfig.DESCRIPTION_LIMIT),
-    offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET)
+    offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET),
+    cursor: str=Query(None, title=opasConfig.TITLE_CURSOR, description=opasConfig.DESCRIPTION_CURSOR)
     ):
     """
     ## Function
@@ -2807,13 +2930,15 @@ async def database_search_v3(
                                                       req_url = request.url._url
                                                       )
 
-    ret_val, ret_status = opasAPISupportLib.search_text_qs(solr_query_spec, 
-                                                           extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
-                                                           limit=limit,
-                                                           offset=offset,
-                                                           #authenticated=session_info.authenticated
-                                                           session_info=session_info
-                                                           )
+    ret_val, ret_status = await run_in_threadpool(opasAPISupportLib.search_text_qs,
+                                                  solr_query_spec,
+                                                  extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
+                                                  limit=limit,
+                                                  offset=offset,
+                                                  #authenticated=session_info.authenticated
+                                                  session_info=session_info,
+                                                  cursor=cursor
+                                                  )
         
 
     #  if there's a Solr server error in the call, it returns a non-200 ret_status[0]
@@ -2882,7 +3007,8 @@ async def database_search_v2(
     facetoffset: int=Query(0, title="Offset that can be used for paging through a facet"),
     sort: str=Query("score desc", title=opasConfig.TITLE_SORT, description=opasConfig.DESCRIPTION_SORT),
     limit: int=Query(15, title=opasConfig.TITLE_LIMIT, description=opasConfig.DESCRIPTION_LIMIT),
-    offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET)
+    offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET),
+    cursor: str=Query(None, title=opasConfig.TITLE_CURSOR, description=opasConfig.DESCRIPTION_CURSOR)
   ):
     """
     ## Function
@@ -2975,13 +3101,15 @@ async def database_search_v2(
                                                       req_url = request.url._url
                                                       )
 
-    ret_val, ret_status = opasAPISupportLib.search_text_qs(solr_query_spec, 
-                                                           extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
-                                                           limit=limit,
-                                                           offset=offset,
-                                                           #authenticated=session_info.authenticated
-                                                           session_info=session_info
-                                                           )
+    ret_val, ret_status = await run_in_threadpool(opasAPISupportLib.search_text_qs,
+                                                  solr_query_spec,
+                                                  extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
+                                                  limit=limit,
+                                                  offset=offset,
+                                                  #authenticated=session_info.authenticated
+                                                  session_info=session_info,
+                                                  cursor=cursor
+                                                  )
         
     #  if there's a Solr server error in the call, it returns a non-200 ret_status[0]
     if ret_status[0] != httpCodes.HTTP_200_OK:
@@ -3012,6 +3140,138 @@ async def database_search_v2(
 
     return ret_val
 
+#---------------------------------------------------------------------------------------------------------
+@app.get("/v2/Database/Search/Export/", tags=["Database"], summary=opasConfig.ENDPOINT_SUMMARY_SEARCH_EXPORT)
+def database_search_export(
+    response: Response, 
+    request: Request=Query(None, title=opasConfig.TITLE_REQUEST, description=opasConfig.DESCRIPTION_REQUEST),  
+    fulltext1: str=Query(None, title=opasConfig.TITLE_FULLTEXT1, description=opasConfig.DESCRIPTION_FULLTEXT1),
+    paratext: str=Query(None, title=opasConfig.TITLE_PARATEXT, description=opasConfig.DESCRIPTION_PARATEXT),
+    smarttext: str=Query(None, title=opasConfig.TITLE_SMARTSEARCH, description=opasConfig.DESCRIPTION_SMARTSEARCH),
+    parascope: str=Query(None, title=opasConfig.TITLE_PARASCOPE, description=opasConfig.DESCRIPTION_PARASCOPE),
+    synonyms: bool=Query(False, title=opasConfig.TITLE_SYNONYMS, description=opasConfig.DESCRIPTION_SYNONYMS),
+    # filters (Solr query filter)
+    sourcename: str=Query(None, title=opasConfig.TITLE_SOURCENAME, description=opasConfig.DESCRIPTION_SOURCENAME, min_length=2),  
+    sourcecode: str=Query(None, title=opasConfig.TITLE_SOURCECODE, description=opasConfig.DESCRIPTION_SOURCECODE, min_length=2), 
+    sourcetype: str=Query(None, title=opasConfig.TITLE_SOURCETYPE, description=opasConfig.DESCRIPTION_PARAM_SOURCETYPE), 
+    sourcelangcode: str=Query(None, min_length=2, title=opasConfig.TITLE_SOURCELANGCODE, description=opasConfig.DESCRIPTION_SOURCELANGCODE), 
+    volume: str=Query(None, title=opasConfig.TITLE_VOLUMENUMBER, description=opasConfig.DESCRIPTION_VOLUMENUMBER), 
+    issue: str=Query(None, title=opasConfig.TITLE_ISSUE, description=opasConfig.DESCRIPTION_ISSUE),
+    author: str=Query(None, title=opasConfig.TITLE_AUTHOR, description=opasConfig.DESCRIPTION_AUTHOR), 
+    title: str=Query(None, title=opasConfig.TITLE_TITLE, description=opasConfig.DESCRIPTION_TITLE),
+    articletype: str=Query(None, title=opasConfig.TITLE_ARTICLETYPE, description=opasConfig.DESCRIPTION_ARTICLETYPE),
+    startyear: str=Query(None, title=opasConfig.TITLE_STARTYEAR, description=opasConfig.DESCRIPTION_STARTYEAR), 
+    endyear: str=Query(None, title=opasConfig.TITLE_ENDYEAR, description=opasConfig.DESCRIPTION_ENDYEAR), 
+    citecount: str=Query(None, title=opasConfig.TITLE_CITECOUNT, description=opasConfig.DESCRIPTION_CITECOUNT),   
+    viewcount: int=Query(0, title=opasConfig.TITLE_VIEWCOUNT, description=opasConfig.DESCRIPTION_VIEWCOUNT),    
+    viewperiod: int=Query(4, title=opasConfig.TITLE_VIEWPERIOD, description=opasConfig.DESCRIPTION_VIEWPERIOD),     
+    # export control
+    exportfields: str=Query(None, title=opasConfig.TITLE_EXPORTFIELDS, description=opasConfig.DESCRIPTION_EXPORTFIELDS),
+    sort: str=Query("score desc", title=opasConfig.TITLE_SORT, description=opasConfig.DESCRIPTION_SORT),
+    limit: int=Query(opasConfig.EXPORT_MAX_ROWS, title=opasConfig.TITLE_EXPORTLIMIT, description=opasConfig.DESCRIPTION_EXPORTLIMIT)
+  ):
+    """
+    ## Function
+       <b>Export the results of a search, as newline delimited JSON (NDJSON), one line (JSON object) per document.</b>
+
+       Takes the same search parameters as /v2/Database/Search/, but rather than return a page of the results,
+       returns them all (up to the limit), with just the fields requested in exportfields.  The results are
+       streamed as they come from the search engine.
+
+    ## Return Type
+       NDJSON (application/x-ndjson), e.g.,
+       ```
+       {"art_id": "AOP.033.0079A", "art_year": "2016", ...}
+       {"art_id": "AOP.032.0001A", "art_year": "2015", ...}
+       ```
+       The number of documents in the export is in the X-Total-Count header.
+
+    ## Status
+       Status: In Development
+
+    ## Sample Call
+         /v2/Database/Search/Export/?sourcecode=AOP&exportfields=art_id,art_citeas_xml
+
+    ## Notes
+
+    ## Limitations
+       Only for logged in users.
+       Only metadata fields can be exported (see opasConfig.EXPORT_FIELDS), never the document text.
+       At most opasConfig.EXPORT_MAX_ROWS documents are exported per request.
+
+    ## Potential Errors
+       401 if not logged in.
+       400 if a field can't be exported, or for a search syntax error.
+
+    """
+    ocd, session_info = opasAPISupportLib.get_session_info(request, response)
+    # bulk export is for logged in users only
+    if not session_info.authenticated:
+        response.status_code = httpCodes.HTTP_401_UNAUTHORIZED
+        status_message = "Must be logged in to export search results."
+        ocd.record_session_endpoint(api_endpoint_id=opasCentralDBLib.API_DATABASE_SEARCH,
+                                    session_info=session_info, 
+                                    params=request.url._url,
+                                    return_status_code = response.status_code,
+                                    status_message=status_message
+                                    )
+        raise HTTPException(
+            status_code = response.status_code,
+            detail = status_message
+        )
+
+    try:
+        fields = opasAPISupportLib.export_fields_list(exportfields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=httpCodes.HTTP_400_BAD_REQUEST, 
+            detail=f"Bad Export Request. {e}"
+        )
+
+    # don't set parascope, unless they set paratext and forgot to set parascope
+    if paratext is not None and parascope is None:
+        parascope = "doc"
+
+    solr_query_spec = \
+        opasQueryHelper.parse_search_query_parameters(source_name=sourcename,
+                                                      source_code=sourcecode,
+                                                      source_type=sourcetype,
+                                                      source_lang_code=sourcelangcode,
+                                                      para_textsearch=paratext, # search within paragraphs
+                                                      para_scope=parascope, # scope for par_search
+                                                      fulltext1=fulltext1,  # more flexible search, including fields, anywhere in the doc, across paras
+                                                      smarttext=smarttext, # experimental detection of what user wants to query
+                                                      synonyms=synonyms, 
+                                                      vol=volume,
+                                                      issue=issue,
+                                                      author=author,
+                                                      title=title,
+                                                      articletype=articletype, 
+                                                      startyear=startyear,
+                                                      endyear=endyear,
+                                                      citecount=citecount,
+                                                      viewcount=viewcount,
+                                                      viewperiod=viewperiod,
+                                                      sort=sort,
+                                                      req_url = request.url._url
+                                                      )
+
+    try:
+        count, rows = opasAPISupportLib.search_export(solr_query_spec, fields, limit=limit)
+    except solr.SolrException as e:
+        raise HTTPException(
+            status_code=e.httpcode, 
+            detail=f"Bad Solr Search Request. {e.reason}:{e.body}"
+        )
+
+    ocd.record_session_endpoint(api_endpoint_id=opasCentralDBLib.API_DATABASE_SEARCH,
+                                session_info=session_info, 
+                                params=request.url._url,
+                                status_message=f"Export of {count} documents"
+                                )
+
+    return StreamingResponse(rows, media_type="application/x-ndjson", headers={"X-Total-Count": str(count)})
+
 #---------------------------------------------------------------------------------------------------------
 @app.get("/v1/Database/SearchAnalysis/", response_model_exclude_unset=True, tags=["PEPEasy1 (Deprecated)"], summary=opasConfig.ENDPOINT_SUMMARY_SEARCH_ANALYSIS)  #  remove validation response_model=models.DocumentList, 
 async def database_searchanalysis_v1(response: Response, 
@@ -3351,16 +3611,17 @@ async def database_searchtermlist_v3(response: Response,
                                                       req_url = request.url._url
                                                       )
 
-    ret_val, ret_status = opasAPISupportLib.search_text_qs(solr_query_spec=solr_query_spec, 
-                                                           extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
-                                                           facet_limit=facetlimit,
-                                                           facet_offset=facetoffset, 
-                                                           limit=limit,
-                                                           offset=offset,
-                                                           sort=sort,
-                                                           #authenticated=session_info.authenticated
-                                                           session_info=session_info
-                                                           )
+    ret_val, ret_status = await run_in_threadpool(opasAPISupportLib.search_text_qs,
+                                                  solr_query_spec=solr_query_spec,
+                                                  extra_context_len=opasConfig.DEFAULT_KWIC_CONTENT_LENGTH,
+                                                  facet_limit=facetlimit,
+                                                  facet_offset=facetoffset, 
+                                                  limit=limit,
+                                                  offset=offset,
+                                                  sort=sort,
+                                                  #authenticated=session_info.authenticated
+                                                  session_info=session_info
+                                                  )
     
 
     #  if there's a Solr server error in the call, it returns a non-200 ret_status[0]
@@ -3764,7 +4025,8 @@ def metadata_contents_sourcecode(response: Response,
                                  SourceCode: str=Path(..., title=opasConfig.TITLE_SOURCECODE, description=opasConfig.DESCRIPTION_SOURCECODE), 
                                  year: str=Query("*", title=opasConfig.TITLE_YEAR, description=opasConfig.DESCRIPTION_YEAR),
                                  limit: int=Query(15, title=opasConfig.TITLE_LIMIT, description=opasConfig.DESCRIPTION_LIMIT),
-                                 offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET)
+                                 offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET),
+                                 cursor: str=Query(None, title=opasConfig.TITLE_CURSOR, description=opasConfig.DESCRIPTION_CURSOR)
                                  ):
     """
     ## Function
@@ -3792,7 +4054,8 @@ def metadata_contents_sourcecode(response: Response,
         ret_val = opasAPISupportLib.metadata_get_contents(SourceCode,
                                                           year,
                                                           limit=limit,
-                                                          offset=offset)
+                                                          offset=offset,
+                                                          cursor=cursor)
         # fill in additional return structure status info
         # client_host = request.client.host
     except Exception as e:
@@ -3825,7 +4088,8 @@ def metadata_contents(SourceCode: str,
                       request: Request=Query(None, title=opasConfig.TITLE_REQUEST, description=opasConfig.DESCRIPTION_REQUEST),  
                       year: str=Query("*", title=opasConfig.TITLE_YEAR, description=opasConfig.DESCRIPTION_YEAR),
                       limit: int=Query(15, title=opasConfig.TITLE_LIMIT, description=opasConfig.DESCRIPTION_LIMIT),
-                      offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET)
+                      offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET),
+                      cursor: str=Query(None, title=opasConfig.TITLE_CURSOR, description=opasConfig.DESCRIPTION_CURSOR)
                       ):
     """
     ## Function
@@ -3855,7 +4119,8 @@ def metadata_contents(SourceCode: str,
                                                                          year,
                                                                          vol=SourceVolume,
                                                                          limit=limit,
-                                                                         offset=offset)
+                                                                         offset=offset,
+                                                                         cursor=cursor)
         # fill in additional return structure status info
         # client_host = request.client.host
     except Exception as e:
@@ -4281,7 +4546,8 @@ def authors_publications(response: Response,
                          request: Request=Query(None, title=opasConfig.TITLE_REQUEST, description=opasConfig.DESCRIPTION_REQUEST),  
                          authorNamePartial: str=Path(..., title=opasConfig.TITLE_AUTHORNAMEORPARTIAL, description=opasConfig.DESCRIPTION_AUTHORNAMEORPARTIAL), 
                          limit: int=Query(15, title=opasConfig.TITLE_LIMIT, description=opasConfig.DESCRIPTION_LIMIT),
-                         offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET)
+                         offset: int=Query(0, title=opasConfig.TITLE_OFFSET, description=opasConfig.DESCRIPTION_OFFSET),
+                         cursor: str=Query(None, title=opasConfig.TITLE_CURSOR, description=opasConfig.DESCRIPTION_CURSOR)
                          ):
     """
     ## Function
@@ -4306,7 +4572,7 @@ def authors_publications(response: Response,
     ocd, session_info = opasAPISupportLib.get_session_info(request, response)
     try:
         author_name_to_check = authorNamePartial.lower()  # work with lower case only, since Solr is case sensitive.
-        ret_val = opasAPISupportLib.authors_get_author_publications(author_name_to_check, limit=limit, offset=offset)
+        ret_val = opasAPISupportLib.authors_get_author_publications(author_name_to_check, limit=limit, offset=offset, cursor=cursor)
     except Exception as e:
         response.status_code=httpCodes.HTTP_500_INTERNAL_SERVER_ERROR
         status_message = f"Error: {e}"
@@ -4873,7 +5139,9 @@ def documents_document_fetch(response: Response, request: Request=Query(None,
 async def documents_image_fetch(response: Response,
                                request: Request=Query(None, title=opasConfig.TITLE_REQUEST, description=opasConfig.DESCRIPTION_REQUEST),  
                                imageID: str=Path(..., title=opasConfig.TITLE_IMAGEID, description=opasConfig.DESCRIPTION_DOCIDORPARTIAL),
-                               download: int=Query(0, title="Return or download", description="0 to return the image to the browser, 1 to download")
+                               download: int=Query(0, title="Return or download", description="0 to return the image to the browser, 1 to download"),
+                               width: int=Query(None, title=opasConfig.TITLE_IMAGEWIDTH, description=opasConfig.DESCRIPTION_IMAGEWIDTH),
+                               image_format: str=Query(None, alias="format", title=opasConfig.TITLE_IMAGEFORMAT, description=opasConfig.DESCRIPTION_IMAGEFORMAT)
                                ):
     """
     ## Function
@@ -4881,6 +5149,10 @@ async def documents_image_fetch(response: Response,
        if download == 1 then the file is returned as a downloadable file to the client/browser.
        Otherwise, it's returned as binary data, and displays in the browser.  This is in fact
           how it works to display images in articles.
+          
+       If width and/or format (jpg or webp) is specified, a web optimized rendition of the image
+          is returned instead of the original (e.g., for article pages and TOC thumbnails).
+          Renditions are generated on first request and stored alongside the original.
 
     ## Return Type
        Binary data
@@ -4892,6 +5164,7 @@ async def documents_image_fetch(response: Response,
     ## Sample Call
          http://localhost:9100/v1/Documents/Images/AIM.036.0275A.FIG001/
          http://development.org:9100/v1/Documents/Downloads/Images/AIM.036.0275A.FIG001
+         http://development.org:9100/v2/Documents/Image/AIM.036.0275A.FIG001/?width=300&format=webp
 
     ## Notes
 
@@ -4922,8 +5195,9 @@ async def documents_image_fetch(response: Response,
             detail=status_message
         )    
 
-    filename = opas_fs.get_image_filename(filespec=imageID, path=localsecrets.IMAGE_SOURCE_PATH)    
-    media_type='image/jpeg'
+    # resolving the name may probe the file system (S3 when keyed), so it runs in the thread pool
+    filename = await run_in_threadpool(opas_fs.get_image_filename, filespec=imageID, path=localsecrets.IMAGE_SOURCE_PATH)
+    media_type = opasFileSupport.get_image_media_type(filename)
     if download == 0:
         if filename is None:
             response.status_code = httpCodes.HTTP_400_BAD_REQUEST 
@@ -4940,7 +5214,23 @@ async def documents_image_fetch(response: Response,
             raise HTTPException(status_code=response.status_code,
                                 detail=status_message)
         else:
-            file_content = opas_fs.get_image_binary(filename)
+            # image reads (S3 when keyed) and the rendition's resize and encode block, so they run
+            #  in the thread pool rather than on the event loop
+            if width is not None or image_format is not None:
+                try:
+                    file_content, media_type = await run_in_threadpool(opas_fs.get_image_rendition, filename,
+                                                                       width=width, image_format=image_format)
+                except ValueError as e:
+                    response.status_code = httpCodes.HTTP_400_BAD_REQUEST 
+                    status_message = f"Error: {e}"
+                    logger.warning(status_message)
+                    raise HTTPException(status_code=response.status_code,
+                                        detail=status_message)
+                if file_content is None: # fall back to the original
+                    media_type = opasFileSupport.get_image_media_type(filename)
+                    file_content = await run_in_threadpool(opas_fs.get_image_binary, filename)
+            else:
+                file_content = await run_in_threadpool(opas_fs.get_image_binary, filename)
             try:
                 ret_val = response = Response(file_content, media_type=media_type)
 
@@ -4969,7 +5259,7 @@ async def documents_image_fetch(response: Response,
     else: # download == 1
         try:
             response.status_code = httpCodes.HTTP_200_OK
-            filename = opas_fs.get_image_filename(filename)
+            filename = await run_in_threadpool(opas_fs.get_image_filename, filename)
             if opas_fs.key is not None:
                 fileurl = opas_fs.fs.url(filename)
                 fname = wget.download(fileurl)
@@ -5250,10 +5540,16 @@ def database_word_wheel(response: Response,
 
 
 if __name__ == "__main__":
+    import uvicorn # only needed to run the server from here (workers import main:app)
     from localsecrets import CONFIG
     print(f"Server Running ({localsecrets.BASEURL}:{localsecrets.API_PORT_MAIN})")
     print (f"Running in Python {sys.version_info[0]}.{sys.version_info[1]}")
     print (f"Configuration used: {CONFIG}")
-    uvicorn.run(app, host="development.org", port=localsecrets.API_PORT_MAIN, debug=True)
+    if opasConfig.SERVER_WORKERS is not None and opasConfig.SERVER_WORKERS > 1:
+        # each worker process imports main:app itself; in production, use gunicorn (gunicorn_conf.py)
+        os.environ["OPAS_SERVER_WORKERS"] = str(opasConfig.SERVER_WORKERS)
+        uvicorn.run("main:app", host="development.org", port=localsecrets.API_PORT_MAIN, workers=opasConfig.SERVER_WORKERS)
+    else:
+        uvicorn.run(app, host="development.org", port=localsecrets.API_PORT_MAIN, debug=True)
         # uvicorn.run(app, host=localsecrets.BASEURL, port=9100, debug=True)
     print ("Now we're exiting...")
\ No newline at end of file
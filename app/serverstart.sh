@@ -10,4 +10,7 @@
 
 # cd app
 source ./env/bin/activate
-uvicorn main:app --port 28280
\ No newline at end of file
+uvicorn main:app --port 28280
+
+# or, with several worker processes (settings in gunicorn_conf.py, and opasConfig SERVER_*):
+# BIND=0.0.0.0:28280 gunicorn -c gunicorn_conf.py main:app
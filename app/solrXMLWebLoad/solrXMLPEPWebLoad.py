@@ -128,6 +128,11 @@ __status__      = "Development"
                 # those are mainly for faceting.  Also, docvalues=true was causing fields to show up in results
                 # when I wanted those fields hidden, so went to uninvertible instead.
 
+    #2026.1019  # Record the time of each load stage (read, parse, ArticleInfo, doc core extraction, authors core,
+                #  api_articles, biblio, Solr post and commit) for every file, and end the run with a report of the
+                #  stage totals and percentiles and the slowest files.  Added --slowest, and --profile/--profilerate
+                #  to cProfile a sampled subset of the files.
+
 
 # Disable many annoying pylint messages, warning me about variable naming for example.
 # yes, in my Solr code I'm caught between two worlds of snake_case and camelCase.
@@ -141,7 +146,11 @@ import os
 import os.path
 # import ntpath # note: if dealing with Windows path names on Linux, use ntpath instead)
 import time
+import math
 import string
+import cProfile
+import pstats
+import contextlib
 
 import logging
 logger = logging.getLogger(__name__)
@@ -243,6 +252,97 @@ def non_empty_string(strval):
         return None
         
 
+class LoadStageTimes(object):
+    """
+    The time (seconds) of each load stage for each file, for the timing report at the end of a run.
+
+    Stages are exclusive: the time of a stage timed within another stage (e.g., the Solr post
+      within the doc core extraction) isn't counted in the outer one.  Stages timed outside of
+      a file (e.g., the final commit) are counted in the totals only.
+
+    >>> load_times = LoadStageTimes()
+    >>> load_times.start_file("IJP.001.0001A(bEXP_ARCH1).XML")
+    >>> with load_times.stage("doc_core"):
+    ...     with load_times.stage("solr_post"):
+    ...         pass
+    >>> total = load_times.end_file()
+    >>> sorted(load_times.files[0][1].keys())
+    ['doc_core', 'solr_post']
+    """
+    STAGES = ("read", "parse", "artinfo", "doc_core", "author_core", "sql_articles", "biblio", "solr_post", "commit")
+
+    def __init__(self):
+        self.files = [] # (filename, {stage: seconds}, total seconds)
+        self.other = {} # stage: seconds, outside of files
+        self.current = None
+        self.current_filename = None
+        self.current_start = None
+        self.stack = [] # [outer stage seconds of nested stages] of the stages in progress
+
+    def start_file(self, filename):
+        self.current_filename = filename
+        self.current = {}
+        self.current_start = time.time()
+
+    def end_file(self):
+        """
+        Record the current file's stage times, returning its total time
+        """
+        ret_val = time.time() - self.current_start
+        self.files.append((self.current_filename, self.current, ret_val))
+        self.current = None
+        return ret_val
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.time()
+        self.stack.append(0)
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            nested = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            times = self.current if self.current is not None else self.other
+            times[name] = times.get(name, 0) + elapsed - nested
+
+    def file_summary(self, stage_times):
+        return ", ".join([f"{name} {stage_times[name]:.3f}" for name in self.STAGES if name in stage_times])
+
+    def report(self, slowest=10):
+        """
+        Print the total, share and percentiles of each stage (over the files), and the slowest files
+        """
+        if self.files == []:
+            return
+
+        def percentile(values, q):
+            # nearest rank
+            return values[max(1, math.ceil(q / 100 * len(values))) - 1]
+
+        totals = {}
+        for filename, stage_times, total in self.files:
+            for name, seconds in stage_times.items():
+                totals[name] = totals.get(name, 0) + seconds
+        for name, seconds in self.other.items():
+            totals[name] = totals.get(name, 0) + seconds
+        grand_total = sum(totals.values()) or 1
+
+        print((80*"-"))
+        print (f"Load stage times for {len(self.files)} files (seconds)")
+        print (f"{'stage':<14} {'total':>10} {'share':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for name in [name for name in self.STAGES if name in totals] + sorted(set(totals) - set(self.STAGES)):
+            values = sorted([stage_times.get(name, 0) for filename, stage_times, total in self.files])
+            print (f"{name:<14} {totals[name]:>10.2f} {totals[name] / grand_total:>7.1%} {percentile(values, 50):>8.3f} {percentile(values, 95):>8.3f} {percentile(values, 99):>8.3f} {values[-1]:>8.3f}")
+
+        print (f"Slowest {min(slowest, len(self.files))} files:")
+        for filename, stage_times, total in sorted(self.files, key=lambda file_times: -file_times[2])[:slowest]:
+            print (f"{total:>10.3f}  {filename} ({self.file_summary(stage_times)})")
+        print((80*"-"))
+
+gLoadTimes = LoadStageTimes() # stage times of the files loaded, for the report at the end of the run
+
 class NewFileTracker(object):
     """
     >>> ocd =  opasCentralDBLib.opasCentralDB()
@@ -1093,7 +1193,8 @@ def process_article_for_doc_core(pepxml, artInfo, solrcon, file_xml_contents):
     # parasxml_update(parasxml, solrcon, artInfo)
     # format for pysolr (rather than solrpy, supports nesting)
     try:
-        solrcon.add([new_rec], commit=False)
+        with gLoadTimes.stage("solr_post"):
+            solrcon.add([new_rec], commit=False)
     except Exception as err:
         #processingErrorCount += 1
         errStr = "Solr call exception for save doc on %s: %s" % (artInfo.art_id, err)
@@ -1184,26 +1285,27 @@ def process_info_for_author_core(pepxml, artInfo, solrAuthor):
                 authorAffil = etree.tostring(authorAffil[0])
                
             try:  
-                response_update = solrAuthor.add(id = authorDocid,         # important =  note this is unique id for every author + artid
-                                                 art_id = artInfo.art_id,
-                                                 title = artInfo.art_title,
-                                                 authors = artInfo.art_author_id_list,
-                                                 art_author_id = authorID,
-                                                 art_author_listed = authorListed,
-                                                 art_author_pos_int = authorPos,
-                                                 art_author_role = authorRole,
-                                                 art_author_bio = authorBio,
-                                                 art_author_affil_xml = authorAffil,
-                                                 art_year_int = artInfo.art_year_int,
-                                                 art_sourcetype = artInfo.src_type,
-                                                 art_sourcetitlefull = artInfo.src_title_full,
-                                                 art_citeas_xml = artInfo.art_citeas_xml,
-                                                 art_author_xml = authorXML,
-                                                 file_last_modified = artInfo.filedatetime,
-                                                 file_classification = artInfo.file_classification,
-                                                 file_name = artInfo.filename,
-                                                 timestamp = artInfo.processed_datetime  # When batch was entered into core
-                                                )
+                with gLoadTimes.stage("solr_post"):
+                    response_update = solrAuthor.add(id = authorDocid,         # important =  note this is unique id for every author + artid
+                                                     art_id = artInfo.art_id,
+                                                     title = artInfo.art_title,
+                                                     authors = artInfo.art_author_id_list,
+                                                     art_author_id = authorID,
+                                                     art_author_listed = authorListed,
+                                                     art_author_pos_int = authorPos,
+                                                     art_author_role = authorRole,
+                                                     art_author_bio = authorBio,
+                                                     art_author_affil_xml = authorAffil,
+                                                     art_year_int = artInfo.art_year_int,
+                                                     art_sourcetype = artInfo.src_type,
+                                                     art_sourcetitlefull = artInfo.src_title_full,
+                                                     art_citeas_xml = artInfo.art_citeas_xml,
+                                                     art_author_xml = authorXML,
+                                                     file_last_modified = artInfo.filedatetime,
+                                                     file_classification = artInfo.file_classification,
+                                                     file_name = artInfo.filename,
+                                                     timestamp = artInfo.processed_datetime  # When batch was entered into core
+                                                    )
                 if not re.search('"status">0</int>', response_update):
                     print (response_update)
             except Exception as err:
@@ -2094,6 +2196,9 @@ def main():
         precommit_file_count = 0
         skipped_files = 0
         cumulative_file_time_start = time.time()
+        profiler = None
+        if options.profile_file is not None:
+            profiler = cProfile.Profile()
         if new_files > 0:
             gCitedTable = collect_citation_counts(ocd)
                
@@ -2133,8 +2238,13 @@ def main():
                 
                 # get mod date/time, filesize, etc. for mysql database insert/update
                 processed_files_count += 1
-                f = open(n, encoding="utf-8")
-                fileXMLContents = f.read()
+                profiled = profiler is not None and random.random() < options.profile_rate
+                if profiled:
+                    profiler.enable()
+                gLoadTimes.start_file(n)
+                with gLoadTimes.stage("read"):
+                    f = open(n, encoding="utf-8")
+                    fileXMLContents = f.read()
                 
                 # get file basename without build (which is in paren)
                 base = os.path.basename(n)
@@ -2156,11 +2266,13 @@ def main():
                 artID = artID.upper()
         
                 # import into lxml
-                root = etree.fromstring(opasxmllib.remove_encoding_string(fileXMLContents))
+                with gLoadTimes.stage("parse"):
+                    root = etree.fromstring(opasxmllib.remove_encoding_string(fileXMLContents))
                 pepxml = root
         
                 # save common document (article) field values into artInfo instance for both databases
-                artInfo = ArticleInfo(sourceDB.sourceData, pepxml, artID, logger)
+                with gLoadTimes.stage("artinfo"):
+                    artInfo = ArticleInfo(sourceDB.sourceData, pepxml, artID, logger)
                 artInfo.filedatetime = file_info.timestamp_str
                 artInfo.filename = base
                 artInfo.file_size = file_info.fileSize
@@ -2180,51 +2292,61 @@ def main():
                 # input to the full-text code
                 if options.fulltext_core_update:
                     # this option will also load the authors cores.
-                    process_article_for_doc_core(pepxml, artInfo, solr_docs2, fileXMLContents)
-                    process_info_for_author_core(pepxml, artInfo,
-                                                 solr_authors)
-                    add_article_to_api_articles_table(ocd, artInfo)
+                    with gLoadTimes.stage("doc_core"):
+                        process_article_for_doc_core(pepxml, artInfo, solr_docs2, fileXMLContents)
+                    with gLoadTimes.stage("author_core"):
+                        process_info_for_author_core(pepxml, artInfo,
+                                                     solr_authors)
+                    with gLoadTimes.stage("sql_articles"):
+                        add_article_to_api_articles_table(ocd, artInfo)
                     
                     if precommit_file_count > config.COMMITLIMIT:
                         precommit_file_count = 0
-                        solr_docs2.commit()
-                        solr_authors.commit()
+                        with gLoadTimes.stage("commit"):
+                            solr_docs2.commit()
+                            solr_authors.commit()
                         #fileTracker.commit()
         
                 # input to the references core
                 if options.biblio_update:
-                    if artInfo.ref_count > 0:
-                        bibReferences = pepxml.xpath("/pepkbd3//be")  # this is the second time we do this (also in artinfo, but not sure or which is better per space vs time considerations)
-                        if 1: # options.display_verbose:
-                            print(("   ...Processing %s references for the references database." % (artInfo.ref_count)))
-
-                        #processedFilesCount += 1
-                        bib_total_reference_count = 0
-                        ocd.open_connection(caller_name="processBibliographies")
-                        for ref in bibReferences:
-                            bib_total_reference_count += 1
-                            bib_entry = BiblioEntry(artInfo, ref)
-                            add_reference_to_biblioxml_table(ocd, artInfo, bib_entry)
-
-                        try:
-                            ocd.db.commit()
-                        except pymysql.Error as e:
-                            print("SQL Database -- Biblio Commit failed!", e)
+                    with gLoadTimes.stage("biblio"):
+                        if artInfo.ref_count > 0:
+                            bibReferences = pepxml.xpath("/pepkbd3//be")  # this is the second time we do this (also in artinfo, but not sure or which is better per space vs time considerations)
+                            if 1: # options.display_verbose:
+                                print(("   ...Processing %s references for the references database." % (artInfo.ref_count)))
+
+                            #processedFilesCount += 1
+                            bib_total_reference_count = 0
+                            ocd.open_connection(caller_name="processBibliographies")
+                            for ref in bibReferences:
+                                bib_total_reference_count += 1
+                                bib_entry = BiblioEntry(artInfo, ref)
+                                add_reference_to_biblioxml_table(ocd, artInfo, bib_entry)
+
+                            try:
+                                ocd.db.commit()
+                            except pymysql.Error as e:
+                                print("SQL Database -- Biblio Commit failed!", e)
                             
-                        ocd.close_connection(caller_name="processBibliographies")
-                        # process_bibliographies(pepxml, artInfo, solrcore_references)
+                            ocd.close_connection(caller_name="processBibliographies")
+                            # process_bibliographies(pepxml, artInfo, solrcore_references)
 
-                        #if preCommitFileCount > config.COMMITLIMIT:
-                            #preCommitFileCount = 0
-                            #solrcore_references.commit()
-                            #fileTracker.commit()
+                            #if preCommitFileCount > config.COMMITLIMIT:
+                                #preCommitFileCount = 0
+                                #solrcore_references.commit()
+                                #fileTracker.commit()
         
-                        #preCommitFileCount += 1
+                            #preCommitFileCount += 1
 
                 # close the file, and do the next
                 f.close()
+                file_time = gLoadTimes.end_file()
+                if profiled:
+                    profiler.disable()
                 if 1: # options.display_verbose:
                     print(("   ...Time: %s seconds." % (time.time() - fileTimeStart)))
+                if options.display_verbose:
+                    print(("   ...Stages: %s (%.3f seconds in all)." % (gLoadTimes.file_summary(gLoadTimes.files[-1][1]), file_time)))
         
             # all done with the files.  Do a final commit.
             #try:
@@ -2245,8 +2367,9 @@ def main():
                 try:
                     print ("Performing final commit.")
                     if options.fulltext_core_update:
-                        solr_docs2.commit()
-                        solr_authors.commit()
+                        with gLoadTimes.stage("commit"):
+                            solr_docs2.commit()
+                            solr_authors.commit()
                         # fileTracker.commit()
                 except Exception as e:
                     print(("Exception: ", e))
@@ -2273,6 +2396,16 @@ def main():
         if processed_files_count > 0:
             print(f"...Files loaded per Min: {processed_files_count/elapsed_minutes:.4f}") 
             print(f"...Files evaluated per Min: {len(filenames)/elapsed_minutes:.4f}") 
+            gLoadTimes.report(slowest=options.slowest_count)
+            if profiler is not None:
+                try:
+                    profile_stats = pstats.Stats(profiler)
+                except TypeError: # no files were sampled
+                    print (f"No files were sampled (rate {options.profile_rate}) to profile.")
+                else:
+                    profile_stats.dump_stats(options.profile_file)
+                    print (f"Profile of the sampled files (rate {options.profile_rate}) saved to {options.profile_file}.  Top functions (cumulative time):")
+                    profile_stats.sort_stats("cumulative").print_stats(25)
 
     elapsed_seconds = timeEnd-timeStart # actual processing time going through files
     elapsed_minutes = elapsed_seconds / 60
@@ -2351,6 +2484,12 @@ if __name__ == "__main__":
                       help="Reload files added to Solr before this datetime (use YYYY-MM-DD format)")
     parser.add_option("--reloadafter", dest="reload_after_date", default=None,
                       help="Reload files added to Solr after this datetime (use YYYY-MM-DD format)")
+    parser.add_option("--slowest", dest="slowest_count", type="int", default=10,
+                      help="Number of the slowest files to list in the load stage timing report at the end of the run")
+    parser.add_option("--profile", dest="profile_file", default=None,
+                      help="Profile (cProfile) a sample of the files loaded, saving the stats (pstats format) to this file")
+    parser.add_option("--profilerate", dest="profile_rate", type="float", default=0.05,
+                      help="Fraction of the files loaded to profile with --profile (e.g., 0.05, or 1 for all)")
 
     (options, args) = parser.parse_args()
 
@@ -18,10 +18,12 @@ else: # python running from should be within folder app
     sys.path.append('./config')
 
 import unittest
+import json
 import requests
 from requests.utils import requote_uri
 import urllib
 
+from localsecrets import TESTUSER, TESTPW
 from unitTestConfig import base_api, base_plus_endpoint_encoded
 
 class TestSearch(unittest.TestCase):
@@ -245,6 +247,44 @@ class TestSearch(unittest.TestCase):
         assert(response_info["count"] == 1)
         print (response_set[0])
 
+    def test_search_cursor_paging(self):
+        # page through by cursor, and compare with offset paging
+        ids = []
+        cursor = "*"
+        while cursor is not None:
+            full_URL = base_plus_endpoint_encoded(f'/v2/Database/Search/?sourcecode=aop&title=west&sort=art_year&limit=2&cursor={cursor}')
+            response = requests.get(full_URL)
+            assert(response.ok == True)
+            r = response.json()
+            response_info = r["documentList"]["responseInfo"]
+            ids.extend([n["documentID"] for n in r["documentList"]["responseSet"]])
+            cursor = response_info.get("nextCursor", None)
+            assert(len(ids) <= response_info["fullCount"])
+
+        full_URL = base_plus_endpoint_encoded('/v2/Database/Search/?sourcecode=aop&title=west&sort=art_year&limit=10')
+        response = requests.get(full_URL)
+        r = response.json()
+        assert(len(ids) == 3)
+        assert(sorted(ids) == sorted([n["documentID"] for n in r["documentList"]["responseSet"]]))
+
+    def test_search_export(self):
+        full_URL = base_plus_endpoint_encoded('/v2/Database/Search/Export/?sourcecode=aop&title=west&exportfields=art_id,art_year')
+        # not logged in
+        response = requests.get(full_URL)
+        assert(response.status_code == 401)
+        session = requests.Session()
+        session.get(base_plus_endpoint_encoded(f'/v2/Session/Login/?grant_type=password&username={TESTUSER}&password={TESTPW}'))
+        response = session.get(full_URL)
+        assert(response.ok == True)
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert(len(rows) == 3)
+        assert(int(response.headers["X-Total-Count"]) == 3)
+        assert(sorted(rows[0].keys()) == ["art_id", "art_year"])
+        # the text can't be exported
+        full_URL = base_plus_endpoint_encoded('/v2/Database/Search/Export/?sourcecode=aop&exportfields=art_id,text_xml')
+        response = session.get(full_URL)
+        assert(response.status_code == 400)
+
 if __name__ == '__main__':
     unittest.main()
     
\ No newline at end of file
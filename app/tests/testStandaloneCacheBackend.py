@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import stat
+import tempfile
+import unittest
+import models
+import opasConfig
+import opasCacheBackend
+import opasCorpusCache
+
+class TestStandaloneCacheBackend(unittest.TestCase):
+    """
+    Tests of the cache backends, and of a GenerationCache in the shared (sqlite) backend
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def setUp(self):
+        self.filename = os.path.join(tempfile.mkdtemp(), "opasSharedCache.sqlite")
+
+    def test_0_shared_between_instances(self):
+        # two backends on the same file, as in two worker processes
+        writer = opasCacheBackend.SQLiteBackend("test", filename=self.filename)
+        reader = opasCacheBackend.SQLiteBackend("test", filename=self.filename)
+        writer.set(("text_xml", "dream"), {"dream": 10}, tag="gen1")
+        assert(reader.get(("text_xml", "dream"), tag="gen1") == {"dream": 10})
+        assert(reader.get(("text_xml", "dream"), tag="gen2") is opasCacheBackend.MISSING)
+        # another cache in the same file doesn't see it
+        other = opasCacheBackend.SQLiteBackend("other", filename=self.filename)
+        assert(other.get(("text_xml", "dream"), tag="gen1") is opasCacheBackend.MISSING)
+
+    def test_1_size_eviction(self):
+        backend = opasCacheBackend.SQLiteBackend("test", filename=self.filename, max_bytes=20000)
+        for n in range(20):
+            backend.set(n, "x" * 2000)
+        # the least recently used were evicted, down to the maximum size
+        assert(backend.entry_count() < 10)
+        assert(backend.get(19) == "x" * 2000)
+        assert(backend.get(0) is opasCacheBackend.MISSING)
+
+    def test_2_unencodable_not_cached(self):
+        backend = opasCacheBackend.SQLiteBackend("test", filename=self.filename)
+        backend.set("lambda", lambda x: x)
+        assert(backend.get("lambda") is opasCacheBackend.MISSING)
+
+    def test_3_generation_cache_shared(self):
+        opasConfig.CACHE_BACKEND_BY_CACHE["test shared"] = "sqlite"
+        opasConfig.SHARED_CACHE_FILE = self.filename
+        try:
+            cache = opasCorpusCache.GenerationCache("test shared")
+            opasCorpusCache.publish_corpus_generation("gen5")
+            cache.set("a", 1)
+            assert(cache.get("a") == 1)
+            assert(cache.stats()["backend"] == "shared")
+            opasCorpusCache.publish_corpus_generation("gen6")
+            assert(cache.get("a") is None)
+            cache.set("a", 2)
+            opasCorpusCache.invalidate_corpus_caches()
+            opasCorpusCache.publish_corpus_generation("gen6")
+            assert(cache.get("a") is None)
+        finally:
+            del opasConfig.CACHE_BACKEND_BY_CACHE["test shared"]
+
+    def test_4_models_round_trip(self):
+        backend = opasCacheBackend.SQLiteBackend("test", filename=self.filename)
+        value = (models.ResponseInfo(count=1, fullCount=1, listType="documentlist"),
+                 [models.DocumentListItem(documentID="IJP.078.0335A", title="Dreams", pgStart="335")])
+        backend.set("search", value)
+        cached = backend.get("search")
+        assert(cached == value)
+        assert(type(cached[1][0]) == models.DocumentListItem)
+        # only the models can be created from an entry
+        backend.connection().execute("UPDATE cache_entries SET value = ? WHERE cache = ?",
+                                     (b'{"__model__": "BaseModel", "fields": {}}', "test"))
+        assert(backend.get("search") is opasCacheBackend.MISSING)
+
+    def test_5_unsafe_file_rejected(self):
+        backend = opasCacheBackend.SQLiteBackend("test", filename=self.filename)
+        backend.set("a", 1)
+        assert(oct(os.stat(os.path.dirname(self.filename)).st_mode & 0o777) == oct(0o700))
+        # a file other users can write isn't used (in a new process, or thread)
+        os.chmod(self.filename, os.stat(self.filename).st_mode | stat.S_IWOTH)
+        backend = opasCacheBackend.SQLiteBackend("test", filename=self.filename)
+        with self.assertRaises(opasCacheBackend.UnsafeCacheFileError):
+            backend.connection()
+        assert(backend.get("a") is opasCacheBackend.MISSING)
+        backend.set("b", 2)
+        os.chmod(self.filename, 0o600)
+        assert(opasCacheBackend.SQLiteBackend("test", filename=self.filename).get("b") is opasCacheBackend.MISSING)
+        # nor is a folder other users can write
+        os.chmod(os.path.dirname(self.filename), 0o777)
+        with self.assertRaises(opasCacheBackend.UnsafeCacheFileError):
+            opasCacheBackend.SQLiteBackend("test", filename=self.filename).connection()
+
+    @unittest.skipUnless(hasattr(os, "getuid") and os.getuid() == 0, "Changing a file's owner needs root")
+    def test_6_foreign_file_rejected(self):
+        open(self.filename, "w").close()
+        os.chown(self.filename, 1, -1) # e.g., daemon
+        backend = opasCacheBackend.SQLiteBackend("test", filename=self.filename)
+        with self.assertRaises(opasCacheBackend.UnsafeCacheFileError):
+            backend.connection()
+        assert(backend.get("a") is opasCacheBackend.MISSING)
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
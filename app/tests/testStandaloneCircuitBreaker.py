@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import socket
+import unittest
+import requests
+import solrpy as solr
+import opasConfig
+import opasCircuitBreaker
+import opasCorpusCache
+import opasDocPermissions
+
+class FailingPaDS(object):
+    """
+    Stands in for the requests module in opasDocPermissions, counting the calls, which all raise error
+    """
+    RequestException = requests.RequestException
+    ConnectionError = requests.ConnectionError
+    ConnectTimeout = requests.ConnectTimeout
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        raise self.error
+
+class TestStandaloneCircuitBreaker(unittest.TestCase):
+    """
+    Tests of the backend circuit breakers (without the backends)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def setUp(self):
+        opasCircuitBreaker.breakers.clear()
+
+    def tearDown(self):
+        opasCircuitBreaker.breakers.clear()
+
+    def test_0_breaker_states(self):
+        breaker = opasCircuitBreaker.CircuitBreaker("test", failure_threshold=3, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success() # failures must be consecutive
+        breaker.record_failure()
+        assert(breaker.state == opasCircuitBreaker.CLOSED)
+        breaker.record_failure()
+        breaker.record_failure()
+        assert(breaker.state == opasCircuitBreaker.OPEN)
+        self.assertRaises(opasCircuitBreaker.CircuitOpenError, breaker.check)
+        # after the reset timeout, one trial; its failure opens the breaker again
+        breaker.opened_at -= 60
+        assert(breaker.allow() == True)
+        assert(breaker.allow() == False)
+        breaker.record_failure()
+        assert(breaker.state == opasCircuitBreaker.OPEN)
+        assert(breaker.status()["times_opened"] == 2)
+
+    def test_1_guard(self):
+        breaker = opasCircuitBreaker.CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+        # an error which isn't a backend failure doesn't count
+        with self.assertRaises(KeyError):
+            with breaker.guard(failures=OSError):
+                raise KeyError("not found")
+        assert(breaker.state == opasCircuitBreaker.CLOSED)
+        with self.assertRaises(OSError):
+            with breaker.guard(failures=OSError):
+                raise OSError("connection refused")
+        assert(breaker.state == opasCircuitBreaker.OPEN)
+        with self.assertRaises(opasCircuitBreaker.CircuitOpenError):
+            with breaker.guard(failures=OSError):
+                pass
+
+    def test_2_solr_gate(self):
+        # a query error doesn't count; connection errors and timeouts do
+        solr.core._notify_request_observers("/solr/pepwebdocs/select", 0.01, None, None, solr.SolrException(400, "bad query"))
+        for n in range(opasConfig.BREAKER_FAILURE_THRESHOLD - 1):
+            solr.core._notify_request_observers("/solr/pepwebdocs/select", 0.01, None, None, ConnectionError())
+        solr.core._check_request_gates("/solr/pepwebdocs/select")
+        solr.core._notify_request_observers("/solr/pepwebdocs/select", 30, None, None, socket.timeout())
+        with self.assertRaises(solr.SolrException) as context:
+            solr.core._check_request_gates("/solr/pepwebdocs/select")
+        assert(context.exception.httpcode == 503)
+        status = {item["name"]: item for item in opasCircuitBreaker.breaker_status()}
+        assert(status["solr"]["state"] == opasCircuitBreaker.OPEN)
+        assert(status["mysql"]["state"] == opasCircuitBreaker.CLOSED)
+
+    def test_3_stale_while_solr_open(self):
+        cache = opasCorpusCache.GenerationCache("test stale", ttl=-1)
+        opasCorpusCache.publish_corpus_generation("gen1")
+        cache.set("a", 1)
+        assert(cache.get("a") is None) # expired
+        for n in range(opasConfig.BREAKER_FAILURE_THRESHOLD):
+            opasCircuitBreaker.get_breaker("solr").record_failure()
+        assert(cache.get("a") == 1)
+        assert(cache.stats()["stale_hits"] == 1)
+
+    def test_4_pads_retries(self):
+        save_requests = opasDocPermissions.requests
+        try:
+            # a refused connection is retried; a timeout, connecting or reading, isn't
+            for error, calls in ((requests.ConnectionError("refused"), opasConfig.PADS_RETRIES + 1),
+                                 (requests.ConnectTimeout("connect timeout"), 1),
+                                 (requests.ReadTimeout("read timeout"), 1)):
+                opasDocPermissions.requests = FailingPaDS(error)
+                assert(opasDocPermissions.pads_get("http://127.0.0.1:9/v1/Permits") is None)
+                assert(opasDocPermissions.requests.calls == calls)
+        finally:
+            opasDocPermissions.requests = save_requests
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+import time
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasConfig
+import opasXMLHelper
+import opasConversionExecutor
+import opasAPISupportLib
+import models
+
+test_xml = "<body><p>a</p><pb><n>1</n></pb><p>b</p><pb><n>2</n></pb></body>"
+
+def stand_in_xml_to_html(xmlstr, transformer_name=None):
+    # stands in for the XSLT conversion (whose stylesheets need the W3C entity map)
+    return f"<html><body>[[RunningHead]]{xmlstr}</body></html>"
+
+class TestStandaloneConversionExecutor(unittest.TestCase):
+    """
+    Tests of the optional conversion process pool
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.save_enabled = opasConfig.CONVERSION_POOL_ENABLED
+        cls.save_workers = opasConfig.CONVERSION_POOL_WORKERS
+
+    @classmethod
+    def tearDownClass(cls):
+        opasConversionExecutor.shutdown_conversion_pool()
+        opasConfig.CONVERSION_POOL_ENABLED = cls.save_enabled
+        opasConfig.CONVERSION_POOL_WORKERS = cls.save_workers
+
+    def test_0_inline_when_disabled(self):
+        opasConfig.CONVERSION_POOL_ENABLED = False
+        assert(opasConversionExecutor.get_conversion_pool() is None)
+        pages = opasConversionExecutor.run_conversion(opasXMLHelper.xml_get_pages_xmlstr, test_xml, offset=1, limit=1)
+        assert("<p>b</p>" in pages)
+
+    def test_1_pool(self):
+        opasConfig.CONVERSION_POOL_ENABLED = True
+        opasConfig.CONVERSION_POOL_WORKERS = 2
+        pages = opasConversionExecutor.run_conversion(opasXMLHelper.xml_get_pages_xmlstr, test_xml, offset=1, limit=1)
+        assert("<p>b</p>" in pages)
+        assert(opasConversionExecutor.get_conversion_pool() is not None)
+
+    def test_2_timeout(self):
+        opasConfig.CONVERSION_POOL_ENABLED = True
+        with self.assertRaises(opasConversionExecutor.ConversionTimeoutError):
+            opasConversionExecutor.run_conversion(time.sleep, 3, timeout=0.5)
+        pages = opasConversionExecutor.run_conversion(opasXMLHelper.xml_get_pages_xmlstr, test_xml, offset=1, limit=1,
+                                                      timeout=0, inline_on_timeout=True)
+        assert("<p>b</p>" in pages)
+
+    def test_3_fulltext_timeout_fallback(self):
+        # a conversion which times out in the pool is done inline, rather than fail the request or return XML
+        opasConfig.CONVERSION_POOL_ENABLED = True
+        save_timeout = opasConfig.CONVERSION_TIMEOUT
+        save_xml_str_to_html = opasXMLHelper.xml_str_to_html
+        opasConfig.CONVERSION_TIMEOUT = 0
+        opasXMLHelper.xml_str_to_html = stand_in_xml_to_html
+        try:
+            item = models.DocumentListItem(sourceTitle="Test", year="2020", vol="1", issue="1", pgRg="1-2", pgStart="1", pgEnd="2")
+            with self.assertLogs("opasConversionExecutor", level="WARNING") as logs:
+                item = opasAPISupportLib.get_fulltext_from_search_results(result={"text_xml": test_xml}, text_xml=None,
+                                                                          page=None, page_offset=None, page_limit=None,
+                                                                          documentListItem=item, format_requested="HTML")
+        finally:
+            opasConfig.CONVERSION_TIMEOUT = save_timeout
+            opasXMLHelper.xml_str_to_html = save_xml_str_to_html
+        assert(any("converting inline" in line for line in logs.output))
+        assert(item.document.startswith("<html><body>"))
+        assert("[[RunningHead]]" not in item.document)
+
+    def test_4_pool_shares_cores_with_workers(self):
+        # the environment is set by gunicorn after opasConfig was imported (in the master); the pool reads it when started
+        opasConversionExecutor.shutdown_conversion_pool()
+        opasConfig.CONVERSION_POOL_ENABLED = True
+        opasConfig.CONVERSION_POOL_WORKERS = None
+        cores = os.cpu_count() or 1
+        os.environ["OPAS_SERVER_WORKERS"] = str(cores)
+        try:
+            assert(opasConversionExecutor.get_conversion_pool()._max_workers == 1)
+        finally:
+            del os.environ["OPAS_SERVER_WORKERS"]
+            opasConversionExecutor.shutdown_conversion_pool()
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
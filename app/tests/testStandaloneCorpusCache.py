@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasCorpusCache
+
+class TestStandaloneCorpusCache(unittest.TestCase):
+    """
+    Tests of the caches invalidated by corpus generation
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def test_0_generation_change_clears(self):
+        cache = opasCorpusCache.GenerationCache("test")
+        opasCorpusCache.publish_corpus_generation("gen1")
+        cache.set(("text_xml", "dream"), {"dream": 10})
+        assert(cache.get(("text_xml", "dream")) == {"dream": 10})
+        opasCorpusCache.publish_corpus_generation("gen2")
+        assert(cache.get(("text_xml", "dream")) is None)
+
+    def test_1_invalidate(self):
+        cache = opasCorpusCache.GenerationCache("test")
+        opasCorpusCache.publish_corpus_generation("gen3")
+        cache.set("a", 1)
+        opasCorpusCache.invalidate_corpus_caches()
+        # keep the published generation, rather than check Solr
+        opasCorpusCache.publish_corpus_generation("gen3")
+        assert(cache.get("a") is None)
+
+    def test_2_lru(self):
+        cache = opasCorpusCache.GenerationCache("test", max_entries=2)
+        opasCorpusCache.publish_corpus_generation("gen4")
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert(cache.get("b") is None)
+        assert(cache.get("a") == 1)
+        stats = cache.stats()
+        assert(stats["entries"] == 2)
+        assert(stats["hits"] == 2)
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
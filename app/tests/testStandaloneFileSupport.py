@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+import tempfile
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasConfig
+import opasFileSupport
+import opasCorpusCache
+
+class TestStandaloneFileSupport(unittest.TestCase):
+    """
+    Tests of the FlexFileSystem image caches, using the local file system
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.image_path = os.path.join(self.tempdir.name, "g")
+        os.mkdir(self.image_path)
+        for fname in ("AIM.036.0275A.FIG001.jpg", "AIM.036.0275A.FIG002.gif", "AIM.036.0275A.FIG002.tif"):
+            with open(os.path.join(self.image_path, fname), "wb") as f:
+                f.write(b"0123456789")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_0_resolver_cache(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        filename = fs.get_image_filename("AIM.036.0275A.FIG001", path="g")
+        assert(filename == os.path.join(self.image_path, "AIM.036.0275A.FIG001.jpg"))
+        # remove the file; the cached resolution is still returned (no probe)
+        os.remove(filename)
+        assert(fs.get_image_filename("AIM.036.0275A.FIG001", path="g") == filename)
+
+    def test_1_negative_cache(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        assert(fs.get_image_filename("AIM.036.0275A.FIG099", path="g") is None)
+        with open(os.path.join(self.image_path, "AIM.036.0275A.FIG099.jpg"), "wb") as f:
+            f.write(b"0123456789")
+        # still within the negative ttl
+        assert(fs.get_image_filename("AIM.036.0275A.FIG099", path="g") is None)
+        fs.clear_image_cache()
+        assert(fs.get_image_filename("AIM.036.0275A.FIG099", path="g") is not None)
+
+    def test_1b_negative_cache_bounded(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        save_max = opasConfig.IMAGE_CACHE_NEGATIVE_MAX_ENTRIES
+        opasConfig.IMAGE_CACHE_NEGATIVE_MAX_ENTRIES = 3
+        try:
+            for n in range(10):
+                assert(fs.get_image_filename(f"NOSUCH.{n:03}", path="g") is None)
+            # only the most recently missed ids are remembered
+            assert(len(fs.image_not_found_cache) == 3)
+            assert(list(fs.image_not_found_cache.keys())[-1].endswith("NOSUCH.009"))
+            assert(len(fs.image_resolver_cache) == 0)
+        finally:
+            opasConfig.IMAGE_CACHE_NEGATIVE_MAX_ENTRIES = save_max
+
+    def test_2_prewarm(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        count = fs.prewarm_image_cache(path="g")
+        assert(count == 2)
+        # gif ranks ahead of tif
+        filename = fs.get_image_filename("AIM.036.0275A.FIG002", path="g")
+        assert(filename == os.path.join(self.image_path, "AIM.036.0275A.FIG002.gif"))
+
+    def test_3_bytes_cache(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        image_bytes = fs.get_image_binary("AIM.036.0275A.FIG001", path="g")
+        assert(image_bytes == b"0123456789")
+        assert(fs.image_bytes_cache_size == 10)
+        os.remove(os.path.join(self.image_path, "AIM.036.0275A.FIG001.jpg"))
+        assert(fs.get_image_binary("AIM.036.0275A.FIG001", path="g") == b"0123456789")
+
+    def test_4_bytes_cache_eviction(self):
+        fs = opasFileSupport.FlexFileSystem()
+        save_max = opasConfig.IMAGE_CACHE_MAX_BYTES
+        opasConfig.IMAGE_CACHE_MAX_BYTES = 25
+        try:
+            for n in range(5):
+                fs.cache_image_bytes(f"image{n}.jpg", b"0123456789")
+            assert(fs.image_bytes_cache_size <= 25)
+            assert(list(fs.image_bytes_cache.keys()) == ["image3.jpg", "image4.jpg"])
+        finally:
+            opasConfig.IMAGE_CACHE_MAX_BYTES = save_max
+
+    def test_5_rendition(self):
+        from PIL import Image
+        import io
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        Image.new("RGB", (1000, 500)).save(os.path.join(self.image_path, "AIM.036.0275A.FIG003.tif"))
+        image_bytes, media_type = fs.get_image_rendition("AIM.036.0275A.FIG003", path="g", width=250, image_format="webp")
+        assert(media_type == "image/webp")
+        img = Image.open(io.BytesIO(image_bytes))
+        assert(img.format == "WEBP")
+        assert(img.width == 300) # rounded up to the standard width
+        rendition_filename = os.path.join(self.image_path, opasConfig.IMAGE_RENDITION_SUBPATH, "AIM.036.0275A.FIG003.w300.webp")
+        assert(os.path.exists(rendition_filename))
+        # never scaled up
+        image_bytes, media_type = fs.get_image_rendition("AIM.036.0275A.FIG003", path="g", width=1200)
+        assert(Image.open(io.BytesIO(image_bytes)).width == 1000)
+        with self.assertRaises(ValueError):
+            fs.get_image_rendition("AIM.036.0275A.FIG003", path="g", image_format="bmp")
+    def test_6_original_media_type(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        filename = fs.get_image_filename("AIM.036.0275A.FIG002", path="g")
+        assert(opasFileSupport.get_image_media_type(filename) == "image/gif")
+        filename = fs.get_image_filename("AIM.036.0275A.FIG002.tif", path="g")
+        assert(opasFileSupport.get_image_media_type(filename) == "image/tiff")
+    def test_7_resolver_cache_bounded_and_expires(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        save_max = opasConfig.IMAGE_CACHE_RESOLVER_MAX_ENTRIES
+        save_ttl = opasConfig.IMAGE_CACHE_RESOLVER_TTL
+        opasConfig.IMAGE_CACHE_RESOLVER_MAX_ENTRIES = 2
+        try:
+            for fname in ("AIM.036.0275A.FIG001", "AIM.036.0275A.FIG002", "AIM.036.0275A.FIG002.tif"):
+                assert(fs.get_image_filename(fname, path="g") is not None)
+            # only the most recently resolved are remembered
+            assert(len(fs.image_resolver_cache) == 2)
+            assert(not list(fs.image_resolver_cache.keys())[0].endswith("FIG001"))
+            # and expired entries are probed again
+            os.remove(os.path.join(self.image_path, "AIM.036.0275A.FIG002.gif"))
+            opasConfig.IMAGE_CACHE_RESOLVER_TTL = 0
+            filename = fs.get_image_filename("AIM.036.0275A.FIG002", path="g")
+            assert(filename == os.path.join(self.image_path, "AIM.036.0275A.FIG002.tif"))
+        finally:
+            opasConfig.IMAGE_CACHE_RESOLVER_MAX_ENTRIES = save_max
+            opasConfig.IMAGE_CACHE_RESOLVER_TTL = save_ttl
+
+    def test_8_resolver_cache_cleared_with_generation(self):
+        fs = opasFileSupport.FlexFileSystem(root=self.tempdir.name)
+        opasCorpusCache.add_generation_listener(fs.clear_image_resolver_cache)
+        try:
+            opasCorpusCache.publish_corpus_generation("imagegen1")
+            assert(fs.get_image_filename("AIM.036.0275A.FIG099", path="g") is None)
+            filename = fs.get_image_filename("AIM.036.0275A.FIG002", path="g")
+            os.remove(filename)
+            with open(os.path.join(self.image_path, "AIM.036.0275A.FIG099.jpg"), "wb") as f:
+                f.write(b"0123456789")
+            # a load (new generation) may have added or replaced images
+            opasCorpusCache.publish_corpus_generation("imagegen2")
+            assert(fs.get_image_filename("AIM.036.0275A.FIG099", path="g") is not None)
+            assert(fs.get_image_filename("AIM.036.0275A.FIG002", path="g").endswith(".tif"))
+        finally:
+            opasCorpusCache.generation_listeners.remove(fs.clear_image_resolver_cache)
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import requests
+import opasCentralDBLib
+import opasAPISupportLib
+
+class UnreachableSolr(object):
+    """
+    Stands in for the requests module in opasAPISupportLib, counting the calls, which all fail
+    """
+    RequestException = requests.RequestException
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        raise requests.ConnectionError("connection refused")
+
+class ProductbaseDB(object):
+    """
+    Stands in for opasCentralDB, with the database down for the first read
+    """
+    reads = 0
+
+    def get_productbase_data(self):
+        ProductbaseDB.reads += 1
+        if ProductbaseDB.reads == 1:
+            return {}
+        return [{"pepsrccode": "AOP", "title": "Annual of Psychoanalysis"}]
+
+class TestStandaloneFirstUse(unittest.TestCase):
+    """
+    Tests of the data read from Solr or the database on first use, when they can't be reached
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def test_0_text_server_version_retry(self):
+        save_requests = opasAPISupportLib.requests
+        opasAPISupportLib.requests = UnreachableSolr()
+        try:
+            opasAPISupportLib.text_server_version = None
+            opasAPISupportLib.text_server_version_retry_at = 0
+            assert(opasAPISupportLib.get_text_server_version() is None)
+            # Solr isn't asked again until the retry interval has passed
+            assert(opasAPISupportLib.get_text_server_version() is None)
+            assert(opasAPISupportLib.requests.calls == 1)
+            opasAPISupportLib.text_server_version_retry_at = 0
+            assert(opasAPISupportLib.get_text_server_version() is None)
+            assert(opasAPISupportLib.requests.calls == 2)
+        finally:
+            opasAPISupportLib.requests = save_requests
+            opasAPISupportLib.text_server_version_retry_at = 0
+
+    def test_1_source_info_not_kept_empty(self):
+        save_db = opasCentralDBLib.opasCentralDB
+        opasCentralDBLib.opasCentralDB = ProductbaseDB
+        try:
+            source_info = opasCentralDBLib.SourceInfoDB()
+            assert(source_info.lookupSourceCode("AOP") is None) # database down
+            assert(source_info.lookupSourceCode("AOP")["title"] == "Annual of Psychoanalysis")
+            assert(source_info.lookupSourceCode("AOP") is not None)
+            assert(ProductbaseDB.reads == 2)
+        finally:
+            opasCentralDBLib.opasCentralDB = save_db
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
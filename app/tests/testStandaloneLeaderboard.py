@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import models
+import opasAPISupportLib
+
+def leaderboard(full_count, depth):
+    """
+    A leaderboard of depth items (alternately from IJP and AIM), of full_count matches
+    """
+    items = [models.DocumentListItem(documentID=f"{'IJP' if n % 2 == 0 else 'AIM'}.001.{n:04}A",
+                                     PEPCode="IJP" if n % 2 == 0 else "AIM", accessClassification="free")
+             for n in range(depth)]
+    return (models.ResponseInfo(fullCount=full_count), items)
+
+class TestStandaloneLeaderboard(unittest.TestCase):
+    """
+    Tests of the most cited and most viewed leaderboard returns (without Solr)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def test_0_complete(self):
+        ret_val = opasAPISupportLib.leaderboard_document_list(leaderboard(6, 6), source_codes=["IJP"], limit=10)
+        response_info = ret_val.documentList.responseInfo
+        assert(response_info.count == 3)
+        assert(response_info.fullCount == 3)
+        assert(response_info.fullCountComplete == True)
+
+    def test_1_truncated(self):
+        ret_val = opasAPISupportLib.leaderboard_document_list(leaderboard(500, 20), limit=5)
+        response_info = ret_val.documentList.responseInfo
+        assert(response_info.fullCount == 500)
+        assert(response_info.fullCountComplete == False)
+
+    def test_2_filtered_and_truncated(self):
+        # the IJP matches beyond the depth are unknown: no (wrong) total is returned
+        ret_val = opasAPISupportLib.leaderboard_document_list(leaderboard(500, 20), source_codes=["IJP"], limit=5)
+        response_info = ret_val.documentList.responseInfo
+        assert(response_info.count == 5)
+        assert(response_info.fullCount is None)
+        assert(response_info.totalMatchCount is None)
+        assert(response_info.fullCountComplete == False)
+        # and past what the leaderboard has, it's a search
+        assert(opasAPISupportLib.leaderboard_document_list(leaderboard(500, 20), source_codes=["IJP"], limit=5, offset=8) is None)
+    def test_3_most_viewed_key_has_sort(self):
+        keys = []
+        def get_leaderboard(key, solr_query_spec, req_url=None):
+            keys.append(key)
+            return leaderboard(6, 6)
+        saved = opasAPISupportLib.get_leaderboard
+        opasAPISupportLib.get_leaderboard = get_leaderboard
+        try:
+            ret_val = opasAPISupportLib.database_get_most_viewed(view_period=1, limit=10)
+            opasAPISupportLib.database_get_most_viewed(view_period=2, limit=10)
+        finally:
+            opasAPISupportLib.get_leaderboard = saved
+        assert(ret_val.documentList.responseInfo.count == 6)
+        # the leaderboards for each period are ordered (and so kept) separately
+        assert(keys[0][-1] == "art_views_lastweek desc")
+        assert(keys[1][-1] == "art_views_last1mos desc")
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
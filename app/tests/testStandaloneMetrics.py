@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import solrpy as solr
+import opasMetrics
+import opasRequestTiming
+import opasCircuitBreaker
+import opasCentralDBLib
+
+class DroppedConnection(object):
+    """
+    A pymysql connection which the server dropped
+    """
+    open = False
+
+    def close(self):
+        raise Exception("Already closed")
+
+class TestStandaloneMetrics(unittest.TestCase):
+    """
+    Tests of the /metrics exposition (without the app)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def test_0_solr_metrics(self):
+        solr.core._notify_request_observers("/solr/pepwebglossary/select", 0.02, 500, 3, None)
+        solr.core._notify_request_observers("/solr/pepwebglossary/select", 0.01, None, None, ConnectionError())
+        text = opasMetrics.render_metrics()
+        assert('opas_solr_request_seconds_count{core="pepwebglossary",handler="select"} 2' in text)
+        assert('opas_solr_request_errors_total{core="pepwebglossary",handler="select"} 1' in text)
+        assert('opas_solr_response_bytes_total{core="pepwebglossary",handler="select"} 500' in text)
+
+    def test_1_request_metrics(self):
+        opasRequestTiming.observe_request("/v2/Metrics/Test/", {"total": 0.2, "session": 0.05}, method="GET", status=200)
+        text = opasMetrics.render_metrics()
+        assert('opas_requests_total{route="/v2/Metrics/Test/",method="GET",status="200"} 1' in text)
+        assert('opas_request_seconds_bucket{route="/v2/Metrics/Test/",le="+Inf"} 1' in text)
+        assert('opas_request_phase_seconds_count{route="/v2/Metrics/Test/",phase="session"} 1' in text)
+
+    def test_2_format(self):
+        # every sample line is a metric name, optional labels, and a value
+        for line in opasMetrics.render_metrics().splitlines():
+            if not line.startswith("#"):
+                name_labels, value = line.rsplit(" ", 1)
+                float(value)
+                assert(name_labels.startswith("opas_"))
+
+    def test_3_dropped_mysql_connection(self):
+        gauge = opasMetrics.MYSQL_CONNECTIONS_OPEN
+        open_count = gauge.values.get((), 0)
+        # each connection was counted as open when it was opened
+        gauge.inc()
+        ocd = opasCentralDBLib.opasCentralDB()
+        ocd.db = DroppedConnection()
+        ocd.close_connection("test")
+        assert(ocd.db is None)
+        assert(gauge.values.get((), 0) == open_count)
+        # replaced on reopen (not attempted here, with the breaker open)
+        gauge.inc()
+        ocd.db = DroppedConnection()
+        breaker = opasCircuitBreaker.get_breaker("mysql")
+        for n in range(breaker.failure_threshold):
+            breaker.record_failure()
+        try:
+            assert(ocd.open_connection("test") == False)
+        finally:
+            opasCircuitBreaker.breakers.clear()
+        assert(ocd.db is None)
+        assert(gauge.values.get((), 0) == open_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasCorpusCache
+import opasQueryHelper
+
+class TestStandaloneQuerySpecCache(unittest.TestCase):
+    """
+    Tests of the parse_search_query_parameters memo (cached_query_spec)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def test_0_paging_hits(self):
+        opasCorpusCache.publish_corpus_generation("specgen1")
+        opasQueryHelper.query_spec_cache.clear()
+        hits = opasQueryHelper.query_spec_cache.hits
+        spec1 = opasQueryHelper.parse_search_query_parameters(title="west", source_code="AOP", limit=10, offset=0)
+        spec2 = opasQueryHelper.parse_search_query_parameters(title="west", source_code="AOP", limit=10, offset=10)
+        assert(opasQueryHelper.query_spec_cache.hits == hits + 1)
+        assert(spec1.solrQuery.filterQ == spec2.solrQuery.filterQ)
+        assert(spec1.offset == 0 and spec2.offset == 10)
+        assert(spec2.limit == 10)
+
+    def test_1_copies(self):
+        opasCorpusCache.publish_corpus_generation("specgen1")
+        spec1 = opasQueryHelper.parse_search_query_parameters(title="west", source_code="AOP")
+        spec1.solrQuery.sort = "changed"
+        spec1.solrQueryOpts.hlFragsize = 1
+        spec2 = opasQueryHelper.parse_search_query_parameters(title="west", source_code="AOP")
+        assert(spec2.solrQuery.sort != "changed")
+        assert(spec2.solrQueryOpts.hlFragsize != 1)
+
+    def test_2_different_params(self):
+        opasCorpusCache.publish_corpus_generation("specgen1")
+        spec1 = opasQueryHelper.parse_search_query_parameters(title="west", source_code="AOP")
+        spec2 = opasQueryHelper.parse_search_query_parameters(title="east", source_code="AOP")
+        assert(spec1.solrQuery.searchQ != spec2.solrQuery.searchQ)
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
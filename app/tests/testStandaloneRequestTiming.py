@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import time
+import contextvars
+import concurrent.futures
+
+import solrpy as solr
+import opasRequestTiming
+
+class TestStandaloneRequestTiming(unittest.TestCase):
+    """
+    Tests of the request phase timers (without the app)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def test_0_no_request(self):
+        # outside of a request, phases aren't recorded (and don't fail)
+        with opasRequestTiming.phase("xslt"):
+            pass
+        assert(opasRequestTiming.current_timer.get() is None)
+
+    def test_1_phases_in_thread(self):
+        @opasRequestTiming.timed("session")
+        def session_check():
+            time.sleep(0.01)
+
+        timer = opasRequestTiming.RequestTimer()
+        token = opasRequestTiming.current_timer.set(timer)
+        try:
+            # endpoints run in the threadpool, in a copy of the request's context
+            context = contextvars.copy_context()
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                executor.submit(context.run, session_check).result()
+            solr.core._notify_request_observers("/solr/pepwebdocs/select", 0.05, 1000, 20, None)
+        finally:
+            opasRequestTiming.current_timer.reset(token)
+
+        assert(timer.durations["session"] >= 0.01)
+        assert(timer.durations["solr"] == 0.05)
+        assert(timer.durations["solr_qtime"] == 0.02)
+        assert("session;dur=" in timer.server_timing(timer.elapsed()))
+
+    def test_2_histograms(self):
+        opasRequestTiming.observe_request("/v2/Test/", {"total": 0.02, "solr": 0.01})
+        opasRequestTiming.observe_request("/v2/Test/", {"total": 0.2})
+        stats = [route for route in opasRequestTiming.timing_stats() if route["route"] == "/v2/Test/"][0]
+        assert(stats["phases"]["total"]["count"] == 2)
+        assert(stats["phases"]["solr"]["count"] == 1)
+
+if __name__ == '__main__':
+    unittest.main()
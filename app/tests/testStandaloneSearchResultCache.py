@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasConfig
+import opasCorpusCache
+import opasQueryHelper
+import opasAPISupportLib
+
+class CannedResults(object):
+    """
+    A solrpy query response with one document, with an excerpt
+    """
+    def __init__(self, params):
+        self.results = [{"art_id": "AOP.033.0079A", "art_sourcecode": "AOP", "art_sourcetitleabbr": "Ann. Psychoanal.",
+                         "art_year": "2016", "art_vol": "33", "art_pgrg": "79-100", "file_classification": "free",
+                         "art_title": "West", "art_excerpt": "<p>The <i>excerpt</i></p>",
+                         "art_excerpt_xml": "<abs><p>The <i>excerpt</i></p></abs>"}]
+        self.highlighting = {}
+        self.facet_counts = None
+        self._numFound = 1
+        self._params = params
+
+class CannedSolr(object):
+    def __init__(self):
+        self.queries = 0
+
+    def query(self, **params):
+        self.queries += 1
+        return CannedResults(params)
+
+class TestStandaloneSearchResultCache(unittest.TestCase):
+    """
+    Tests of the search result cache in search_text_qs (without Solr)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def setUp(self):
+        self.solr = CannedSolr()
+        self.save_core = opasAPISupportLib.EXTENDED_CORES["pepwebdocs"]
+        opasAPISupportLib.EXTENDED_CORES["pepwebdocs"] = self.solr
+        opasConfig.SEARCH_RESULT_CACHE_ENABLED = True
+        opasCorpusCache.publish_corpus_generation("searchgen1")
+
+    def tearDown(self):
+        opasAPISupportLib.EXTENDED_CORES["pepwebdocs"] = self.save_core
+
+    def search(self, return_format, abstract=True):
+        spec = opasQueryHelper.parse_search_query_parameters(title="west", source_code="AOP",
+                                                             abstract_requested=abstract, format_requested=return_format)
+        ret_val, ret_status = opasAPISupportLib.search_text_qs(spec, limit=10)
+        return ret_val.documentList.responseSet[0]
+
+    def test_0_return_formats(self):
+        html = self.search("HTML")
+        assert(self.search("HTML").abstract == html.abstract)
+        assert(self.solr.queries == 1) # cached
+        xml = self.search("XML")
+        assert(self.solr.queries == 2) # not served the HTML rendering
+        assert(xml.abstract == "<abs><p>The <i>excerpt</i></p></abs>")
+        assert(html.abstract != xml.abstract)
+
+    def test_1_abstract_return(self):
+        with_abstract = self.search("TEXTONLY")
+        without_abstract = self.search("TEXTONLY", abstract=False)
+        assert(with_abstract.abstract is not None)
+        assert(without_abstract.abstract is None)
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
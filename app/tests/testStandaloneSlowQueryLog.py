@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import tempfile
+import json
+import logging.handlers
+
+import opasConfig
+import opasRequestTiming
+import opasSlowQueryLog
+
+class TestResults(object):
+    header = {"QTime": 120}
+    _numFound = 42
+    _response_bytes = 20000
+
+class TestStandaloneSlowQueryLog(unittest.TestCase):
+    """
+    Tests of the slow query log (without Solr)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        opasConfig.SLOW_QUERY_LOG_FILE = os.path.join(cls.folder.name, "slowqueries.jsonl")
+
+    @classmethod
+    def tearDownClass(cls):
+        handler = opasSlowQueryLog.record_handler()
+        opasSlowQueryLog.record_logger.removeHandler(handler)
+        handler.close()
+        opasSlowQueryLog.record_file_handler = None
+        cls.folder.cleanup()
+
+    def request(self, handler_seconds, params):
+        timer = opasRequestTiming.RequestTimer()
+        token = opasRequestTiming.current_timer.set(timer)
+        try:
+            opasSlowQueryLog.note_query("pepwebdocs", params, TestResults())
+        finally:
+            opasRequestTiming.current_timer.reset(token)
+        opasSlowQueryLog.request_finished(timer, handler_seconds, "GET", "/v2/Database/Search/", "/v2/Database/Search/", 200)
+
+    def test_0_only_slow_requests(self):
+        self.request(opasConfig.SLOW_QUERY_THRESHOLD_MS / 1000 + 1, {"q": "text:dream*", "hl": "true", "rows": 10})
+        self.request(0.01, {"q": "text:dream", "rows": 10})
+        with open(opasConfig.SLOW_QUERY_LOG_FILE) as f:
+            records = [json.loads(line) for line in f]
+        assert(len(records) == 1)
+        assert(records[0]["params"]["q"] == "text:dream*")
+        assert(records[0]["qtime_ms"] == 120)
+        assert(records[0]["num_found"] == 42)
+        assert(records[0]["response_bytes"] == 20000)
+
+    def test_1_report(self):
+        report = opasSlowQueryLog.slow_query_report(limit=5)
+        assert(report["records"] == 1)
+        assert(report["by_route"]["/v2/Database/Search/"]["count"] == 1)
+        assert(sorted(report["by_feature"].keys()) == ["highlighting", "wildcard"])
+        assert(len(report["slowest"]) == 1)
+
+    def test_2_shared_file_with_workers(self):
+        # the environment is set by gunicorn after opasConfig was imported (in the master); the handler reads it when added
+        save_handler = opasSlowQueryLog.record_file_handler
+        opasSlowQueryLog.record_logger.removeHandler(save_handler)
+        opasSlowQueryLog.record_file_handler = None
+        os.environ["OPAS_SERVER_WORKERS"] = "4"
+        try:
+            handler = opasSlowQueryLog.record_handler()
+            assert(type(handler) == logging.handlers.WatchedFileHandler)
+        finally:
+            del os.environ["OPAS_SERVER_WORKERS"]
+            opasSlowQueryLog.record_logger.removeHandler(handler)
+            handler.close()
+            opasSlowQueryLog.record_file_handler = save_handler
+            opasSlowQueryLog.record_logger.addHandler(save_handler)
+
+if __name__ == '__main__':
+    unittest.main()
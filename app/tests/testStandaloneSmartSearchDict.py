@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasSmartSearchDict
+
+TEST_DOCUMENTS = [{"art_id": "AOP.033.0079A",
+                   "title": "Object Relations Theories and the Developmental Tilt",
+                   "authors": ["Tuckett, David", "Fonagy, Peter"],
+                   "art_authors_citation": "Tuckett, D. & Fonagy, P."},
+                  {"art_id": "IJP.001.0001A",
+                   "title": "The Analyst's Dream",
+                   "authors": ["Freud, Sigmund"],
+                   "art_authors_citation": "Freud, S."}
+                 ]
+
+class TestStandaloneSmartSearchDict(unittest.TestCase):
+    """
+    Tests of the smart search dictionaries, without Solr
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def test_0_phrase_index(self):
+        index = opasSmartSearchDict.PhraseIndex(["Object Relations Theories and the Developmental Tilt", "The Analyst's Dream"])
+        assert(len(index) == 2)
+        assert(index.contains("Object Relations"))
+        assert(index.contains("relations object") == False)
+        assert(index.contains("relations object", all_terms=True))
+        assert(index.contains("object theories") == False)
+        assert(index.contains("object theories", slop=1))
+        assert(index.contains("object nightmare", all_terms=True) == False)
+        assert(index.contains("") == False)
+
+    def test_1_dictionaries(self):
+        dictionaries = opasSmartSearchDict.SmartSearchDictionaries(TEST_DOCUMENTS)
+        assert("AOP.033.0079A" in dictionaries.art_ids)
+        assert("Freud, Sigmund" in dictionaries.authors)
+        assert(dictionaries.author_names.contains("tuckett"))
+        assert(dictionaries.author_citations.contains("Freud, S."))
+        assert(dictionaries.titles.contains("analyst dream", slop=10))
+        assert(dictionaries.stats()["documents"] == 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import solrpy as solr
+import opasCircuitBreaker
+import opasAPISupportLib
+
+TERMS_RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
+<response>
+<lst name="responseHeader"><int name="status">0</int><int name="QTime">1</int></lst>
+<lst name="terms"><lst name="text_xml"><int name="dreamwork">10</int><int name="dreamt">5</int></lst></lst>
+</response>
+"""
+
+class CannedTermSearch(solr.SearchHandler):
+    """
+    A solrpy /terms handler which answers with TERMS_RESPONSE rather than asking Solr (so the
+      call is made, and its response parsed, as it is against Solr)
+    """
+    def __init__(self):
+        super().__init__(solr.SolrConnection("http://127.0.0.1:1/solr/pepwebdocs"), "/terms")
+        self.requests = []
+
+    def raw(self, **params):
+        self.requests.append(params)
+        return TERMS_RESPONSE
+
+class TestStandaloneTermCounts(unittest.TestCase):
+    """
+    Tests of the term counts (without Solr)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def setUp(self):
+        # the canned calls still pass the Solr circuit breaker (which tests needing Solr may have opened)
+        opasCircuitBreaker.breakers.clear()
+        self.term_search = CannedTermSearch()
+        self.save_term_search = opasAPISupportLib.thread_solr_term_search
+        opasAPISupportLib.thread_solr_term_search = lambda core: self.term_search
+
+    def tearDown(self):
+        opasAPISupportLib.thread_solr_term_search = self.save_term_search
+        opasCircuitBreaker.breakers.clear()
+
+    def test_0_wildcard_term_counts(self):
+        counts = opasAPISupportLib.get_wildcard_term_counts("dream*")
+        assert(counts == {"dreamwork(dream*)": 10, "dreamt(dream*)": 5, "Total(dream*)>=": 15})
+        assert(self.term_search.requests[0]["terms_regex"] == "dream.*")
+
+    def test_1_term_count_list_wildcard(self):
+        # through the term count worker threads (and cache)
+        counts = opasAPISupportLib.get_term_count_list("dreamw*")
+        assert(counts["Total(dreamw*)>="] == 15)
+        assert(len(self.term_search.requests) == 1)
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasTermIndex
+
+TERMS = [("tuckett, david", 30), ("tucker, jane", 3), ("tuch, anna", 12), ("freud, sigmund", 900),
+         ("freud, anna", 300), ("fréud, äpfel", 1), ("levinson, nadine a.", 8)]
+
+class TestStandaloneTermIndex(unittest.TestCase):
+    """
+    Tests of the in memory prefix indexes
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.index = opasTermIndex.TermPrefixIndex(TERMS, core="authors", field="art_author_id")
+
+    def test_0_prefix(self):
+        matches = self.index.prefix_matches("tuck")
+        assert(matches == [("tucker, jane", 3), ("tuckett, david", 30)])
+        assert(self.index.prefix_matches("zzz") == [])
+        # limit and offset, index order
+        assert(self.index.prefix_matches("tu", limit=1, offset=1) == [("tucker, jane", 3)])
+
+    def test_1_count_order(self):
+        matches = self.index.prefix_matches("fr", limit=2, order="count")
+        assert(matches == [("freud, sigmund", 900), ("freud, anna", 300)])
+
+    def test_2_regex(self):
+        matches = self.index.regex_matches("tu.?h.*")
+        assert(matches == [("tuch, anna", 12)])
+        matches = self.index.regex_matches("tuc?k.*")
+        assert(matches == [("tucker, jane", 3), ("tuckett, david", 30)])
+        matches = self.index.regex_matches("fr.ud.*", order="count")
+        assert([term for term, count in matches] == ["freud, sigmund", "freud, anna", "fréud, äpfel"])
+
+    def test_3_non_ascii(self):
+        assert(self.index.prefix_matches("fré") == [("fréud, äpfel", 1)])
+        assert(len(self.index) == len(TERMS))
+        assert(self.index.memory_bytes() > 0)
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sys
+import os.path
+from datetime import datetime
+
+folder = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+if folder == "tests": # testing from within WingIDE, default folder is tests
+    sys.path.append('../libs')
+    sys.path.append('../config')
+    sys.path.append('../../app')
+else: # python running from should be within folder app
+    sys.path.append('./libs')
+    sys.path.append('./config')
+
+import unittest
+import opasConfig
+import opasCorpusCache
+import opasAPISupportLib
+
+class StandInResults(list):
+    """
+    Stands in for solrpy's results: the docs, with the number found
+    """
+    def __init__(self, docs, num_found):
+        super().__init__(docs)
+        self._numFound = num_found
+
+class StandInSolr(object):
+    """
+    Stands in for solr_docs, with num_found volumes, noting the rows and start of each query
+    """
+    def __init__(self, num_found):
+        self.num_found = num_found
+        self.queries = []
+
+    def query(self, q, fl=None, fq=None, sort=None, sort_order=None, rows=10, start=0):
+        self.queries.append((rows, start))
+        docs = [{"art_id": f"IJP.{n:03}.0001A", "art_sourcecode": "IJP", "art_sourcetype": "journal",
+                 "art_vol": n, "art_iss": "1", "art_year": "2020", "art_sourcetitleabbr": "Int. J. Psychoanal.",
+                 "file_last_modified": datetime(2020, 10, 19)}
+                for n in range(start, min(start + rows, self.num_found))]
+        return StandInResults(docs, self.num_found)
+
+class TestStandaloneWhatsNew(unittest.TestCase):
+    """
+    Tests of the What's New feed (without Solr)
+
+    Note: tests are performed in alphabetical order, hence the function naming
+          with forced order in the names.
+
+    """
+    def setUp(self):
+        self.save_solr_docs = opasAPISupportLib.solr_docs
+        self.save_depth = opasConfig.WHATS_NEW_DEPTH
+        self.solr = opasAPISupportLib.solr_docs = StandInSolr(30)
+        opasConfig.WHATS_NEW_DEPTH = 10
+        opasCorpusCache.invalidate_corpus_caches()
+        opasCorpusCache.publish_corpus_generation("whatsnewgen1")
+
+    def tearDown(self):
+        opasAPISupportLib.solr_docs = self.save_solr_docs
+        opasConfig.WHATS_NEW_DEPTH = self.save_depth
+
+    def test_0_from_feed(self):
+        ret_val = opasAPISupportLib.database_get_whats_new(limit=5, offset=5)
+        assert([item.volume for item in ret_val.whatsNew.responseSet] == ["5", "6", "7", "8", "9"])
+        opasAPISupportLib.database_get_whats_new(limit=5)
+        # one query, for the feed
+        assert(self.solr.queries == [(10, 0)])
+
+    def test_1_past_feed_depth(self):
+        ret_val = opasAPISupportLib.database_get_whats_new(limit=5, offset=8)
+        # not cut short at the feed's depth
+        assert([item.volume for item in ret_val.whatsNew.responseSet] == ["8", "9", "10", "11", "12"])
+        assert(ret_val.whatsNew.responseInfo.fullCount == 30)
+        assert(self.solr.queries == [(5, 8)])
+
+if __name__ == '__main__':
+    unittest.main()
+    print ("Tests Complete.")